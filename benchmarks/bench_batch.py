@@ -0,0 +1,117 @@
+"""
+Бенчмарк пакетної перевірки SpamFilter.classify_many: повідомлень за секунду для пакета
+коротких і довгих текстів, по черзі (як classify_many) і частинами в пулі потоків.
+re не відпускає GIL, тож пул потоків не прискорює перевірку — лише додає накладні витрати.
+
+Перед заміром перевіряється, що вердикти пакета збігаються з етапами обробника повідомлень:
+заблокований домен, копія видаленого спаму, паттерн на карантині (повільний шлях) і regex.
+
+Запуск:
+    uv run python benchmarks/bench_batch.py
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.regex import SpamFilter  # noqa: E402
+import utils.regex  # noqa: E402
+
+# Перевірка бюджету часу могла б відправити паттерни на карантин посеред прогону
+utils.regex.MATCH_TIME_BUDGET = float("inf")
+
+ALPHABET = "абвгдежзийклмнопрстуфхцчшщьюяіїє"
+PATTERN_COUNTS = (100, 500)
+BATCH_SIZE = 2000
+# Частка довгих повідомлень у пакеті (експорт чату: переважно короткі)
+LONG_SHARE = 0.1
+SHORT_LENGTH = 80
+LONG_LENGTH = 2048
+THREADS = 4
+CHUNK_SIZE = 64
+
+
+def random_word(rng: random.Random, min_len: int = 4, max_len: int = 9) -> str:
+    return "".join(rng.choice(ALPHABET) for _ in range(rng.randint(min_len, max_len)))
+
+
+def make_message(rng: random.Random, length: int) -> str:
+    words = []
+    while sum(len(word) + 1 for word in words) < length:
+        words.append(random_word(rng, 2, 10))
+    return " ".join(words)[:length]
+
+
+def make_batch(rng: random.Random, words):
+    messages = []
+    for _ in range(BATCH_SIZE):
+        text = make_message(rng, LONG_LENGTH if rng.random() < LONG_SHARE else SHORT_LENGTH)
+        if rng.random() < 0.05:
+            text += " " + rng.choice(words)
+        messages.append(text)
+    return messages
+
+
+def check_stages(spam_filter: SpamFilter):
+    """Кожен етап обробника дає той самий вердикт і в пакеті"""
+    spam_filter.domains.add_domains(["spam.example"])
+    spam_filter.remember_spam("продам акаунти недорого пишіть в особисті", "акаунти")
+    spam_filter.add_pattern("повільн(а|а)+ий")
+    spam_filter.quarantine_patterns(["повільн(а|а)+ий"])
+    spam_filter._compile_patterns()
+    cases = {
+        "заходьте на spam.example/free": "domain:spam.example",
+        "продам акаунти недорого, пишіть в особисті": "duplicate:акаунти",
+        "це повільнааий текст": "повільн(а|а)+ий",
+        "звичайне повідомлення": None,
+    }
+    verdicts = spam_filter.classify_many(cases)
+    for (text, expected), verdict in zip(cases.items(), verdicts):
+        assert verdict.pattern == expected, (text, verdict)
+
+
+def measure(func, messages):
+    """Повертає (вердикти, кількість повідомлень за секунду)"""
+    start = time.perf_counter()
+    verdicts = func(messages)
+    return verdicts, len(messages) / (time.perf_counter() - start)
+
+
+def main():
+    rng = random.Random(42)
+    # Працюємо в тимчасовій теці, щоб не чіпати filters.json / patterns.json
+    os.chdir(tempfile.mkdtemp())
+    spam_filter = SpamFilter()
+    check_stages(spam_filter)
+    spam_filter.close()
+    print("verdicts match the message handler stages")
+
+    executor = ThreadPoolExecutor(max_workers=THREADS)
+
+    def threaded(messages):
+        chunks = [messages[i:i + CHUNK_SIZE] for i in range(0, len(messages), CHUNK_SIZE)]
+        return [verdict for chunk in executor.map(spam_filter.classify_many, chunks) for verdict in chunk]
+
+    print(f"batch of {BATCH_SIZE}: {LONG_SHARE:.0%} x {LONG_LENGTH} chars, rest {SHORT_LENGTH} chars; "
+          f"CPUs: {os.cpu_count()}")
+    print(f"{'patterns':>8} {'serial msg/s':>13} {f'{THREADS} threads msg/s':>17} {'spam':>6}")
+    for count in PATTERN_COUNTS:
+        words = [random_word(rng) for _ in range(count)]
+        spam_filter = SpamFilter()
+        spam_filter.patterns = set(words) | {r"\b\w{4}\d+\w{4}\b"}
+        spam_filter._compile_patterns()
+        messages = make_batch(rng, words)
+        serial, serial_rate = measure(spam_filter.classify_many, messages)
+        parallel, threaded_rate = measure(threaded, messages)
+        assert serial == parallel, "threaded batch changed verdicts"
+        print(f"{count:>8} {serial_rate:>13.0f} {threaded_rate:>17.0f} {sum(v.is_spam for v in serial):>6}")
+        spam_filter.close()
+    executor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
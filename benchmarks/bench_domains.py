@@ -0,0 +1,86 @@
+"""
+Бенчмарк списку заблокованих доменів: збирання й завантаження компактного списку на 100k доменів
+і перевірка повідомлень з посиланнями індексом суфіксів проти тих самих доменів як regex-паттернів.
+
+Regex-варіант будується лише з REGEX_DOMAINS доменів: з усіма 100k компіляція займає хвилини.
+
+Запуск:
+    uv run python benchmarks/bench_domains.py
+"""
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.domains import DomainBlocklist, compile_domain_list  # noqa: E402
+from utils.matcher import PatternMatcher  # noqa: E402
+from utils.normalize import normalize_text  # noqa: E402
+
+DOMAIN_COUNT = 100_000
+REGEX_DOMAINS = 2_000
+MESSAGE_COUNT = 20_000
+BLOCKED_RATE = 0.1
+TLDS = ("com", "net", "org", "ru", "info", "xyz", "top", "online")
+LETTERS = "abcdefghijklmnopqrstuvwxyz0123456789"
+WORDS = "привіт як справи сьогодні зустріч о котрій годині дякую все добре дивись тут".split()
+
+
+def random_domain(rng: random.Random) -> str:
+    label = "".join(rng.choice(LETTERS) for _ in range(rng.randint(5, 14)))
+    return f"{label}.{rng.choice(TLDS)}"
+
+
+def make_message(rng: random.Random, domains) -> str:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(5, 20))]
+    domain = rng.choice(domains) if rng.random() < BLOCKED_RATE else random_domain(rng)
+    words.insert(rng.randrange(len(words)), f"https://{rng.choice(('', 'www.', 'promo.'))}{domain}/join?ref=1")
+    return " ".join(words)
+
+
+def measure(check, messages) -> float:
+    start = time.perf_counter()
+    hits = sum(1 for message in messages if check(message))
+    elapsed = time.perf_counter() - start
+    print(f"    {hits} hits, {len(messages) / elapsed:,.0f} msg/s, {elapsed / len(messages) * 1e6:.1f} us/msg")
+    return elapsed
+
+
+def main():
+    rng = random.Random(42)
+    os.chdir(tempfile.mkdtemp())
+    domains = sorted({random_domain(rng) for _ in range(DOMAIN_COUNT)})
+    with open("hosts.txt", "w", encoding="utf-8") as f:
+        f.write("# hosts-формат\n")
+        f.writelines(f"0.0.0.0 {domain}\n" for domain in domains)
+
+    start = time.perf_counter()
+    count = compile_domain_list(["hosts.txt"], "blocked_domains.txt.gz")
+    print(f"compile {count} domains: {time.perf_counter() - start:.2f} s, "
+          f"{os.path.getsize('hosts.txt') / 1024:.0f} KB -> {os.path.getsize('blocked_domains.txt.gz') / 1024:.0f} KB")
+
+    start = time.perf_counter()
+    blocklist = DomainBlocklist("blocked_domains.txt.gz")
+    print(f"load: {(time.perf_counter() - start) * 1000:.0f} ms, {len(blocklist)} rules")
+
+    messages = [make_message(rng, domains) for _ in range(MESSAGE_COUNT)]
+    print(f"suffix index, {len(blocklist)} domains:")
+    measure(blocklist.find, messages)
+
+    regex_domains = domains[:REGEX_DOMAINS]
+    start = time.perf_counter()
+    matcher = PatternMatcher([re.escape(domain) for domain in regex_domains])
+    print(f"regex, {REGEX_DOMAINS} domains (compile {time.perf_counter() - start:.2f} s):")
+    # Як у SpamFilter: regex-паттерни перевіряються по нормалізованому тексту
+    measure(lambda message: matcher.find(normalize_text(message)), messages)
+    blocklist_small = DomainBlocklist()
+    blocklist_small.set_dynamic(regex_domains)
+    print(f"suffix index, {REGEX_DOMAINS} domains:")
+    measure(blocklist_small.find, messages)
+
+
+if __name__ == "__main__":
+    main()
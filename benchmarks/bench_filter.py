@@ -0,0 +1,80 @@
+"""
+Бенчмарк SpamFilter: пропускна здатність is_spam залежно від кількості паттернів.
+
+Порівнює один великий альтернативний regex (compiled_pattern) з префільтром
+за літералами (Ахо-Корасік), який використовує is_spam.
+
+Запуск:
+    uv run python benchmarks/bench_filter.py
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.normalize import normalize_text  # noqa: E402
+from utils.regex import SpamFilter  # noqa: E402
+
+ALPHABET = "абвгдежзийклмнопрстуфхцчшщьюяіїє"
+# Кириличні літери та їхні латинські двійники, як у filters.json
+LOOKALIKES = {"р": "p", "у": "y", "а": "a", "е": "e", "о": "o", "с": "c", "х": "x", "к": "k"}
+PATTERN_COUNTS = (10, 50, 100, 250, 500)
+MESSAGE_COUNT = 200
+
+
+def random_word(rng: random.Random, min_len: int = 4, max_len: int = 9) -> str:
+    return "".join(rng.choice(ALPHABET) for _ in range(rng.randint(min_len, max_len)))
+
+
+def make_pattern(word: str) -> str:
+    """Перетворює слово на паттерн з класами символів [рp], [уy], ..."""
+    return "".join(f"[{c}{LOOKALIKES[c]}]" if c in LOOKALIKES else c for c in word) + "(и|ей|я)?"
+
+
+def make_messages(rng: random.Random, words, count: int):
+    messages = []
+    for _ in range(count):
+        text = " ".join(random_word(rng, 2, 8) for _ in range(rng.randint(5, 25)))
+        if rng.random() < 0.1:
+            text += " " + rng.choice(words)
+        messages.append(text)
+    return messages
+
+
+def build_filter(patterns) -> SpamFilter:
+    spam_filter = SpamFilter()
+    spam_filter.patterns = set(patterns)
+    spam_filter._compile_patterns()
+    return spam_filter
+
+
+def measure(func, messages):
+    """Повертає (вердикти, кількість повідомлень за секунду)"""
+    start = time.perf_counter()
+    verdicts = [bool(func(message)) for message in messages]
+    return verdicts, len(messages) / (time.perf_counter() - start)
+
+
+def main():
+    rng = random.Random(42)
+    # Працюємо в тимчасовій теці, щоб не чіпати filters.json / patterns.json
+    os.chdir(tempfile.mkdtemp())
+    print(f"{'patterns':>8} {'combined msg/s':>15} {'prefilter msg/s':>16} {'speedup':>8}")
+    for count in PATTERN_COUNTS:
+        words = [random_word(rng) for _ in range(count)]
+        patterns = [make_pattern(word) for word in words] + [r"\d{6,}"]
+        messages = make_messages(rng, words, MESSAGE_COUNT)
+        spam_filter = build_filter(patterns)
+
+        combined = spam_filter.compiled_pattern
+        expected, combined_rate = measure(lambda m: combined.search(normalize_text(m)), messages)
+        actual, prefilter_rate = measure(spam_filter.is_spam, messages)
+        assert expected == actual, "prefilter changed is_spam verdicts"
+        print(f"{count:>8} {combined_rate:>15.0f} {prefilter_rate:>16.0f} {prefilter_rate / combined_rate:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
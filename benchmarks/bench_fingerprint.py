@@ -0,0 +1,84 @@
+"""
+Бенчмарк індексу відбитків спаму: 100k збережених відбитків, пошук змінених копій і звичайних повідомлень.
+Показує пошуки за секунду, частку знайдених копій, хибні збіги та пам'ять на відбиток.
+
+Запуск:
+    uv run python benchmarks/bench_fingerprint.py
+"""
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.fingerprint import FingerprintIndex  # noqa: E402
+from utils.normalize import normalize_text  # noqa: E402
+
+STORED = 100_000
+LOOKUPS = 20_000
+ALPHABET = "абвгдежзийклмнопрстуфхцчшщьюяіїє"
+EMOJI = ("🔥", "💰", "✅", "👉", "❗")
+
+
+def random_word(rng: random.Random) -> str:
+    return "".join(rng.choice(ALPHABET) for _ in range(rng.randint(2, 10)))
+
+
+def make_text(rng: random.Random) -> str:
+    return " ".join(random_word(rng) for _ in range(rng.randint(12, 40)))
+
+
+def mutate(rng: random.Random, text: str) -> str:
+    """Легка зміна, як у кампаніях: інша сума, емодзі, одне слово замінено, зайва пунктуація"""
+    words = text.split()
+    words[rng.randrange(len(words))] = random_word(rng)
+    words.insert(rng.randrange(len(words)), str(rng.randint(100, 999)))
+    return rng.choice(EMOJI) + " " + ", ".join(words) + " " + rng.choice(EMOJI) * rng.randint(1, 3)
+
+
+def measure(index: FingerprintIndex, texts) -> int:
+    # Нормалізація потрібна й regex-перевірці, тому не входить у час пошуку
+    texts = [normalize_text(text) for text in texts]
+    start = time.perf_counter()
+    found = sum(1 for text in texts if index.find(text) is not None)
+    elapsed = time.perf_counter() - start
+    print(f"    {found}/{len(texts)} found, {len(texts) / elapsed:,.0f} lookups/s, "
+          f"{elapsed / len(texts) * 1e6:.1f} us/lookup")
+    return found
+
+
+def main():
+    rng = random.Random(42)
+    originals = [make_text(rng) for _ in range(STORED)]
+    index = FingerprintIndex(window=3600, max_entries=STORED)
+
+    # Пам'ять міряємо на першій частині: tracemalloc уповільнює додавання в рази
+    sample = STORED // 10
+    texts = [normalize_text(text) for text in originals]
+    tracemalloc.start()
+    for text in texts[:sample]:
+        index.add(text, "бенчмарк")
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    start = time.perf_counter()
+    for text in texts[sample:]:
+        index.add(text, "бенчмарк")
+    elapsed = time.perf_counter() - start
+    print(f"stored: {len(index)} fingerprints, {(STORED - sample) / elapsed:,.0f} adds/s, "
+          f"{memory / sample:.0f} B per fingerprint (~{memory / sample * STORED / 1024 / 1024:.0f} MB at {STORED})")
+
+    print("mutated copies of stored spam:")
+    measure(index, [mutate(rng, rng.choice(originals)) for _ in range(LOOKUPS)])
+    print("unrelated messages (false positives):")
+    measure(index, [make_text(rng) for _ in range(LOOKUPS)])
+
+    # Понад max_entries найдавніші витісняються: пам'ять не росте
+    for text in originals[:STORED // 10]:
+        index.add(normalize_text(mutate(rng, text)), "бенчмарк")
+    print(f"after {STORED // 10} more adds: {len(index)} fingerprints (max {index.max_entries})")
+
+
+if __name__ == "__main__":
+    main()
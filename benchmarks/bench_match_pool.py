@@ -0,0 +1,168 @@
+"""
+Бенчмарк перевірки довгих повідомлень: на місці (в event loop) проти пулу процесів.
+
+1. Вартість одного тексту, по одному: нормалізація й перевірка на місці проти повного шляху
+   через пул (передача, перевірка в процесі, відповідь) для базових filters.json і складного набору
+   (частина паттернів без літералів, тож префільтр їх не відсікає); поруч — оцінка
+   MatchPool.estimate_cost і чи піде текст у пул. Так підбираються константи POOL_* в utils/match_pool.py.
+2. Змішане навантаження: довгі повідомлення складного набору і між ними короткі з інших чатів
+   надходять за розкладом. Для обох шляхів час рахується однаково — від запланованого
+   надходження до результату, тож очікування за заблокованим event loop теж враховане.
+   «Тікер» міряє найдовшу паузу event loop.
+
+Запуск:
+    uv run python benchmarks/bench_match_pool.py
+"""
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.match_pool import POOL_WORKERS, MatchPool  # noqa: E402
+from utils.metrics import LatencyStats  # noqa: E402
+from utils.normalize import normalize_text  # noqa: E402
+from utils.regex import SpamFilter  # noqa: E402
+import utils.regex  # noqa: E402
+
+# Перевірка бюджету часу відправила б паттерни складного набору на карантин посеред прогону,
+# і два шляхи порівнювалися б на різних наборах
+utils.regex.MATCH_TIME_BUDGET = float("inf")
+
+ALPHABET = "абвгдежзийклмнопрстуфхцчшщьюяіїє"
+PATTERN_COUNT = 300
+LENGTHS = (256, 1024, 4096)
+SAMPLES = 30
+# Змішане навантаження: довгі повідомлення на секунду і скільки коротких припадає на кожне
+LONG_COUNT = 200
+LONG_LENGTH = 4096
+LONG_RATE = 80
+SHORT_PER_LONG = 5
+SHORT_LENGTH = 80
+TICK = 0.001
+
+
+def random_word(rng: random.Random, min_len: int = 4, max_len: int = 9) -> str:
+    return "".join(rng.choice(ALPHABET) for _ in range(rng.randint(min_len, max_len)))
+
+
+def make_patterns(rng: random.Random):
+    patterns = [random_word(rng) + r"\w*\s+" + random_word(rng) for _ in range(PATTERN_COUNT)]
+    # Паттерни без обов'язкових літералів проганяються по кожному тексту
+    patterns += [rf"\b\w{{{n}}}\d+\w{{{n}}}\b" for n in range(3, 13)]
+    return patterns
+
+
+def make_message(rng: random.Random, length: int) -> str:
+    words = []
+    while sum(len(word) + 1 for word in words) < length:
+        words.append(random_word(rng, 2, 10))
+    return " ".join(words)[:length]
+
+
+async def make_filter(patterns) -> SpamFilter:
+    spam_filter = SpamFilter(pool_workers=POOL_WORKERS)
+    spam_filter.add_patterns(patterns)
+    await spam_filter.wait_compiled()
+    while not spam_filter._match_pool.ready:
+        await asyncio.sleep(0.1)
+    return spam_filter
+
+
+async def measure_costs(name: str, spam_filter: SpamFilter, rng: random.Random):
+    matcher = spam_filter.get_matcher()
+    pool = spam_filter._match_pool
+    for length in LENGTHS:
+        messages = [make_message(rng, length) for _ in range(SAMPLES)]
+        start = time.perf_counter()
+        for message in messages:
+            matcher.find(normalize_text(message))
+        inline = (time.perf_counter() - start) / SAMPLES
+        start = time.perf_counter()
+        for message in messages:
+            await pool.find(matcher, message)
+        pooled = (time.perf_counter() - start) / SAMPLES
+        estimate = MatchPool.estimate_cost(messages[0], matcher)
+        print(f"{name:>13} {length:>6} {inline * 1000:>10.2f} {pooled * 1000:>8.2f} {estimate * 1000:>11.2f} "
+              f"{'pool' if pool.should_offload(messages[0], matcher) else 'inline':>8}")
+
+
+async def ticker(stall: LatencyStats, stop: asyncio.Event):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        stall.observe(max(0.0, time.perf_counter() - start - TICK))
+
+
+async def run_mixed(spam_filter: SpamFilter, schedule, use_pool: bool):
+    """Надсилає повідомлення за розкладом; час — від запланованого надходження до результату"""
+    stall = LatencyStats()
+    stop = asyncio.Event()
+    tick_task = asyncio.create_task(ticker(stall, stop))
+    latency = {"long": LatencyStats(window=len(schedule)), "short": LatencyStats(window=len(schedule))}
+
+    async def check(kind: str, message: str, arrival: float):
+        if use_pool:
+            await spam_filter.find_match_async(message)
+        else:
+            spam_filter.find_match(message)
+        latency[kind].observe(time.perf_counter() - arrival)
+
+    loop = asyncio.get_running_loop()
+    tasks = []
+    start = time.perf_counter()
+    for offset, kind, message in schedule:
+        delay = start + offset - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(loop.create_task(check(kind, message, start + offset)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await tick_task
+    return latency, stall, len(schedule) / elapsed
+
+
+async def main():
+    rng = random.Random(42)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with open(os.path.join(root, "filters.json"), encoding="utf-8") as f:
+        base_patterns = json.load(f)
+    # Працюємо в тимчасовій теці, щоб не чіпати filters.json / patterns.json
+    os.chdir(tempfile.mkdtemp())
+
+    print(f"pool workers: {POOL_WORKERS}, CPUs: {os.cpu_count()}")
+    print("one message at a time, ms:")
+    print(f"{'patterns':>13} {'chars':>6} {'inline ms':>10} {'pool ms':>8} {'estimate ms':>11} {'path':>8}")
+    spam_filter = await make_filter(base_patterns)
+    await measure_costs("filters.json", spam_filter, rng)
+    spam_filter.close()
+    os.chdir(tempfile.mkdtemp())
+    spam_filter = await make_filter(make_patterns(rng))
+    await measure_costs("complex", spam_filter, rng)
+
+    schedule = []
+    for index in range(LONG_COUNT):
+        arrival = index / LONG_RATE
+        schedule.append((arrival, "long", make_message(rng, LONG_LENGTH)))
+        for short in range(SHORT_PER_LONG):
+            schedule.append((arrival + (short + 1) / (LONG_RATE * (SHORT_PER_LONG + 1)), "short",
+                             make_message(rng, SHORT_LENGTH)))
+    print(f"mixed load, complex set: {LONG_RATE} x {LONG_LENGTH} chars/s plus {LONG_RATE * SHORT_PER_LONG} x "
+          f"{SHORT_LENGTH} chars/s from other chats; time from arrival to result, ms:")
+    print(f"{'path':>7} {'msg/s':>7} {'long p50':>9} {'long p99':>9} {'short p50':>10} {'short p99':>10} "
+          f"{'max loop stall':>15}")
+    for name, use_pool in (("inline", False), ("pool", True)):
+        latency, stall, rate = await run_mixed(spam_filter, schedule, use_pool)
+        long, short = latency["long"].summary(), latency["short"].summary()
+        print(f"{name:>7} {rate:>7.0f} {long['p50_ms']:>9.2f} {long['p99_ms']:>9.2f} {short['p50_ms']:>10.2f} "
+              f"{short['p99_ms']:>10.2f} {stall.max * 1000:>15.2f}")
+    spam_filter.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,76 @@
+"""
+Бенчмарк нормалізації тексту та повного шляху normalize_text + SpamFilter.is_spam.
+
+Показує пропускну здатність нормалізації на звичайних і обфускованих повідомленнях
+(латинські двійники, fullwidth-символи, zero-width, комбіновані знаки, цифри-підміни)
+та частку обфускованого спаму, яку ловлять базові фільтри.
+
+Запуск:
+    uv run python benchmarks/bench_normalize.py
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.normalize import normalize_text  # noqa: E402
+from utils.regex import SpamFilter  # noqa: E402
+
+WORDS = ["привіт", "як", "справи", "сьогодні", "зустріч", "о", "пʼятій", "дякую", "добре", "чат"]
+SPAM = ["заробіток удаленно", "тисячі рублей за день", "оплата в ₽ щодня"]
+MESSAGE_COUNT = 20000
+# Кирилиця -> латинські та fullwidth двійники
+LOOKALIKES = {"р": "pｐ", "у": "yｙ", "а": "aａ", "е": "eｅ", "о": "oｏ0", "с": "cｃ", "х": "xｘ"}
+INVISIBLES = ["​", "‍", "⁠", "­", "́"]
+
+
+def obfuscate(rng: random.Random, text: str) -> str:
+    """Імітує типові прийоми обходу фільтрів"""
+    out = []
+    for char in text:
+        if char in LOOKALIKES and rng.random() < 0.5:
+            char = rng.choice(LOOKALIKES[char])
+        out.append(char.upper() if rng.random() < 0.1 else char)
+        if rng.random() < 0.15:
+            out.append(rng.choice(INVISIBLES))
+    return "".join(out)
+
+
+def make_messages(rng: random.Random, obfuscated: bool):
+    messages = []
+    for _ in range(MESSAGE_COUNT):
+        text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 15)))
+        if rng.random() < 0.1:
+            text += " " + rng.choice(SPAM)
+        messages.append(obfuscate(rng, text) if obfuscated else text)
+    return messages
+
+
+def rate(func, messages) -> float:
+    start = time.perf_counter()
+    for message in messages:
+        func(message)
+    return len(messages) / (time.perf_counter() - start)
+
+
+def main():
+    rng = random.Random(7)
+    spam_filter = SpamFilter()  # базові фільтри з filters.json
+    os.chdir(tempfile.mkdtemp())
+    print(f"{'corpus':>10} {'normalize msg/s':>16} {'normalize+is_spam msg/s':>24}")
+    for obfuscated in (False, True):
+        messages = make_messages(rng, obfuscated)
+        name = "obfuscated" if obfuscated else "plain"
+        print(f"{name:>10} {rate(normalize_text, messages):>16.0f} {rate(spam_filter.is_spam, messages):>24.0f}")
+
+    caught = sum(spam_filter.is_spam(obfuscate(rng, text)) for text in SPAM * 1000)
+    print(f"obfuscated spam caught: {caught / (len(SPAM) * 1000):.1%}")
+
+
+if __name__ == "__main__":
+    os.chdir(ROOT)
+    main()
@@ -0,0 +1,227 @@
+"""
+Офлайн-прогін конвеєра модерації: корпус оновлень Telegram (JSONL, одне оновлення на рядок —
+синтетичний або експортований) проходить через справжній Dispatcher з обробниками
+register_handlers і AdminPanel.register_admin_handlers. Бот працює з фейковою сесією
+(benchmarks/fake_session.py), яка записує виклики API, додає затримку і відповідає 429.
+
+Показує повідомлення за секунду, p50/p99 часу обробки оновлення, виклики API на одне
+спам-повідомлення та вартість перевірки SpamFilter залежно від кількості паттернів.
+
+Запуск:
+    uv run python benchmarks/bench_replay.py                     # синтетичний корпус
+    uv run python benchmarks/bench_replay.py updates.jsonl       # власний корпус
+    uv run python benchmarks/bench_replay.py --write corpus.jsonl  # лише записати синтетичний корпус
+    uv run python benchmarks/bench_replay.py --latency 0.05 --rate-limit 0.02 --concurrency 100
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_session import OWNER, FakeSession, make_update  # noqa: E402
+
+# Звіти про спам мають кому йти: власник фейкового чату — єдиний адмін бота
+os.environ.setdefault("ADMIN_IDS", str(OWNER.id))
+
+from aiogram import Bot, Dispatcher  # noqa: E402
+
+from bench_filter import make_pattern, random_word  # noqa: E402
+from core.admin import AdminPanel  # noqa: E402
+from core.handlers import register_handlers  # noqa: E402
+from core.member_cache import ChatMemberCache  # noqa: E402
+from core.moderation import ModerationPipeline  # noqa: E402
+from utils.flood import FloodDetector  # noqa: E402
+from utils.log import setup_logging  # noqa: E402
+from utils.metrics import LatencyStats  # noqa: E402
+from utils.regex import SpamFilter  # noqa: E402
+
+TOKEN = "123456:BENCHMARK"
+UPDATES = 5000
+CHATS = 20
+CONCURRENCY = 50
+API_LATENCY = 0.02
+API_JITTER = 0.01
+RATE_LIMIT = 0.01
+# Частки синтетичного корпусу: поодинокий спам, рейди (серія від одного акаунта), флуд; решта — звичайні
+SPAM_RATE = 0.05
+RAID_RATE = 0.005
+RAID_SIZE = 8
+FLOOD_RATE = 0.002
+FLOOD_SIZE = 15
+SPAM_TEXTS = (
+    "Робота віддалено, оплата 500 рублей на день",
+    "Удаленно, без досвіду, від 300 рублей за годину, пиши в лс",
+    "Пасивний дохід 100$ щодня, деталі в профілі",
+)
+HAM_WORDS = "привіт як справи сьогодні зустріч о котрій годині дякую все добре подивлюсь ввечері".split()
+PATTERN_COUNTS = (10, 100, 1000, 5000)
+
+
+def make_corpus(rng: random.Random, count: int):
+    """Синтетичні оновлення: звичайні повідомлення, спам, рейди та флуд у CHATS чатах"""
+    updates = []
+    user_id = 10_000
+    while len(updates) < count:
+        chat_id = -1000 - rng.randrange(CHATS)
+        roll = rng.random()
+        if roll < RAID_RATE + FLOOD_RATE + SPAM_RATE:
+            # Спам і флуд — щоразу новий акаунт
+            user_id += 1
+            sender = user_id
+            if roll < RAID_RATE:
+                texts = [rng.choice(SPAM_TEXTS)] * RAID_SIZE
+            elif roll < RAID_RATE + FLOOD_RATE:
+                texts = [rng.choice(HAM_WORDS) for _ in range(FLOOD_SIZE)]
+            else:
+                texts = [rng.choice(SPAM_TEXTS)]
+        else:
+            sender = rng.randint(100, 5000)
+            texts = [" ".join(rng.choice(HAM_WORDS) for _ in range(rng.randint(3, 15)))]
+        for text in texts:
+            updates.append(make_update(len(updates) + 1, chat_id, sender, text))
+    return updates[:count]
+
+
+def read_corpus(path: str):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def write_corpus(path: str, updates):
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(json.dumps(update, ensure_ascii=False) + "\n" for update in updates)
+
+
+def build_dispatcher(bot: Bot, handler_latency: LatencyStats):
+    """Ті самі обробники й компоненти, що збирає SpamBot, плюс вимірювання часу обробки оновлення"""
+    dp = Dispatcher()
+    spam_filter = SpamFilter()
+    member_cache = ChatMemberCache(bot)
+    admin_panel = AdminPanel(bot, dp, spam_filter, 30, 2, member_cache)
+    pipeline = ModerationPipeline(bot, 2, member_cache, admin_panel)
+    admin_panel.moderation = pipeline
+    flood_detector = FloodDetector()
+    admin_panel.flood_detector = flood_detector
+    admin_panel.register_admin_handlers()
+    register_handlers(dp, bot, spam_filter, 30, 2, admin_panel, member_cache, pipeline, flood_detector)
+
+    @dp.update.outer_middleware()
+    async def measure(handler, event, data):
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            handler_latency.observe(time.perf_counter() - start)
+    return dp, spam_filter, admin_panel, pipeline
+
+
+async def replay(updates, concurrency: int, session: FakeSession):
+    bot = Bot(token=TOKEN, session=session)
+    handler_latency = LatencyStats(window=len(updates))
+    dp, spam_filter, admin_panel, pipeline = build_dispatcher(bot, handler_latency)
+    limit = asyncio.Semaphore(concurrency)
+
+    async def feed(update):
+        async with limit:
+            await dp.feed_raw_update(bot, update)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(feed(update) for update in updates))
+    handled = time.perf_counter() - start
+    # Пакетні видалення, звіти рейдів і черга сповіщень адмінам (з повторами після 429)
+    await pipeline.drain()
+    await admin_panel.notifier.close(timeout=60.0)
+    drained = time.perf_counter() - start
+    spam_filter.close()
+    return handled, drained, handler_latency, pipeline, admin_panel.notifier, spam_filter
+
+
+def measure_patterns(texts):
+    """Вартість SpamFilter.find_match для тих самих текстів за різної кількості паттернів"""
+    rng = random.Random(7)
+    rows = []
+    for count in PATTERN_COUNTS:
+        # Окрема тека на кожен набір: SpamFilter зберігає додані паттерни в patterns.json
+        os.chdir(tempfile.mkdtemp())
+        spam_filter = SpamFilter()
+        patterns = {make_pattern(random_word(rng)) for _ in range(count)}
+        start = time.perf_counter()
+        spam_filter.add_patterns(patterns)
+        compile_time = time.perf_counter() - start
+        start = time.perf_counter()
+        hits = sum(1 for text in texts if spam_filter.find_match(text) is not None)
+        elapsed = time.perf_counter() - start
+        spam_filter.close()
+        rows.append((len(spam_filter.patterns), compile_time, elapsed / len(texts), hits))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline replay of Telegram updates through the bot handlers")
+    parser.add_argument("corpus", nargs="?", help="JSONL file with one Update per line (synthetic if omitted)")
+    parser.add_argument("--write", metavar="PATH", help="write the synthetic corpus to PATH and exit")
+    parser.add_argument("--updates", type=int, default=UPDATES, help="size of the synthetic corpus")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--latency", type=float, default=API_LATENCY, help="API call latency, s")
+    parser.add_argument("--jitter", type=float, default=API_JITTER, help="extra random latency up to this, s")
+    parser.add_argument("--rate-limit", type=float, default=RATE_LIMIT, help="share of API calls answered with 429")
+    args = parser.parse_args()
+
+    if args.corpus:
+        updates = read_corpus(args.corpus)
+    else:
+        updates = make_corpus(random.Random(42), args.updates)
+    if args.write:
+        write_corpus(args.write, updates)
+        print(f"Wrote {len(updates)} updates to {args.write}")
+        return
+
+    # Працюємо в тимчасовій теці, щоб не чіпати patterns.json / admins.json;
+    # базові фільтри беремо з репозиторію
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    work_dir = tempfile.mkdtemp()
+    with open(os.path.join(root, "filters.json"), encoding="utf-8") as src, \
+            open(os.path.join(work_dir, "filters.json"), "w", encoding="utf-8") as dst:
+        dst.write(src.read())
+    os.chdir(work_dir)
+
+    session = FakeSession(latency=args.latency, jitter=args.jitter, rate_limit=args.rate_limit)
+    # Логи йдуть тим самим шляхом, що в боті (черга й окремий потік), але не в термінал
+    setup_logging(stream=io.StringIO())
+    handled, drained, handler_latency, pipeline, notifier, spam_filter = asyncio.run(
+        replay(updates, args.concurrency, session))
+    messages = sum(1 for update in updates if "message" in update)
+    latency = handler_latency.summary()
+    moderated = pipeline.moderated
+    calls = sum(session.calls.values()) - session.calls["GetMe"]
+    raids = pipeline.stats()["raids"]
+    print(f"corpus: {len(updates)} updates ({messages} messages), concurrency {args.concurrency}, "
+          f"API latency {args.latency * 1000:.0f}+{args.jitter * 1000:.0f} ms, 429 on {args.rate_limit:.1%} of calls")
+    print(f"replay: {messages / handled:,.0f} msgs/s, handler p50 {latency['p50_ms']:.2f} ms, "
+          f"p99 {latency['p99_ms']:.2f} ms, max {latency['max_ms']:.1f} ms; "
+          f"raid reports and admin queue drained after {drained:.1f} s")
+    print(f"moderated: {moderated} messages (coalesced in raids: {raids['coalesced']}, "
+          f"bulk deletes: {raids['bulk_deletes']}), pattern hits: {sum(spam_filter.hit_counts.values())}")
+    print(f"API calls: {calls} ({calls / max(moderated, 1):.2f} per moderated message), "
+          f"429: {sum(session.rate_limited.values())}, admin reports: {notifier.sent} "
+          f"(retried {notifier.retried}, failed {notifier.failed})")
+    print("  " + ", ".join(f"{name}={count}" for name, count in session.calls.most_common() if name != "GetMe"))
+
+    texts = [update["message"].get("text") or update["message"].get("caption") or ""
+             for update in updates if "message" in update]
+    print("SpamFilter.find_match vs pattern count:")
+    print(f"{'patterns':>10} {'compile ms':>11} {'us/msg':>8} {'hits':>6}")
+    rows = measure_patterns(texts)
+    for count, compile_time, per_message, hits in rows:
+        print(f"{count:>10} {compile_time * 1000:>11.0f} {per_message * 1e6:>8.1f} {hits:>6}")
+
+
+if __name__ == "__main__":
+    main()
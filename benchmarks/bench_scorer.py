@@ -0,0 +1,84 @@
+"""
+Бенчмарк моделі оцінки: навчання на прикладах «Забанити»/«Повернути», час оцінки повідомлення,
+точність на нових текстах, розмір збереженої моделі та час її завантаження.
+
+Тексти синтетичні: спам — варіації типових оголошень (заробіток, розіграші, ставки) з іншими сумами,
+емодзі та словами, не спам — репліки звичайного чату. Числа показують порядок, а не якість на живих даних.
+
+Запуск:
+    uv run python benchmarks/bench_scorer.py
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.normalize import normalize_text  # noqa: E402
+from utils.scorer import SpamScorer  # noqa: E402
+
+TRAIN = 300
+TEST = 5_000
+SPAM_TEMPLATES = (
+    "{e} Шукаю людей на віддалену роботу, дохід від {n}$ на тиждень, пишіть в лс {e}",
+    "Пропоную підробіток {n} грн в день, без досвіду, все навчимо, деталі в особистих",
+    "{e} Розіграш {n} гривень серед підписників! Переходь у канал і забирай приз {e}",
+    "Ставки на спорт з гарантією, прибуток {n}% щодня, пиши в директ {e}",
+    "Інвестиції в крипту, пасивний дохід від {n}$ на місяць, перші результати вже завтра",
+    "Заробіток на телефоні {n} грн за годину, потрібно лише {n2} хвилин на день {e}",
+)
+HAM_WORDS = ("привіт коли сьогодні завтра зустріч о котрій годині дякую добре подивлюсь ввечері "
+             "а хто знає де купити квитки на потяг до львова у нас знову немає світла скинь будь ласка "
+             "фото домашнього завдання хто йде на футбол в суботу класно вийшло молодці").split()
+EMOJI = ("🔥", "💰", "✅", "👉", "❗", "")
+
+
+def make_spam(rng: random.Random) -> str:
+    text = rng.choice(SPAM_TEMPLATES).format(e=rng.choice(EMOJI), n=rng.randint(100, 9000),
+                                            n2=rng.randint(5, 60))
+    words = text.split()
+    words.insert(rng.randrange(len(words)), rng.choice(HAM_WORDS))
+    return " ".join(words)
+
+
+def make_ham(rng: random.Random) -> str:
+    return " ".join(rng.choice(HAM_WORDS) for _ in range(rng.randint(3, 25)))
+
+
+def main():
+    rng = random.Random(42)
+    os.chdir(tempfile.mkdtemp())
+    scorer = SpamScorer("scorer.bin")
+
+    examples = [(make_spam(rng), True) for _ in range(TRAIN)] + [(make_ham(rng), False) for _ in range(TRAIN)]
+    rng.shuffle(examples)
+    start = time.perf_counter()
+    for text, spam in examples:
+        scorer.learn(normalize_text(text), spam)
+    elapsed = time.perf_counter() - start
+    print(f"learn: {len(examples)} examples, {elapsed / len(examples) * 1e6:.0f} us/example")
+
+    tests = [(normalize_text(make_spam(rng)), True) for _ in range(TEST)] + \
+            [(normalize_text(make_ham(rng)), False) for _ in range(TEST)]
+    start = time.perf_counter()
+    verdicts = [scorer.is_spam(text)[0] for text, _ in tests]
+    elapsed = time.perf_counter() - start
+    caught = sum(1 for verdict, (_, spam) in zip(verdicts, tests) if verdict and spam)
+    false = sum(1 for verdict, (_, spam) in zip(verdicts, tests) if verdict and not spam)
+    average = sum(len(text) for text, _ in tests) / len(tests)
+    print(f"score: {elapsed / len(tests) * 1e6:.1f} us/message (avg {average:.0f} chars), "
+          f"spam caught {caught}/{TEST}, false positives {false}/{TEST}")
+
+    # Поза event loop save() пише одразу
+    scorer.save()
+    print(f"model file: {os.path.getsize('scorer.bin') / 1024:.0f} KB")
+    start = time.perf_counter()
+    loaded = SpamScorer("scorer.bin")
+    print(f"load: {(time.perf_counter() - start) * 1000:.0f} ms, "
+          f"same verdicts: {all(loaded.is_spam(text)[0] == verdict for (text, _), verdict in zip(tests, verdicts))}")
+
+
+if __name__ == "__main__":
+    main()
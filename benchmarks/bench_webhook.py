@@ -0,0 +1,151 @@
+"""
+Навантажувальний тест вебхука: локальний aiohttp-сервер з тим самим ланцюжком обробників,
+що й у боті (адмін-панель, SpamFilter, конвеєр модерації), і клієнт, який надсилає
+синтетичні оновлення POST-запитами з X-Telegram-Bot-Api-Secret-Token.
+
+Бот працює з фейковою сесією (benchmarks/fake_session.py), тож виклики API не йдуть у мережу,
+а займають API_LATENCY секунд. Показує req/s, затримку відповіді сервера (Telegram чекає саме її)
+та затримку всього ланцюжка обробників.
+
+Запуск:
+    uv run python benchmarks/bench_webhook.py
+"""
+import asyncio
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import aiohttp  # noqa: E402
+from aiohttp import web  # noqa: E402
+from aiogram import Bot, Dispatcher  # noqa: E402
+
+from core.admin import AdminPanel  # noqa: E402
+from core.handlers import register_handlers  # noqa: E402
+from core.member_cache import ChatMemberCache  # noqa: E402
+from core.moderation import ModerationPipeline  # noqa: E402
+from core.webhook import build_webhook_app  # noqa: E402
+from fake_session import FakeSession, make_update  # noqa: E402
+from utils.log import setup_logging  # noqa: E402
+from utils.metrics import LatencyStats  # noqa: E402
+from utils.regex import SpamFilter  # noqa: E402
+
+TOKEN = "123456:BENCHMARK"
+PATH = "/webhook"
+SECRET = "bench-secret"
+UPDATES = 5000
+CONCURRENCY = 50
+CHATS = 20
+SPAM_RATE = 0.1
+API_LATENCY = 0.02
+SPAM_TEXT = "Робота віддалено, оплата 500 рублей на день"
+HAM_WORDS = "привіт як справи сьогодні зустріч о котрій годині дякую все добре".split()
+
+
+def make_updates(rng: random.Random, count: int):
+    updates = []
+    for update_id in range(1, count + 1):
+        chat_id = -1000 - rng.randrange(CHATS)
+        if rng.random() < SPAM_RATE:
+            updates.append(make_update(update_id, chat_id, 10_000 + update_id, SPAM_TEXT))
+        else:
+            text = " ".join(rng.choice(HAM_WORDS) for _ in range(rng.randint(3, 15)))
+            updates.append(make_update(update_id, chat_id, rng.randint(100, 5000), text))
+    return updates
+
+
+def build_dispatcher(bot: Bot, chain: LatencyStats) -> Dispatcher:
+    """Ті самі обробники, що реєструє SpamBot, плюс вимірювання часу обробки оновлення"""
+    dp = Dispatcher()
+    spam_filter = SpamFilter()
+    member_cache = ChatMemberCache(bot)
+    admin_panel = AdminPanel(bot, dp, spam_filter, 30, 2, member_cache)
+    pipeline = ModerationPipeline(bot, 2, member_cache, admin_panel)
+    admin_panel.register_admin_handlers()
+    register_handlers(dp, bot, spam_filter, 30, 2, admin_panel, member_cache, pipeline)
+
+    @dp.update.outer_middleware()
+    async def measure(handler, event, data):
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            chain.observe(time.perf_counter() - start)
+    return dp
+
+
+async def run():
+    rng = random.Random(42)
+    session = FakeSession(latency=API_LATENCY)
+    bot = Bot(token=TOKEN, session=session)
+    chain = LatencyStats()
+    dp = build_dispatcher(bot, chain)
+    app = build_webhook_app(bot, dp, PATH, SECRET)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    url = f"http://127.0.0.1:{port}{PATH}"
+    handler = app["webhook_handler"]
+
+    updates = make_updates(rng, UPDATES)
+    http = LatencyStats()
+    queue: asyncio.Queue = asyncio.Queue()
+    for update in updates:
+        queue.put_nowait(update)
+
+    async with aiohttp.ClientSession(headers={"X-Telegram-Bot-Api-Secret-Token": SECRET}) as client:
+        async with client.post(url, json=updates[0], headers={"X-Telegram-Bot-Api-Secret-Token": "wrong"}) as response:
+            assert response.status == 401, f"wrong secret accepted: {response.status}"
+
+        async def worker():
+            while not queue.empty():
+                update = queue.get_nowait()
+                start = time.perf_counter()
+                async with client.post(url, json=update) as response:
+                    await response.read()
+                    assert response.status == 200, response.status
+                http.observe(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(CONCURRENCY)))
+        accepted = time.perf_counter() - start
+        while handler.in_flight:
+            await asyncio.sleep(0.01)
+        processed = time.perf_counter() - start
+
+    await runner.cleanup()
+    http_stats, chain_stats = http.summary(), chain.summary()
+    spam = sum(1 for update in updates if update["message"]["text"] == SPAM_TEXT)
+    return "\n".join((
+        f"updates: {UPDATES} (spam: {spam}), concurrency: {CONCURRENCY}, API latency: {API_LATENCY * 1000:.0f} ms",
+        f"accepted:  {UPDATES / accepted:8.0f} req/s  "
+        f"HTTP p50 {http_stats['p50_ms']:.2f} ms, p99 {http_stats['p99_ms']:.2f} ms",
+        f"processed: {UPDATES / processed:8.0f} upd/s  "
+        f"chain p50 {chain_stats['p50_ms']:.2f} ms, p99 {chain_stats['p99_ms']:.2f} ms",
+        "API calls: " + ", ".join(f"{name}={count}" for name, count in session.calls.most_common()),
+    ))
+
+
+def main():
+    # Працюємо в тимчасовій теці, щоб не чіпати patterns.json / admins.json;
+    # базові фільтри беремо з репозиторію
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    work_dir = tempfile.mkdtemp()
+    with open(os.path.join(root, "filters.json"), encoding="utf-8") as src, \
+            open(os.path.join(work_dir, "filters.json"), "w", encoding="utf-8") as dst:
+        dst.write(src.read())
+    os.chdir(work_dir)
+    # Логи йдуть тим самим шляхом, що в боті (черга й окремий потік), але не в термінал
+    setup_logging(stream=io.StringIO())
+    report = asyncio.run(run())
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Фейкова сесія aiogram для бенчмарків: бот працює без мережі, кожен виклик API
+«займає» latency секунд (плюс випадкові до jitter) і повертає правдоподібну відповідь.
+З імовірністю rate_limit виклик відповідає 429 (TelegramRetryAfter), як флуд-контроль Telegram.
+Виклики та відмови рахуються за методами.
+"""
+import asyncio
+import random
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, AsyncGenerator, Dict, Optional
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import (
+    GetChat, GetChatAdministrators, GetChatMember, GetMe, SendMessage, TelegramMethod,
+)
+from aiogram.types import Chat, ChatMemberMember, ChatMemberOwner, Message, User
+
+BOT_USER = User(id=1, is_bot=True, first_name="Bench", username="bench_bot")
+OWNER = User(id=2, is_bot=False, first_name="Owner")
+
+
+class FakeSession(BaseSession):
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, rate_limit: float = 0.0, retry_after: int = 1,
+                 seed: int = 0):
+        super().__init__()
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.calls: Counter = Counter()
+        self.rate_limited: Counter = Counter()
+        self._rng = random.Random(seed)
+        self._message_id = 0
+
+    async def close(self):
+        pass
+
+    async def stream_content(self, url: str, headers: Optional[Dict[str, Any]] = None, timeout: int = 30,
+                             chunk_size: int = 65536, raise_for_status: bool = True) -> AsyncGenerator[bytes, None]:
+        yield b""
+
+    def _result(self, method: TelegramMethod) -> Any:
+        if isinstance(method, GetMe):
+            return BOT_USER
+        if isinstance(method, GetChatAdministrators):
+            return [ChatMemberOwner(user=OWNER, is_anonymous=False)]
+        if isinstance(method, GetChatMember):
+            return ChatMemberMember(user=User(id=method.user_id, is_bot=False, first_name="User"))
+        if isinstance(method, GetChat):
+            return Chat(id=method.chat_id, type="supergroup", title="Bench")
+        if isinstance(method, SendMessage):
+            self._message_id += 1
+            return Message(message_id=self._message_id, date=datetime.now(),
+                           chat=Chat(id=method.chat_id, type="private"), text=method.text)
+        return True
+
+    async def make_request(self, bot: Bot, method: TelegramMethod, timeout: Optional[int] = None) -> Any:
+        name = type(method).__name__
+        self.calls[name] += 1
+        delay = self.latency + (self._rng.random() * self.jitter if self.jitter else 0.0)
+        if delay:
+            await asyncio.sleep(delay)
+        if self.rate_limit and not isinstance(method, GetMe) and self._rng.random() < self.rate_limit:
+            self.rate_limited[name] += 1
+            raise TelegramRetryAfter(method=method, message=f"Too Many Requests: retry after {self.retry_after}",
+                                     retry_after=self.retry_after)
+        return self._result(method)
+
+
+def make_update(update_id: int, chat_id: int, user_id: int, text: str) -> Dict[str, Any]:
+    """Синтетичне оновлення з повідомленням у групі, як його надсилає Telegram"""
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "supergroup", "title": f"Chat {chat_id}"},
+            "from": {"id": user_id, "is_bot": False, "first_name": f"User{user_id}"},
+            "text": text,
+        },
+    }
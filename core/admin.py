@@ -1,21 +1,42 @@
 import asyncio
 import json
+import logging
+import re
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
 from aiogram import Bot, Dispatcher, types
-from aiogram.filters import Command
+from aiogram.filters import Command, StateFilter
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.exceptions import TelegramBadRequest
-from aiogram.enums.chat_member_status import ChatMemberStatus
-from models.settings import ADMIN_IDS, add_dynamic_admin, remove_dynamic_admin, is_env_admin, get_dynamic_admin_ids, \
-    get_admin_ids, get_all_admin_ids
+from core.deleted_messages import DeletedMessage, DeletedMessageStore
+from core.member_cache import ChatMemberCache
+from core.moderation_log import ModerationLog
+from core.notifier import AdminNotifier
+from utils.metrics import LatencyStats
+from models.settings import admin_registry, add_dynamic_admin, remove_dynamic_admin, is_env_admin, \
+    get_dynamic_admin_ids, get_admin_ids, DELETED_MESSAGES_MAX_MB, DELETED_MESSAGES_TTL_HOURS
+
+logger = logging.getLogger(__name__)
+
+# Скільки доданих доменів показувати у списку (повідомлення Telegram обмежене 4096 символами)
+DOMAINS_LIST_LIMIT = 100
+# Скільки останніх рішень адмінів («Забанити»/«Повернути») пам'ятати: повторне натискання
+# не навчає модель оцінки двічі, а змінене рішення скасовує попередній приклад
+TRAINED_LIMIT = 10000
 
 class AdminStates(StatesGroup):
     waiting_for_word_to_add = State()
     waiting_for_word_to_remove = State()
     waiting_for_admin_id_to_add = State()
     waiting_for_admin_id_to_remove = State()
+    waiting_for_chat_word_to_add = State()
+    waiting_for_chat_word_to_remove = State()
+    waiting_for_domain_to_add = State()
+    waiting_for_domain_to_remove = State()
 
 def make_user_tag(user: types.User) -> str:
     """Повертає тегований username або лінк на користувача для Markdown."""
@@ -28,37 +49,64 @@ def make_user_tag(user: types.User) -> str:
     safe_name = name.replace('_', '\\_').replace('*', '\\*').replace('[', '\\[').replace(']', '\\]')
     return f"[{safe_name}](tg://user?id={user.id})"
 
+def safe_code(text: str) -> str:
+    """Готує текст (наприклад, паттерн) для вставки в `code` у Markdown."""
+    return text.replace('`', "'")
+
+def format_histograms(inline: LatencyStats, pool: LatencyStats) -> str:
+    """Гістограма часу перевірки: на місці / в пулі процесів, лише непорожні кошики"""
+    lines = []
+    for (bound, inline_count), (_, pool_count) in zip(inline.histogram(), pool.histogram()):
+        if inline_count or pool_count:
+            label = f"≤{bound:g} мс" if bound != float("inf") else "довше"
+            lines.append(f"  {label}: {inline_count} / {pool_count}")
+    return "\n".join(["• Розподіл (на місці / у пулі):"] + lines) if lines else "• Розподіл: ще немає перевірок"
+
 class AdminPanel:
-    def __init__(self, bot: Bot, dp: Dispatcher, spam_filter, ban_duration_days: int, mute_duration_days: int):
+    def __init__(self, bot: Bot, dp: Dispatcher, spam_filter, ban_duration_days: int, mute_duration_days: int,
+                 member_cache: ChatMemberCache = None, moderation_log: ModerationLog = None):
         self.ban_duration_days = ban_duration_days
         self.mute_duration_days = mute_duration_days
         self.bot = bot
         self.dp = dp
-        self.admin_ids = ADMIN_IDS
+        # Спільний з models.settings реєстр: зміни адмінів одразу видно без перечитування файлів
+        self.admins = admin_registry
         self.spam_filter = spam_filter
-        self.deleted_messages = {}  # Зберігаємо інформацію про видалені повідомлення
+        self.member_cache = member_cache or ChatMemberCache(bot)
+        # Звіти адмінам надсилаються у фоні, щоб не затримувати видалення спаму
+        self.notifier = AdminNotifier(bot)
+        self.moderation = None  # ModerationPipeline, задається в SpamBot (для статистики)
+        self.flood_detector = None  # FloodDetector, задається в SpamBot
+        # (chat_id, message_id) -> чи навчено модель цим повідомленням як спамом
+        self._trained: "OrderedDict[Tuple[int, int], bool]" = OrderedDict()
+        # Видалені повідомлення для кнопки «Повернути»: ключ (chat_id, message_id), LRU + TTL
+        self.deleted_messages = DeletedMessageStore(
+            max_bytes=DELETED_MESSAGES_MAX_MB * 1024 * 1024,
+            ttl=DELETED_MESSAGES_TTL_HOURS * 3600
+        )
+        # Необов'язковий журнал у SQLite: повернення працює і після перезапуску
+        self.moderation_log = moderation_log
         self.pending_actions = {}   # Для сумісності з handler
         self.cleanup_old_messages()
 
     def cleanup_old_messages(self):
-        current_time = datetime.now()
-        old_messages = []
-        for msg_id, msg_info in self.deleted_messages.items():
-            if (current_time - msg_info['timestamp']).total_seconds() > 86400:
-                old_messages.append(msg_id)
-        for msg_id in old_messages:
-            del self.deleted_messages[msg_id]
-        if old_messages:
-            print(f"Cleaned up {len(old_messages)} old messages")
+        removed = self.deleted_messages.evict_expired()
+        if removed:
+            logger.info("Cleaned up %d old messages", removed)
+
+    @property
+    def admin_ids(self) -> frozenset:
+        return self.admins.all_ids
 
     def is_admin(self, user_id: int) -> bool:
-        return user_id in self.admin_ids
+        return self.admins.is_admin(user_id)
 
     async def admin_menu(self, message: types.Message):
         if not self.is_admin(message.from_user.id):
             return
         keyboard = InlineKeyboardMarkup(inline_keyboard=[
             [InlineKeyboardButton(text="📋 Управління словами", callback_data="admin_words")],
+            [InlineKeyboardButton(text="🌐 Управління доменами", callback_data="admin_domains")],
             [InlineKeyboardButton(text="👑 Управління адміністраторами", callback_data="admin_management")],
             [InlineKeyboardButton(text="📊 Статистика", callback_data="admin_stats")],
             [InlineKeyboardButton(text="🆔 Мій ID", callback_data="admin_my_id")]
@@ -74,64 +122,79 @@ class AdminPanel:
         self.dp.message.register(self.admin_add_word, Command("add_word"))
         self.dp.message.register(self.admin_remove_word, Command("remove_word"))
         self.dp.message.register(self.admin_list_words, Command("list_words"))
+        self.dp.message.register(self.admin_add_chat_word, Command("add_chat_word"))
+        self.dp.message.register(self.admin_remove_chat_word, Command("remove_chat_word"))
+        self.dp.message.register(self.admin_list_chat_words, Command("chat_words"))
+        self.dp.message.register(self.admin_add_domain, Command("add_domain"))
+        self.dp.message.register(self.admin_remove_domain, Command("remove_domain"))
+        self.dp.message.register(self.admin_list_domains, Command("domains"))
         self.dp.message.register(self.admin_management, Command("admins"))
         self.dp.message.register(self.admin_add_admin, Command("add_admin"))
         self.dp.message.register(self.admin_remove_admin, Command("remove_admin"))
         self.dp.message.register(self.admin_add_chat_admins, Command("add_chat_admins"))
         self.dp.message.register(self.get_my_id, Command("my_id"))
+        self.dp.message.register(self.user_history, Command("history"))
         self.dp.callback_query.register(self.handle_admin_callback)
-        # FSM
-        self.dp.message.register(self.process_add_word, AdminStates.waiting_for_word_to_add)
-        self.dp.message.register(self.process_remove_word, AdminStates.waiting_for_word_to_remove)
-        self.dp.message.register(self.process_add_admin, AdminStates.waiting_for_admin_id_to_add)
-        self.dp.message.register(self.process_remove_admin, AdminStates.waiting_for_admin_id_to_remove)
+        # FSM: StateFilter асинхронний, а голий State aiogram виконує в пулі потоків для кожного повідомлення
+        self.dp.message.register(self.process_add_word, StateFilter(AdminStates.waiting_for_word_to_add))
+        self.dp.message.register(self.process_remove_word, StateFilter(AdminStates.waiting_for_word_to_remove))
+        self.dp.message.register(self.process_add_admin, StateFilter(AdminStates.waiting_for_admin_id_to_add))
+        self.dp.message.register(self.process_remove_admin, StateFilter(AdminStates.waiting_for_admin_id_to_remove))
+        self.dp.message.register(self.process_add_chat_word, StateFilter(AdminStates.waiting_for_chat_word_to_add))
+        self.dp.message.register(self.process_remove_chat_word, StateFilter(AdminStates.waiting_for_chat_word_to_remove))
+        self.dp.message.register(self.process_add_domain, StateFilter(AdminStates.waiting_for_domain_to_add))
+        self.dp.message.register(self.process_remove_domain, StateFilter(AdminStates.waiting_for_domain_to_remove))
 
-    async def forward_deleted_message(self, message: types.Message, chat_id: int, user_id: int):
+    async def forward_deleted_message(self, message: types.Message, chat_id: int, user_id: int, match=None,
+                                      removed: int = 1):
+        """Звіт адмінам про видалене повідомлення; removed > 1 — зведений звіт про серію (рейд)"""
         try:
-            message_info = {
-                'user_id': user_id,
-                'chat_id': chat_id,
-                'text': message.text,
-                'timestamp': datetime.now(),
-                'user_username': message.from_user.username,
-                'user_first_name': message.from_user.first_name,
-                'user_last_name': message.from_user.last_name,
-                'chat_title': message.chat.title,
-                'chat_username': message.chat.username,
-                'message_id': message.message_id
-            }
-            self.deleted_messages[message.message_id] = message_info
+            message_info = DeletedMessage(
+                chat_id=chat_id,
+                message_id=message.message_id,
+                user_id=user_id,
+                text=message.text or message.caption,
+                pattern=match.pattern if match else None,
+                removed=removed,
+                user_username=message.from_user.username,
+                user_first_name=message.from_user.first_name,
+                user_last_name=message.from_user.last_name,
+                chat_title=message.chat.title,
+                chat_username=message.chat.username
+            )
+            self.deleted_messages.add(message_info)
+            if self.moderation_log is not None:
+                self.moderation_log.record_deleted(message_info)
             keyboard = InlineKeyboardMarkup(inline_keyboard=[
                 [
-                    InlineKeyboardButton(text="🚫 Забанити", callback_data=f"ban_user:{user_id}:{chat_id}"),
+                    InlineKeyboardButton(text="🚫 Забанити", callback_data=f"ban_user:{user_id}:{message.message_id}:{chat_id}"),
                     InlineKeyboardButton(text="✅ Повернути",
                                          callback_data=f"restore_msg:{message.message_id}:{chat_id}")
                 ]
             ])
             user_display = make_user_tag(message.from_user)
-            chat_display = message_info['chat_title'] or message_info['chat_username'] or f"Chat{chat_id}"
+            chat_display = message_info.chat_title or message_info.chat_username or f"Chat{chat_id}"
             # Важливо: екранувати текст повідомлення для Markdown!
-            safe_text = (message.text or "").replace('_', '\\_').replace('*', '\\*').replace('[', '\\[').replace(']', '\\]')
+            safe_text = (message_info.text or "").replace('_', '\\_').replace('*', '\\*').replace('[', '\\[').replace(']', '\\]')
+            removed_text = f"🗑 **Видалено повідомлень:** {removed}\n" if removed > 1 else ""
             admin_message_text = (
                 f"🔍 **Видалене повідомлення**\n\n"
                 f"👤 **Користувач:** {user_display}\n"
                 f"🆔 **ID:** `{user_id}`\n"
                 f"💬 **Чат:** {chat_display}\n"
-                f"📅 **Час:** {datetime.now().strftime('%H:%M:%S')}\n\n"
-                f"📝 **Текст:**\n`{safe_text}`"
+                f"📅 **Час:** {datetime.now().strftime('%H:%M:%S')}\n"
+                f"🎯 **Паттерн:** `{safe_code(message_info.pattern or '—')}`\n"
+                f"{removed_text}\n"
+                f"📝 **Текст{' (перше повідомлення)' if removed > 1 else ''}:**\n`{safe_text}`"
+            )
+            self.notifier.notify(
+                self.admin_ids,
+                admin_message_text,
+                reply_markup=keyboard,
+                parse_mode="Markdown"
             )
-            for admin_id in self.admin_ids:
-                try:
-                    await self.bot.send_message(
-                        chat_id=admin_id,
-                        text=admin_message_text,
-                        reply_markup=keyboard,
-                        parse_mode="Markdown"
-                    )
-                except Exception as e:
-                    print(f"Error sending message to admin {admin_id}: {e}")
         except Exception as e:
-            print(f"Error processing deleted message: {e}")
+            logger.exception("Error processing deleted message: %s", e)
 
     async def handle_admin_callback(self, callback: types.CallbackQuery, state: FSMContext):
         if not self.is_admin(callback.from_user.id):
@@ -140,6 +203,8 @@ class AdminPanel:
         data = callback.data
         if data == "admin_words":
             await self.show_words_menu(callback)
+        elif data == "admin_domains":
+            await self.show_domains_menu(callback)
         elif data == "admin_management":
             await self.show_admin_management(callback)
         elif data == "admin_stats":
@@ -154,6 +219,12 @@ class AdminPanel:
             await self.start_remove_word(callback, state)
         elif data == "list_words_btn":
             await self.show_words_list(callback)
+        elif data == "add_domain_btn":
+            await self.start_add_domain(callback, state)
+        elif data == "remove_domain_btn":
+            await self.start_remove_domain(callback, state)
+        elif data == "list_domains_btn":
+            await self.show_domains_list(callback)
         elif data == "add_admin_btn":
             await self.start_add_admin(callback, state)
         elif data == "remove_admin_btn":
@@ -170,6 +241,7 @@ class AdminPanel:
     async def admin_main_callback(self, callback: types.CallbackQuery):
         keyboard = InlineKeyboardMarkup(inline_keyboard=[
             [InlineKeyboardButton(text="📋 Управління словами", callback_data="admin_words")],
+            [InlineKeyboardButton(text="🌐 Управління доменами", callback_data="admin_domains")],
             [InlineKeyboardButton(text="👑 Управління адміністраторами", callback_data="admin_management")],
             [InlineKeyboardButton(text="📊 Статистика", callback_data="admin_stats")],
             [InlineKeyboardButton(text="🆔 Мій ID", callback_data="admin_my_id")]
@@ -193,6 +265,24 @@ class AdminPanel:
             parse_mode="Markdown"
         )
 
+    async def show_domains_menu(self, callback: types.CallbackQuery):
+        domain_stats = self.spam_filter.get_domain_stats()
+        keyboard = InlineKeyboardMarkup(inline_keyboard=[
+            [InlineKeyboardButton(text="➕ Додати домен", callback_data="add_domain_btn")],
+            [InlineKeyboardButton(text="➖ Видалити домен", callback_data="remove_domain_btn")],
+            [InlineKeyboardButton(text="📋 Список доменів", callback_data="list_domains_btn")],
+            [InlineKeyboardButton(text="🔙 Назад", callback_data="admin_main")]
+        ])
+        await callback.message.edit_text(
+            f"🌐 **Заблоковані домени**\n\n"
+            f"• Базовий список: {domain_stats['base']}\n"
+            f"• Додано через панель: {domain_stats['dynamic']}\n\n"
+            f"Посилання на домен зі списку (і на його піддомени) видаляються як спам. "
+            f"`*.example.com` блокує лише піддомени.",
+            reply_markup=keyboard,
+            parse_mode="Markdown"
+        )
+
     async def show_admin_management(self, callback: types.CallbackQuery):
         env_admins = get_admin_ids()
         dynamic_admins = get_dynamic_admin_ids()
@@ -216,20 +306,97 @@ class AdminPanel:
 
     async def show_stats(self, callback: types.CallbackQuery):
         patterns = self.spam_filter.get_patterns()
+        base_count = len(self.spam_filter.default_patterns & set(patterns))
         env_admins = get_admin_ids()
         dynamic_admins = get_dynamic_admin_ids()
+        compile_stats = self.spam_filter.get_compile_stats()
+        overlay_stats = self.spam_filter.get_overlay_stats()
+        domain_stats = self.spam_filter.get_domain_stats()
+        fingerprint_stats = self.spam_filter.get_fingerprint_stats()
+        pattern_stats = self.spam_filter.get_pattern_stats()
+        member_stats = self.member_cache.stats()
+        notify_stats = self.notifier.stats()
+        store_stats = self.deleted_messages.stats()
+        log_text = ""
+        if self.moderation_log is not None:
+            log_stats = self.moderation_log.stats()
+            try:
+                counts = await self.moderation_log.action_counts(time.time() - 24 * 3600)
+            except Exception as e:
+                logger.error("Error reading moderation log: %s", e)
+                counts = {}
+            log_text = (
+                f"\n🗄 **Журнал модерації (24 год):**\n"
+                f"• Видалено: {counts.get('delete', 0)}, м'ютів: {counts.get('restrict', 0)}, "
+                f"банів: {counts.get('ban', 0)}, повернено: {counts.get('restore', 0)}\n"
+                f"• Записано: {log_stats['written']}, у черзі: {log_stats['pending']}\n"
+            )
+        moderation_text = ""
+        if self.moderation is not None:
+            moderation = self.moderation.stats()
+            moderation_text = (
+                f"\n⏱ **Швидкість реакції:**\n"
+                f"• Час до видалення: p50 {moderation['time_to_removal']['p50_ms']:.0f} мс, "
+                f"p99 {moderation['time_to_removal']['p99_ms']:.0f} мс\n"
+                f"• Видалення: {moderation['delete']['p50_ms']:.0f} мс, "
+                f"статус автора: {moderation['member_lookup']['p50_ms']:.0f} мс, "
+                f"м'ют: {moderation['restrict']['p50_ms']:.0f} мс (p50)\n"
+            )
+        scorer_stats = self.spam_filter.get_scorer_stats()
+        scorer_text = ""
+        if scorer_stats is not None:
+            scorer_text = (f"• Модель оцінки: прикладів спаму {scorer_stats['spam_examples']}, "
+                           f"не спаму {scorer_stats['ham_examples']}"
+                           f"{'' if scorer_stats['ready'] else ' (навчається)'}, спрацювань: {scorer_stats['hits']}\n")
+        flood_text = ""
+        if self.flood_detector is not None:
+            flood_stats = self.flood_detector.stats()
+            flood_text = (f"• Флуд ({self.flood_detector.messages} повідомлень за {self.flood_detector.window:g} с): "
+                          f"{flood_stats['floods']}, відстежується користувачів: {flood_stats['tracked']}\n")
+        match_histogram = format_histograms(self.spam_filter.match_time, self.spam_filter.pool_match_time)
+        total_hits = sum(hits for _, hits, _ in pattern_stats)
+        total_false = sum(false_hits for _, _, false_hits in pattern_stats)
+        dead_count = sum(1 for _, hits, _ in pattern_stats if not hits)
+        top_text = "\n".join(
+            f"• `{safe_code(pattern)}` — {hits} (хибних: {false_hits})"
+            for pattern, hits, false_hits in pattern_stats[:5] if hits
+        ) or "• Ще не було спрацювань"
         stats_text = f"""
 📊 **Статистика бота**
 
 🔍 **Фільтри:**
 • Слів фільтрації: {len(patterns)}
-• Базових фільтрів: 4 (з filters.json)
+• Базових фільтрів: {base_count} (з filters.json)
+• Динамічних: {len(patterns) - base_count}
+• Чатів з власними фільтрами: {overlay_stats['chats']} (наборів: {overlay_stats['compiled_sets']})
+• Компіляція: {compile_stats['compile']['last_ms']:.1f} мс (макс. {compile_stats['compile']['max_ms']:.1f} мс)
+• Застосування змін: {compile_stats['swap']['last_ms']:.1f} мс
+• Перевірка повідомлення: p99 {compile_stats['match']['p99_ms']:.2f} мс (макс. {compile_stats['match']['max_ms']:.2f} мс)
+• У пулі процесів (довгі): {compile_stats['pool_match']['count']}, p99 {compile_stats['pool_match']['p99_ms']:.2f} мс
+{match_histogram}
+• На карантині (повільний шлях): {len(self.spam_filter.quarantined)}
+• Заблокованих доменів: {domain_stats['total']} (додано через панель: {domain_stats['dynamic']}), спрацювань: {domain_stats['hits']}
+• Відбитків спаму: {fingerprint_stats['entries']}, знайдено копій: {fingerprint_stats['hits']}
+{scorer_text}
+🎯 **Спрацювання:**
+• Всього: {total_hits} (хибних: {total_false})
+• Без жодного спрацювання: {dead_count}
+{flood_text}{top_text}
 
 👑 **Адміністратори:**
 • З .env: {len(env_admins)}
 • Динамічних: {len(dynamic_admins)}
 • Всього: {len(env_admins) + len(dynamic_admins)}
 
+👥 **Кеш статусів учасників:**
+• Влучань: {member_stats['hits']} / промахів: {member_stats['misses']} ({member_stats['hit_rate']:.0%})
+• Запитів до API: {member_stats['api_calls']}, записів: {member_stats['size']}, чатів: {member_stats['chats']}
+
+📨 **Сповіщення адмінам:**
+• Надіслано: {notify_stats['sent']}, у черзі: {notify_stats['queued']}
+• Повторів після 429: {notify_stats['retried']}, помилок: {notify_stats['failed']}, відкинуто: {notify_stats['dropped']}
+• Збережено для повернення: {store_stats['count']} ({store_stats['bytes'] / 1024:.0f} / {store_stats['max_bytes'] / 1024:.0f} КБ)
+{moderation_text}{log_text}
 🤖 **Статус:** Активний
 📅 **Дата:** {datetime.now().strftime('%d.%m.%Y')}
 ⏰ **Час:** {datetime.now().strftime('%H:%M:%S')}
@@ -295,6 +462,44 @@ class AdminPanel:
             parse_mode="Markdown"
         )
 
+    async def start_add_domain(self, callback: types.CallbackQuery, state: FSMContext):
+        await callback.message.edit_text(
+            "📝 Введіть домен або посилання (кілька — по одному в рядку):",
+            reply_markup=InlineKeyboardMarkup(inline_keyboard=[
+                [InlineKeyboardButton(text="🔙 Назад", callback_data="admin_domains")]
+            ])
+        )
+        await state.set_state(AdminStates.waiting_for_domain_to_add)
+
+    async def start_remove_domain(self, callback: types.CallbackQuery, state: FSMContext):
+        await callback.message.edit_text(
+            "🗑 Введіть домен для видалення зі списку блокування:",
+            reply_markup=InlineKeyboardMarkup(inline_keyboard=[
+                [InlineKeyboardButton(text="🔙 Назад", callback_data="admin_domains")]
+            ])
+        )
+        await state.set_state(AdminStates.waiting_for_domain_to_remove)
+
+    async def show_domains_list(self, callback: types.CallbackQuery):
+        keyboard = InlineKeyboardMarkup(inline_keyboard=[
+            [InlineKeyboardButton(text="🔙 Назад", callback_data="admin_domains")]
+        ])
+        await callback.message.edit_text(
+            self._domains_text(),
+            reply_markup=keyboard
+        )
+
+    def _domains_text(self) -> str:
+        """Домени, додані через панель (базовий список може мати сотні тисяч записів — лише кількість)"""
+        domains = self.spam_filter.domains.get_domains()
+        base_count = self.spam_filter.domains.base_count
+        base_text = f"\n\n📦 У базовому списку: {base_count}" if base_count else ""
+        if not domains:
+            return "🌐 Доданих доменів немає" + base_text
+        shown = "\n".join(f"• {domain}" for domain in domains[:DOMAINS_LIST_LIMIT])
+        more = f"\n… і ще {len(domains) - DOMAINS_LIST_LIMIT}" if len(domains) > DOMAINS_LIST_LIMIT else ""
+        return f"🌐 Заблоковані домени:\n\n{shown}{more}{base_text}"
+
     async def start_add_admin(self, callback: types.CallbackQuery, state: FSMContext):
         await callback.message.edit_text(
             "🆔 Введіть ID користувача для додавання як адміністратора:",
@@ -313,15 +518,47 @@ class AdminPanel:
         )
         await state.set_state(AdminStates.waiting_for_admin_id_to_remove)
 
+    def _train(self, chat_id: int, message_id: int, text: Optional[str], spam: bool):
+        """Навчає модель оцінки рішенням адміна щодо видаленого повідомлення"""
+        if self.spam_filter.scorer is None or not text:
+            return
+        key = (chat_id, message_id)
+        previous = self._trained.get(key)
+        if previous == spam:
+            return
+        if previous is not None:
+            self.spam_filter.learn(text, previous, weight=-1)
+        self.spam_filter.learn(text, spam)
+        self._trained[key] = spam
+        self._trained.move_to_end(key)
+        while len(self._trained) > TRAINED_LIMIT:
+            self._trained.popitem(last=False)
+
+    async def _find_deleted(self, chat_id: int, msg_id: int) -> Optional[DeletedMessage]:
+        msg_info = self.deleted_messages.get(chat_id, msg_id)
+        if msg_info is None and self.moderation_log is not None:
+            # Після перезапуску або витіснення з пам'яті — шукаємо в журналі
+            msg_info = await self.moderation_log.get_deleted(chat_id, msg_id)
+        return msg_info
+
     async def ban_user_from_callback(self, callback: types.CallbackQuery, data: str):
         try:
-            _, user_id, chat_id = data.split(":")
-            user_id, chat_id = int(user_id), int(chat_id)
+            # ban_user:<user_id>:<message_id>:<chat_id>; у старих звітах message_id немає
+            parts = data.split(":")
+            user_id, chat_id = int(parts[1]), int(parts[-1])
+            msg_id = int(parts[2]) if len(parts) == 4 else None
             await self.bot.ban_chat_member(
                 chat_id=chat_id,
                 user_id=user_id,
                 until_date=datetime.now() + timedelta(days=self.ban_duration_days)
             )
+            if self.moderation_log is not None:
+                self.moderation_log.record_action(chat_id, user_id, "ban", actor_id=callback.from_user.id)
+            if msg_id is not None:
+                # Бан підтверджує, що видалене повідомлення — спам
+                msg_info = await self._find_deleted(chat_id, msg_id)
+                if msg_info is not None:
+                    self._train(chat_id, msg_id, msg_info.text, spam=True)
             await callback.answer("✅ Користувача забанено на 30 днів")
             await callback.message.edit_text(
                 callback.message.text + "\n\n🚫 **Користувача забанено**",
@@ -334,25 +571,35 @@ class AdminPanel:
         try:
             _, msg_id, chat_id = data.split(":")
             msg_id, chat_id = int(msg_id), int(chat_id)
-            if msg_id in self.deleted_messages:
-                msg_info = self.deleted_messages[msg_id]
+            msg_info = await self._find_deleted(chat_id, msg_id)
+            if msg_info is not None:
+                self.spam_filter.record_false_positive(msg_info.pattern)
+                if msg_info.text:
+                    # Повернене повідомлення — не спам: його копії більше не видаляються за відбитком
+                    self.spam_filter.forget_spam(msg_info.text)
+                self._train(chat_id, msg_id, msg_info.text, spam=False)
+                if self.flood_detector is not None:
+                    # Після зняття м'юту лічильник флуду починається з нуля
+                    self.flood_detector.reset(chat_id, msg_info.user_id)
+                if self.moderation_log is not None:
+                    self.moderation_log.record_action(chat_id, msg_info.user_id, "restore", msg_id,
+                                                      actor_id=callback.from_user.id, pattern=msg_info.pattern)
                 user_display = make_user_tag(types.User(
-                    id=msg_info['user_id'],
+                    id=msg_info.user_id,
                     is_bot=False,
-                    first_name=msg_info.get('user_first_name', ''),
-                    last_name=msg_info.get('user_last_name', ''),
-                    username=msg_info.get('user_username', None),
+                    first_name=msg_info.user_first_name or '',
+                    last_name=msg_info.user_last_name or '',
+                    username=msg_info.user_username,
                     language_code=None
                 ))
                 # Важливо: екранувати текст для Markdown!
-                safe_text = (msg_info['text'] or "").replace('_', '\\_').replace('*', '\\*').replace('[', '\\[').replace(']', '\\]')
+                safe_text = (msg_info.text or "").replace('_', '\\_').replace('*', '\\*').replace('[', '\\[').replace(']', '\\]')
                 restore_text = f"📝 **Повернене повідомлення від {user_display}:**\n{safe_text}"
                 try:
-                    chat_member = await self.bot.get_chat_member(chat_id, msg_info['user_id'])
-                    if chat_member.status not in [ChatMemberStatus.ADMINISTRATOR, ChatMemberStatus.CREATOR]:
+                    if not await self.member_cache.is_admin(chat_id, msg_info.user_id):
                         await self.bot.restrict_chat_member(
                             chat_id=chat_id,
-                            user_id=msg_info['user_id'],
+                            user_id=msg_info.user_id,
                             permissions=types.ChatPermissions(
                                 can_send_messages=True,
                                 can_send_media_messages=True,
@@ -366,7 +613,7 @@ class AdminPanel:
                             ),
                         )
                 except Exception as e:
-                    print(e)
+                    logger.warning("Failed to restore user permissions: %s", e)
                 try:
                     await self.bot.send_message(
                         chat_id=chat_id,
@@ -376,7 +623,7 @@ class AdminPanel:
                     await callback.answer(f"✅ Повідомлення повернуто анонімно\n\n👤 Користувача {user_display} відновлено")
                     return
                 except Exception as e:
-                    print(f"Failed to send anonymously: {e}")
+                    logger.warning("Failed to send anonymously: %s", e)
                     try:
                         await self.bot.send_message(
                             chat_id=chat_id,
@@ -385,7 +632,7 @@ class AdminPanel:
                         )
                         await callback.answer("✅ Повідомлення повернуто від імені бота")
                     except Exception as e2:
-                        print(f"Failed to send as bot: {e2}")
+                        logger.error("Failed to send as bot: %s", e2)
                         await callback.answer("❌ Не вдалося повернути повідомлення")
                         return
                 await callback.message.edit_text(
@@ -455,13 +702,8 @@ class AdminPanel:
         try:
             chat_id = callback.message.chat.id
             chat_admins = await self.bot.get_chat_administrators(chat_id)
-            added_count = 0
-            for admin in chat_admins:
-                if admin.user.id != self.bot.id:
-                    if add_dynamic_admin(admin.user.id):
-                        added_count += 1
+            added_count = self.admins.add(admin.user.id for admin in chat_admins if admin.user.id != self.bot.id)
             await callback.answer(f"✅ Додано {added_count} адміністраторів чату")
-            self.admin_ids = ADMIN_IDS
         except Exception as e:
             await callback.answer(f"❌ Помилка: {e}")
 
@@ -479,6 +721,35 @@ class AdminPanel:
             parse_mode="Markdown"
         )
 
+    async def user_history(self, message: types.Message):
+        if not self.is_admin(message.from_user.id):
+            return
+        if self.moderation_log is None:
+            await message.answer("❌ Журнал модерації вимкнено (MODERATION_DB_PATH)")
+            return
+        try:
+            user_id = int(message.text.split()[1])
+        except (IndexError, ValueError):
+            await message.answer("❌ Використання: /history <user_id>")
+            return
+        try:
+            history = await self.moderation_log.user_history(user_id)
+        except Exception as e:
+            await message.answer(f"❌ Помилка читання журналу: {e}")
+            return
+        if not history:
+            await message.answer(f"📭 Для `{user_id}` записів немає", parse_mode="Markdown")
+            return
+        lines = [
+            f"• {datetime.fromtimestamp(entry['timestamp']).strftime('%d.%m %H:%M')} — {entry['action']} "
+            f"(чат `{entry['chat_id']}`{', паттерн `' + safe_code(entry['pattern']) + '`' if entry['pattern'] else ''})"
+            for entry in history
+        ]
+        await message.answer(
+            f"📜 **Історія користувача** `{user_id}`:\n\n" + "\n".join(lines),
+            parse_mode="Markdown"
+        )
+
     async def admin_management(self, message: types.Message):
         if not self.is_admin(message.from_user.id):
             return
@@ -513,9 +784,8 @@ class AdminPanel:
         try:
             admin_id = int(message.text.strip())
             if add_dynamic_admin(admin_id):
-                self.admin_ids = get_all_admin_ids()
                 await message.answer(f"✅ Користувача {admin_id} додано як адміністратора")
-                print(f"✅ Updated admin list: {self.admin_ids}")
+                logger.info("Updated admin list: %s", self.admin_ids)
             else:
                 await message.answer(f"❌ Користувач {admin_id} вже є адміністратором або не може бути доданий")
             await state.clear()
@@ -540,9 +810,8 @@ class AdminPanel:
             if is_env_admin(admin_id):
                 await message.answer(f"❌ Не можна видалити адміністратора {admin_id} (доданий через .env)")
             elif remove_dynamic_admin(admin_id):
-                self.admin_ids = get_all_admin_ids()
                 await message.answer(f"✅ Користувача {admin_id} видалено з адміністраторів")
-                print(f"✅ Updated admin list: {self.admin_ids}")
+                logger.info("Updated admin list: %s", self.admin_ids)
             else:
                 await message.answer(f"❌ Користувач {admin_id} не є адміністратором")
             await state.clear()
@@ -559,12 +828,7 @@ class AdminPanel:
         try:
             chat_id = message.chat.id
             chat_admins = await self.bot.get_chat_administrators(chat_id)
-            added_count = 0
-            for admin in chat_admins:
-                if admin.user.id != self.bot.id:
-                    if add_dynamic_admin(admin.user.id):
-                        added_count += 1
-            self.admin_ids = get_all_admin_ids()
+            added_count = self.admins.add(admin.user.id for admin in chat_admins if admin.user.id != self.bot.id)
             await message.answer(f"✅ Додано {added_count} адміністраторів чату до бота")
         except Exception as e:
             await message.answer(f"❌ Помилка додавання адміністраторів чату: {e}")
@@ -584,14 +848,47 @@ class AdminPanel:
             await state.clear()
             return
         try:
-            self.spam_filter.add_pattern(word)
-            await message.answer(f"✅ Слово '{word}' додано до списку фільтрації")
-            await message.answer("✅ Список фільтрації оновлено")
+            # Кілька слів (по одному в рядку) додаються однією перекомпіляцією
+            words = [line.strip() for line in word.splitlines() if line.strip()]
+            words, slow = await self._screen_patterns(message, words)
+            if not words:
+                await state.clear()
+                return
+            added = self.spam_filter.add_patterns(words)
+            self.spam_filter.quarantine_patterns(slow)
+            # Підтвердження — лише коли новий набір скомпільовано й він уже діє
+            await self.spam_filter.wait_compiled()
+            if len(words) == 1:
+                await message.answer(f"✅ Слово '{words[0]}' додано до списку фільтрації")
+            else:
+                await message.answer(f"✅ Додано {added} слів до списку фільтрації")
+            if slow:
+                await message.answer(
+                    f"🐢 Повільні паттерни перевірятимуться окремо, з таймаутом: {', '.join(slow)}"
+                )
+            await state.clear()
+        except re.error as e:
+            await message.answer(f"❌ Паттерн не додано, список фільтрації не змінено: {e}")
             await state.clear()
         except Exception as e:
             await message.answer(f"❌ Помилка додавання слова: {e}")
             await state.clear()
 
+    async def _screen_patterns(self, message: types.Message, words: List[str]) -> Tuple[List[str], List[str]]:
+        """Перевіряє паттерни на ReDoS; повертає (прийняті, повільні), про відхилені повідомляє адміну"""
+        accepted, slow = [], []
+        for word in words:
+            report = await self.spam_filter.check_pattern(word)
+            if report.rejected:
+                await message.answer(
+                    f"❌ Паттерн '{word}' відхилено: {'; '.join(report.issues)}"
+                )
+                continue
+            accepted.append(word)
+            if report.slow:
+                slow.append(word)
+        return accepted, slow
+
     async def admin_remove_word(self, message: types.Message, state: FSMContext):
         if not self.is_admin(message.from_user.id):
             return
@@ -603,8 +900,11 @@ class AdminPanel:
             return
         word = message.text.strip()
         try:
-            removed = self.spam_filter.remove_pattern(word)
-            if removed:
+            words = [line.strip() for line in word.splitlines() if line.strip()]
+            removed = self.spam_filter.remove_patterns(words)
+            if len(words) > 1:
+                await message.answer(f"✅ Видалено {removed} слів зі списку фільтрації")
+            elif removed:
                 await message.answer(f"✅ Слово '{word}' видалено зі списку фільтрації")
             else:
                 await message.answer(f"❌ Слово '{word}' не знайдено в списку фільтрації")
@@ -624,4 +924,116 @@ class AdminPanel:
                 parse_mode="Markdown"
             )
         else:
-            await message.answer("📋 Список слів фільтрації порожній")
\ No newline at end of file
+            await message.answer("📋 Список слів фільтрації порожній")
+
+    async def admin_add_chat_word(self, message: types.Message, state: FSMContext):
+        if not self.is_admin(message.from_user.id):
+            return
+        await message.answer("📝 Введіть слово або регулярний вираз, який діятиме лише в цьому чаті:")
+        await state.set_state(AdminStates.waiting_for_chat_word_to_add)
+
+    async def process_add_chat_word(self, message: types.Message, state: FSMContext):
+        if not self.is_admin(message.from_user.id):
+            return
+        word = message.text.strip()
+        try:
+            accepted, slow = await self._screen_patterns(message, [word])
+            if not accepted:
+                await state.clear()
+                return
+            if self.spam_filter.add_chat_pattern(message.chat.id, word):
+                self.spam_filter.quarantine_patterns(slow)
+                await self.spam_filter.wait_compiled()
+                await message.answer(f"✅ Слово '{word}' додано до фільтрації цього чату")
+            else:
+                await message.answer(f"❌ Слово '{word}' вже фільтрується в цьому чаті")
+            await state.clear()
+        except re.error as e:
+            await message.answer(f"❌ Паттерн не додано, список фільтрації не змінено: {e}")
+            await state.clear()
+        except Exception as e:
+            await message.answer(f"❌ Помилка додавання слова: {e}")
+            await state.clear()
+
+    async def admin_remove_chat_word(self, message: types.Message, state: FSMContext):
+        if not self.is_admin(message.from_user.id):
+            return
+        await message.answer("🗑 Введіть слово, яке треба прибрати з фільтрації цього чату:")
+        await state.set_state(AdminStates.waiting_for_chat_word_to_remove)
+
+    async def process_remove_chat_word(self, message: types.Message, state: FSMContext):
+        if not self.is_admin(message.from_user.id):
+            return
+        word = message.text.strip()
+        try:
+            if self.spam_filter.remove_chat_pattern(message.chat.id, word):
+                await message.answer(f"✅ Слово '{word}' більше не фільтрується в цьому чаті")
+            else:
+                await message.answer(f"❌ Слово '{word}' не знайдено у фільтрах цього чату")
+            await state.clear()
+        except Exception as e:
+            await message.answer(f"❌ Помилка видалення слова: {e}")
+            await state.clear()
+
+    async def admin_add_domain(self, message: types.Message, state: FSMContext):
+        if not self.is_admin(message.from_user.id):
+            return
+        await message.answer("📝 Введіть домен або посилання (кілька — по одному в рядку):")
+        await state.set_state(AdminStates.waiting_for_domain_to_add)
+
+    async def process_add_domain(self, message: types.Message, state: FSMContext):
+        if not self.is_admin(message.from_user.id):
+            return
+        try:
+            lines = [line.strip() for line in message.text.splitlines() if line.strip()]
+            added, invalid = self.spam_filter.add_domains(lines)
+            if added:
+                await message.answer(f"✅ Додано до списку блокування: {', '.join(added)}")
+            elif not invalid:
+                await message.answer("ℹ️ Ці домени вже є у списку блокування")
+            if invalid:
+                await message.answer(f"❌ Не схоже на домен: {', '.join(invalid)}")
+            await state.clear()
+        except Exception as e:
+            await message.answer(f"❌ Помилка додавання домену: {e}")
+            await state.clear()
+
+    async def admin_remove_domain(self, message: types.Message, state: FSMContext):
+        if not self.is_admin(message.from_user.id):
+            return
+        await message.answer("🗑 Введіть домен для видалення зі списку блокування:")
+        await state.set_state(AdminStates.waiting_for_domain_to_remove)
+
+    async def process_remove_domain(self, message: types.Message, state: FSMContext):
+        if not self.is_admin(message.from_user.id):
+            return
+        try:
+            lines = [line.strip() for line in message.text.splitlines() if line.strip()]
+            removed = self.spam_filter.remove_domains(lines)
+            if removed:
+                await message.answer(f"✅ Видалено зі списку блокування: {removed}")
+            else:
+                await message.answer("❌ Домен не знайдено серед доданих через панель "
+                                     "(базовий список змінюється лише у файлі)")
+            await state.clear()
+        except Exception as e:
+            await message.answer(f"❌ Помилка видалення домену: {e}")
+            await state.clear()
+
+    async def admin_list_domains(self, message: types.Message):
+        if not self.is_admin(message.from_user.id):
+            return
+        await message.answer(self._domains_text())
+
+    async def admin_list_chat_words(self, message: types.Message):
+        if not self.is_admin(message.from_user.id):
+            return
+        added, excluded = self.spam_filter.get_chat_patterns(message.chat.id)
+        added_text = "\n".join([f"• {pattern}" for pattern in added]) if added else "Немає"
+        excluded_text = "\n".join([f"• {pattern}" for pattern in excluded]) if excluded else "Немає"
+        await message.answer(
+            f"💬 **Фільтри цього чату**\n\n"
+            f"➕ **Додаткові слова:**\n{added_text}\n\n"
+            f"➖ **Вимкнені глобальні слова:**\n{excluded_text}",
+            parse_mode="Markdown"
+        )
@@ -1,10 +1,21 @@
 import asyncio
+import logging
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from core.handlers import register_handlers
 from core.admin import AdminPanel
+from core.member_cache import ChatMemberCache
+from core.moderation import ModerationPipeline
+from core.moderation_log import ModerationLog
+from core.notifier import GLOBAL_RATE_LIMIT
+from core.sharding import ShardWorker
+from core.webhook import build_webhook_app, run_webhook
+from models.settings import FLOOD_MESSAGES, FLOOD_WINDOW_SECONDS, MODERATION_DB_PATH
+from utils.flood import FloodDetector
 from utils.regex import SpamFilter
 
+logger = logging.getLogger(__name__)
+
 class SpamBot:
     def __init__(self, bot_token, spam_filter, ban_duration_days, mute_duration_days, dp):
         """
@@ -22,19 +33,96 @@ class SpamBot:
         self.spam_filter = spam_filter
         self.ban_duration_days = ban_duration_days
         self.mute_duration_days = mute_duration_days
+        # Спільний кеш статусів учасників для спам-шляху та адмін-панелі
+        self.member_cache = ChatMemberCache(self.bot)
+        # Журнал модерації в SQLite — лише якщо задано MODERATION_DB_PATH
+        self.moderation_log = ModerationLog(MODERATION_DB_PATH) if MODERATION_DB_PATH else None
         self.admin_panel = AdminPanel(self.bot, self.dp, self.spam_filter, self.ban_duration_days,
-                                      self.mute_duration_days)
-    async def start_polling(self):
-        """Starts the bot polling."""
+                                      self.mute_duration_days, self.member_cache, self.moderation_log)
+        self.moderation = ModerationPipeline(self.bot, self.mute_duration_days, self.member_cache, self.admin_panel,
+                                             self.moderation_log)
+        self.admin_panel.moderation = self.moderation
+        # Антифлуд — лише якщо задано поріг; чати шардяться за chat_id, тож лічильники локальні для процесу
+        self.flood_detector = FloodDetector(FLOOD_MESSAGES, FLOOD_WINDOW_SECONDS) if FLOOD_MESSAGES else None
+        self.admin_panel.flood_detector = self.flood_detector
+    def _register(self):
+        """Registers admin and spam handlers."""
         # Спочатку реєструємо обробники команд (більш специфічні)
         self.admin_panel.register_admin_handlers()
         
         # Потім реєструємо загальний обробник для спаму (менш специфічний)
-        register_handlers(self.dp, self.bot, self.spam_filter, self.ban_duration_days, self.mute_duration_days, self.admin_panel)
+        register_handlers(self.dp, self.bot, self.spam_filter, self.ban_duration_days, self.mute_duration_days, self.admin_panel,
+                          self.member_cache, self.moderation, self.flood_detector)
         
-        print("Starting polling...")
-        await self.dp.start_polling(self.bot)
-        print("Bot stopped")
+
+    async def _shutdown(self):
+        """Drains admin notifications and flushes everything kept on disk."""
+        await self.admin_panel.notifier.close()
+        self.admin_panel.deleted_messages.close()
+        await self.spam_filter.flush()
+        self.spam_filter.close()
+        if self.moderation_log is not None:
+            self.moderation_log.close()
+
+    async def start_polling(self):
+        """Starts the bot polling."""
+        self._register()
+        # Фонова проба паттернів на ReDoS: повільні переходять на карантин
+        audit_task = asyncio.create_task(self.spam_filter.audit_patterns())
+
+        logger.info("Starting polling...")
+        try:
+            await self.dp.start_polling(self.bot)
+        finally:
+            audit_task.cancel()
+            await self._shutdown()
+        logger.info("Bot stopped")
+
+    async def start_shard(self, index: int, shards: int, inbox, control):
+        """
+        Runs the bot as one shard worker: updates come from the ingress process queue.
+        :param index: shard number
+        :param shards: number of shard workers (they share the bot's Telegram rate limit)
+        :param inbox: multiprocessing queue with updates and changes from other shards
+        :param control: multiprocessing queue for this shard's pattern and admin changes
+        """
+        self._register()
+        # Загальний ліміт Telegram рахується на бота, тож кожен воркер надсилає свою частку
+        self.admin_panel.notifier.rate_limit = GLOBAL_RATE_LIMIT / shards
+        audit_task = asyncio.create_task(self.spam_filter.audit_patterns())
+        worker = ShardWorker(index, self.bot, self.dp, self.spam_filter, inbox, control)
+        logger.info("Shard %d started", index)
+        try:
+            await worker.run()
+        finally:
+            audit_task.cancel()
+            await self._shutdown()
+            await self.bot.session.close()
+
+    async def start_webhook(self, url: str, host: str, port: int, path: str, secret_token: str = None):
+        """
+        Starts the bot in webhook mode: an aiohttp server receives updates from Telegram.
+        :param url: public base URL Telegram posts to (the path is appended)
+        :param host: interface to listen on
+        :param port: port to listen on
+        :param path: webhook route
+        :param secret_token: value Telegram sends in X-Telegram-Bot-Api-Secret-Token
+        """
+        self._register()
+        audit_task = asyncio.create_task(self.spam_filter.audit_patterns())
+        app = build_webhook_app(self.bot, self.dp, path, secret_token, on_shutdown=self._shutdown)
+
+        logger.info("Starting webhook...")
+        try:
+            await self.bot.set_webhook(
+                url=url.rstrip("/") + path,
+                secret_token=secret_token or None,
+                allowed_updates=self.dp.resolve_used_update_types(),
+            )
+            await run_webhook(app, host, port)
+        finally:
+            audit_task.cancel()
+        logger.info("Bot stopped")
 
     async def stop(self):
         """Stops the bot."""
@@ -0,0 +1,138 @@
+import asyncio
+import logging
+import sys
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Як часто фонове завдання прибирає прострочені записи (секунди)
+EVICTION_INTERVAL = 600
+
+
+class DeletedMessage:
+    """Компактний запис про видалене повідомлення (замість словника з десятком ключів)"""
+    __slots__ = ("chat_id", "message_id", "user_id", "text", "timestamp", "pattern", "removed",
+                 "user_username", "user_first_name", "user_last_name", "chat_title", "chat_username", "size")
+
+    def __init__(self, chat_id: int, message_id: int, user_id: int, text: Optional[str], pattern: Optional[str] = None,
+                 removed: int = 1, user_username: Optional[str] = None, user_first_name: Optional[str] = None,
+                 user_last_name: Optional[str] = None, chat_title: Optional[str] = None,
+                 chat_username: Optional[str] = None, timestamp: Optional[float] = None):
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.user_id = user_id
+        self.text = text
+        self.pattern = pattern
+        self.removed = removed
+        self.user_username = user_username
+        self.user_first_name = user_first_name
+        self.user_last_name = user_last_name
+        self.chat_title = chat_title
+        self.chat_username = chat_username
+        self.timestamp = time.time() if timestamp is None else timestamp
+        # Приблизний розмір у пам'яті: сам запис і рядки (паттерн спільний з фільтром, не рахуємо)
+        self.size = sys.getsizeof(self) + sum(
+            sys.getsizeof(value) for value in (text, user_username, user_first_name, user_last_name,
+                                               chat_title, chat_username) if value is not None
+        )
+
+    @property
+    def key(self) -> Tuple[int, int]:
+        return self.chat_id, self.message_id
+
+
+class DeletedMessageStore:
+    """
+    Обмежене сховище видалених повідомлень для кнопки «Повернути».
+    Ключ — (chat_id, message_id), бо message_id унікальний лише в межах чату.
+    Записи живуть ttl секунд (прибирає фонове завдання), а понад max_bytes
+    витісняються найдавніше використані.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float, eviction_interval: float = EVICTION_INTERVAL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.eviction_interval = eviction_interval
+        self._records: "OrderedDict[Tuple[int, int], DeletedMessage]" = OrderedDict()
+        self.bytes = 0
+        self.evicted_expired = 0
+        self.evicted_lru = 0
+        self._eviction_task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __contains__(self, key: Tuple[int, int]) -> bool:
+        return self.get(*key) is not None
+
+    def add(self, record: DeletedMessage):
+        previous = self._records.pop(record.key, None)
+        if previous is not None:
+            self.bytes -= previous.size
+        self._records[record.key] = record
+        self.bytes += record.size
+        while self.bytes > self.max_bytes and len(self._records) > 1:
+            _, evicted = self._records.popitem(last=False)
+            self.bytes -= evicted.size
+            self.evicted_lru += 1
+        self._start_eviction()
+
+    def get(self, chat_id: int, message_id: int) -> Optional[DeletedMessage]:
+        record = self._records.get((chat_id, message_id))
+        if record is None:
+            return None
+        if time.time() - record.timestamp > self.ttl:
+            self._remove(record.key)
+            self.evicted_expired += 1
+            return None
+        self._records.move_to_end(record.key)
+        return record
+
+    def pop(self, chat_id: int, message_id: int) -> Optional[DeletedMessage]:
+        record = self.get(chat_id, message_id)
+        if record is not None:
+            self._remove(record.key)
+        return record
+
+    def _remove(self, key: Tuple[int, int]):
+        record = self._records.pop(key)
+        self.bytes -= record.size
+
+    def evict_expired(self) -> int:
+        """Видаляє записи, старші за ttl; повертає їх кількість"""
+        deadline = time.time() - self.ttl
+        expired = [key for key, record in self._records.items() if record.timestamp < deadline]
+        for key in expired:
+            self._remove(key)
+        self.evicted_expired += len(expired)
+        return len(expired)
+
+    def _start_eviction(self):
+        if self._eviction_task is not None and not self._eviction_task.done():
+            return
+        try:
+            self._eviction_task = asyncio.get_running_loop().create_task(self._evict_periodically())
+        except RuntimeError:
+            pass  # поза event loop прострочені записи відкидаються при зверненні
+
+    async def _evict_periodically(self):
+        while True:
+            await asyncio.sleep(self.eviction_interval)
+            removed = self.evict_expired()
+            if removed:
+                logger.info("Cleaned up %d old messages", removed)
+
+    def close(self):
+        if self._eviction_task is not None:
+            self._eviction_task.cancel()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "count": len(self._records),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "evicted_expired": self.evicted_expired,
+            "evicted_lru": self.evicted_lru,
+        }
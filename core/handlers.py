@@ -1,77 +1,92 @@
-import asyncio
-from datetime import datetime, timedelta
+import logging
+import time
 from functools import partial
 from aiogram import Bot, Dispatcher, types
-from aiogram.enums.chat_member_status import ChatMemberStatus
+from core.member_cache import ChatMemberCache
+from core.moderation import ModerationPipeline
+from core.scan import scan_document
+from utils.flood import FLOOD_PATTERN, FloodDetector
+from utils.matcher import MatchResult
 from utils.regex import SpamFilter
 
+logger = logging.getLogger(__name__)
+# Скільки символів тексту потрапляє в запис логу
+LOG_TEXT_LIMIT = 200
+
 async def handle_all_messages(
     message: types.Message, 
     bot: Bot, 
     spam_filter: SpamFilter,
     ban_duration_days: int,
     mute_duration_days: int,
-    admin_panel=None
+    admin_panel=None,
+    member_cache: ChatMemberCache = None,
+    pipeline: ModerationPipeline = None,
+    flood_detector: FloodDetector = None
 ):
     """
     Handler for all messages in all chats.
     If message contains spam, it will be deleted and the user will be banned for 30 days.
     If the user is an admin or owner, the message will be deleted only (without banning).
+    A user who floods a group is muted the same way, unless they are a chat admin.
     """
-    # Логуємо всі повідомлення для діагностики
-    print(f"Handling message: {message.text} from {message.from_user.username} in {message.chat.title}")
-    
+    received_at = time.perf_counter()
+
     # Skip messages related to FSM states
     if admin_panel and message.from_user.id in admin_panel.pending_actions:
         return
 
-    if message.text and spam_filter.is_spam(message.text):
-        print(f"SPAM DETECTED: {message.text}")
-        try:
-            # Пересилаємо повідомлення адміну ПЕРЕД видаленням
-            if admin_panel:
-                await admin_panel.forward_deleted_message(
-                    message, 
-                    message.chat.id, 
-                    message.from_user.id
-                )
-
-            # Тепер видаляємо повідомлення
-            await message.delete()
-            print(f"Deleted message from {message.from_user.username}: {message.text}")
-
-            chat_member = await bot.get_chat_member(
-                chat_id=message.chat.id,
-                user_id=message.from_user.id
-            )
+    # Частота рахується для кожного повідомлення групи, до перевірки вмісту; повідомлення від імені
+    # каналу чи анонімного адміна мають спільного from_user і не рахуються
+    flooding = (flood_detector is not None and message.chat.type in ("group", "supergroup")
+                and message.sender_chat is None
+                and flood_detector.hit(message.chat.id, message.from_user.id, message.media_group_id))
 
-            if chat_member.status not in [ChatMemberStatus.ADMINISTRATOR, ChatMemberStatus.CREATOR]:
-                await bot.restrict_chat_member(
-                    chat_id=message.chat.id,
-                    user_id=message.from_user.id,
-                    permissions=types.ChatPermissions(
-                        can_send_messages=False,
-                        can_send_media_messages=False,
-                        can_send_polls=False,
-                        can_send_other_messages=False,
-                        can_add_web_page_previews=False,
-                        can_change_info=False,
-                        can_invite_users=False,
-                        can_pin_messages=False,
-                    ),
-                    until_date=datetime.now() + timedelta(days=mute_duration_days)
-                )
-                print(f"Banned user {message.from_user.username}")
-            else:
-                print(f"User {message.from_user.username} is {chat_member.status.value}. Message deleted, but not banned.")
+    # Текст, підпис, приховані посилання, кнопки та джерело пересилання — один документ
+    document = scan_document(message)
+    # Довгі повідомлення перевіряються в пулі процесів, короткі — на місці
+    match = await spam_filter.find_match_async(document, message.chat.id) if document else None
+    if document and match is None and spam_filter.has_slow_patterns():
+        # Паттерни на карантині перевіряються окремо, з таймаутом
+        match = await spam_filter.find_match_slow(document, message.chat.id)
+    if document and match is None:
+        # Другий етап — модель, навчена кнопками адмінів (якщо увімкнена): лише те, що не вирішили паттерни
+        match = spam_filter.find_by_score(document)
+    if match is None and flooding and not (member_cache is not None
+                                           and await member_cache.is_admin(message.chat.id, message.from_user.id)):
+        # Флуд іде тим самим шляхом, що й спам: видалення і м'ют на mute_duration_days
+        match = MatchResult(-1, FLOOD_PATTERN, (0, 0), "")
+    elif match:
+        # Відбиток запам'ятовується одразу: копії, що вже надходять в інші чати, ловляться без regex
+        spam_filter.remember_spam(document, match.pattern)
+    if match:
+        # Аргументи підставляються в потоці логування, а не тут (див. utils/log.py)
+        logger.info("Spam detected: %.*s", LOG_TEXT_LIMIT, document or "", extra={
+            "chat_id": message.chat.id, "user_id": message.from_user.id, "message_id": message.message_id,
+            "pattern_id": match.pattern_id, "pattern": match.pattern,
+            "latency_ms": round((time.perf_counter() - received_at) * 1000, 3),
+        })
+        if pipeline is None:
+            pipeline = ModerationPipeline(bot, mute_duration_days, member_cache, admin_panel)
+        # Видалення, перевірка статусу та м'ют виконуються паралельно; звіт адмінам — після них
+        await pipeline.moderate(message, match, received_at)
+    elif logger.isEnabledFor(logging.DEBUG):
+        # Найчастіший шлях: лише DEBUG і з вибіркою (LOG_SAMPLING), поля не збираються, якщо рівень вимкнено
+        logger.debug("Message is not spam: %.*s", LOG_TEXT_LIMIT, document or "", extra={
+            "chat_id": message.chat.id, "user_id": message.from_user.id, "message_id": message.message_id,
+            "latency_ms": round((time.perf_counter() - received_at) * 1000, 3),
+        })
 
-        except Exception as e:
-            print(f"Error deleting message or banning user: {e}")
-    else:
-        print(f"Message is not spam: {message.text}")
+async def handle_chat_member_update(update: types.ChatMemberUpdated, member_cache: ChatMemberCache):
+    """Keeps the member status cache in sync with promotions, demotions, joins and leaves."""
+    member_cache.update(update.chat.id, update.new_chat_member.user.id, update.new_chat_member.status)
 
-def register_handlers(dp: Dispatcher, bot: Bot, spam_filter: SpamFilter, ban_duration_days: int, mute_duration_days: int, admin_panel=None):
+def register_handlers(dp: Dispatcher, bot: Bot, spam_filter: SpamFilter, ban_duration_days: int, mute_duration_days: int, admin_panel=None,
+                      member_cache: ChatMemberCache = None, pipeline: ModerationPipeline = None,
+                      flood_detector: FloodDetector = None):
     """Register all handlers for the bot."""
+    if member_cache is not None:
+        dp.chat_member.register(partial(handle_chat_member_update, member_cache=member_cache))
     dp.message.register(
         partial(
             handle_all_messages,
@@ -79,6 +94,9 @@ def register_handlers(dp: Dispatcher, bot: Bot, spam_filter: SpamFilter, ban_dur
             spam_filter=spam_filter,
             ban_duration_days=ban_duration_days,
             mute_duration_days=mute_duration_days,
-            admin_panel=admin_panel
+            admin_panel=admin_panel,
+            member_cache=member_cache,
+            pipeline=pipeline or ModerationPipeline(bot, mute_duration_days, member_cache, admin_panel),
+            flood_detector=flood_detector
         )
     )
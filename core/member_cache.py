@@ -0,0 +1,172 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+from aiogram import Bot
+from aiogram.enums.chat_member_status import ChatMemberStatus
+
+logger = logging.getLogger(__name__)
+
+# Скільки секунд вважати статус учасника актуальним
+MEMBER_CACHE_TTL = 300
+# Максимум записів (chat_id, user_id); найстаріші за використанням витісняються першими
+MEMBER_CACHE_SIZE = 10000
+ADMIN_STATUSES = (ChatMemberStatus.ADMINISTRATOR, ChatMemberStatus.CREATOR)
+
+
+class ChatMemberCache:
+    """
+    TTL + LRU кеш статусів учасників чатів для спам-шляху.
+    Список адміністраторів чату завантажується одним викликом get_chat_administrators:
+    після цього для будь-якого користувача відомо, адмін він чи ні, без get_chat_member.
+    Оновлення chat_member одразу змінюють кеш (див. core/handlers.handle_chat_member_update).
+    """
+
+    def __init__(self, bot: Bot, ttl: float = MEMBER_CACHE_TTL, max_size: int = MEMBER_CACHE_SIZE):
+        self.bot = bot
+        self.ttl = ttl
+        self.max_size = max_size
+        self._members: "OrderedDict[Tuple[int, int], Tuple[float, ChatMemberStatus]]" = OrderedDict()
+        # chat_id -> (коли застаріє, id адміністраторів)
+        self._admins: Dict[int, Tuple[float, Set[int]]] = {}
+        # chat_id -> до якого часу не пробувати get_chat_administrators знову (помилка API)
+        self._admins_unavailable: Dict[int, float] = {}
+        # Паралельні запити (рейд) чекають на один виклик API замість власного
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.api_calls = 0
+
+    def _put(self, chat_id: int, user_id: int, status: ChatMemberStatus):
+        key = (chat_id, user_id)
+        self._members[key] = (time.monotonic() + self.ttl, status)
+        self._members.move_to_end(key)
+        while len(self._members) > self.max_size:
+            self._members.popitem(last=False)
+
+    def _cached(self, chat_id: int, user_id: int) -> Optional[ChatMemberStatus]:
+        now = time.monotonic()
+        key = (chat_id, user_id)
+        entry = self._members.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                self._members.move_to_end(key)
+                return entry[1]
+            del self._members[key]
+        admins = self._admins.get(chat_id)
+        if admins is not None and admins[0] > now and user_id not in admins[1]:
+            # Не в списку адміністраторів — для спам-шляху цього досить
+            return ChatMemberStatus.MEMBER
+        return None
+
+    async def _once(self, key: tuple, factory):
+        """Виконує запит до API один раз для всіх, хто чекає той самий ключ"""
+        future = self._inflight.get(key)
+        while future is not None:
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # Скасували того, хто робив запит, а не нас — запитуємо самі
+                future = self._inflight.get(key)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await factory()
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            # Позначаємо виняток як отриманий, навіть якщо інших очікувачів не було
+            future.exception()
+            raise
+        except BaseException:
+            # Скасування: очікувачі не мають зависнути на future, що ніколи не завершиться
+            future.cancel()
+            raise
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    async def prewarm(self, chat_id: int) -> Set[int]:
+        """Завантажує адміністраторів чату одним викликом API"""
+        async def fetch():
+            self.api_calls += 1
+            try:
+                chat_admins = await self.bot.get_chat_administrators(chat_id)
+            except Exception as e:
+                logger.error("Error loading chat administrators for %s: %s", chat_id, e)
+                raise
+            admin_ids = set()
+            for admin in chat_admins:
+                admin_ids.add(admin.user.id)
+                self._put(chat_id, admin.user.id, admin.status)
+            self._admins[chat_id] = (time.monotonic() + self.ttl, admin_ids)
+            return admin_ids
+        return await self._once(("admins", chat_id), fetch)
+
+    async def get_status(self, chat_id: int, user_id: int) -> ChatMemberStatus:
+        """
+        Статус учасника. Для чату з завантаженим списком адмінів звичайні учасники
+        повертаються як MEMBER (без розрізнення restricted/left).
+        """
+        status = self._cached(chat_id, user_id)
+        if status is not None:
+            self.hits += 1
+            return status
+        self.misses += 1
+        now = time.monotonic()
+        stale = chat_id not in self._admins or self._admins[chat_id][0] <= now
+        if stale and self._admins_unavailable.get(chat_id, 0.0) <= now:
+            try:
+                await self.prewarm(chat_id)
+            except Exception:
+                # Приватні чати та чати без прав адміна — запитуємо учасника напряму
+                self._admins_unavailable[chat_id] = now + self.ttl
+            else:
+                status = self._cached(chat_id, user_id)
+                if status is not None:
+                    return status
+
+        async def fetch():
+            self.api_calls += 1
+            member = await self.bot.get_chat_member(chat_id=chat_id, user_id=user_id)
+            self._put(chat_id, user_id, member.status)
+            return member.status
+        return await self._once(("member", chat_id, user_id), fetch)
+
+    async def is_admin(self, chat_id: int, user_id: int) -> bool:
+        return await self.get_status(chat_id, user_id) in ADMIN_STATUSES
+
+    def update(self, chat_id: int, user_id: int, status: ChatMemberStatus):
+        """Застосовує оновлення chat_member: статус користувача та список адміністраторів"""
+        self._put(chat_id, user_id, status)
+        admins = self._admins.get(chat_id)
+        if admins is not None:
+            if status in ADMIN_STATUSES:
+                admins[1].add(user_id)
+            else:
+                admins[1].discard(user_id)
+
+    def invalidate(self, chat_id: int, user_id: Optional[int] = None):
+        """Скидає кеш користувача або всього чату"""
+        if user_id is not None:
+            self._members.pop((chat_id, user_id), None)
+            return
+        self._admins.pop(chat_id, None)
+        self._admins_unavailable.pop(chat_id, None)
+        for key in [key for key in self._members if key[0] == chat_id]:
+            del self._members[key]
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "api_calls": self.api_calls,
+            "size": len(self._members),
+            "chats": len(self._admins),
+        }
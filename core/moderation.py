@@ -0,0 +1,320 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+from aiogram import Bot, types
+from aiogram.enums.chat_member_status import ChatMemberStatus
+from core.member_cache import ADMIN_STATUSES, ChatMemberCache
+from core.moderation_log import ModerationLog
+from utils.metrics import LatencyStats
+
+logger = logging.getLogger(__name__)
+
+MODERATION_STEPS = ("delete", "member_lookup", "restrict", "report", "bulk_delete")
+# Повторний спам від того ж користувача в чаті протягом цього часу (від останнього) — той самий рейд
+RAID_WINDOW = 30.0
+# Звіт про рейд надсилається, коли спам затих на RAID_REPORT_DELAY с, але не пізніше ніж через RAID_REPORT_MAX_DELAY
+RAID_REPORT_DELAY = 2.0
+RAID_REPORT_MAX_DELAY = 10.0
+# Повторні повідомлення збираються в пакет для delete_messages (Telegram приймає до 100 id за раз)
+BULK_DELETE_DELAY = 0.2
+BULK_DELETE_LIMIT = 100
+
+
+class ModerationResult(NamedTuple):
+    deleted: bool
+    restricted: bool
+    status: Optional[ChatMemberStatus]
+    time_to_removal: Optional[float]  # секунди від отримання повідомлення до видалення
+
+
+class _RaidState:
+    """Дії над одним користувачем у чаті, поки триває його рейд"""
+    __slots__ = ("first_message", "match", "status", "restricted", "settled", "count", "reported",
+                 "last_hit", "burst_started", "pending", "delete_task", "report_task", "restrict_task")
+
+    def __init__(self, message: types.Message, match, now: float):
+        self.first_message = message
+        self.match = match
+        self.status: Optional[ChatMemberStatus] = None
+        self.restricted = False
+        # Перше повідомлення пройшло повний шлях (перевірку статусу й м'ют, вдало чи ні)
+        self.settled = False
+        self.count = 1
+        self.reported = 0
+        self.last_hit = now
+        self.burst_started = now
+        # (повідомлення, час отримання, future результату) — чекають на пакетне видалення
+        self.pending: List[Tuple[types.Message, float, asyncio.Future]] = []
+        self.delete_task: Optional[asyncio.Task] = None
+        self.report_task: Optional[asyncio.Task] = None
+        # Повторна спроба м'юту, якщо на першому повідомленні вона не вдалася
+        self.restrict_task: Optional[asyncio.Task] = None
+
+
+class ModerationPipeline:
+    """
+    Дії над спам-повідомленням як невеликий асинхронний конвеєр.
+    Видалення і перевірка статусу автора не залежать одне від одного, тому виконуються паралельно;
+    м'ют стартує, щойно відомо, що автор не адмін, не чекаючи на видалення.
+    Звіт адмінам — останнім кроком. Для кожного кроку збирається затримка,
+    а для повідомлення — time to removal: від отримання ботом до видалення з чату.
+
+    Режим рейду: перше спам-повідомлення користувача в чаті проходить повний шлях, а наступні
+    протягом RAID_WINDOW лише видаляються пакетами через delete_messages, без повторних
+    get_chat_member і restrict. Адміни отримують один зведений звіт на серію.
+    """
+
+    def __init__(self, bot: Bot, mute_duration_days: int, member_cache: ChatMemberCache = None,
+                 admin_panel=None, moderation_log: Optional[ModerationLog] = None):
+        self.bot = bot
+        self.mute_duration_days = mute_duration_days
+        self.member_cache = member_cache
+        self.admin_panel = admin_panel
+        self.moderation_log = moderation_log
+        self.step_latency: Dict[str, LatencyStats] = {step: LatencyStats() for step in MODERATION_STEPS}
+        self.time_to_removal = LatencyStats()
+        # Скільки спам був видимий у чаті: від часу надсилання (за даними Telegram, з точністю до секунди)
+        self.visible_time = LatencyStats()
+        self._raids: Dict[Tuple[int, int], _RaidState] = {}
+        # Пакетні видалення, запущені поза delete_task (повний пакет): посилання, щоб задачу не зібрав GC
+        self._bulk_tasks: Set[asyncio.Task] = set()
+        self.moderated = 0
+        self.coalesced = 0
+        self.bulk_deletes = 0
+
+    async def _timed(self, step: str, awaitable):
+        start = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self.step_latency[step].observe(time.perf_counter() - start)
+
+    async def _get_status(self, chat_id: int, user_id: int) -> ChatMemberStatus:
+        if self.member_cache is not None:
+            return await self.member_cache.get_status(chat_id, user_id)
+        chat_member = await self.bot.get_chat_member(chat_id=chat_id, user_id=user_id)
+        return chat_member.status
+
+    async def _restrict(self, chat_id: int, user_id: int):
+        await self.bot.restrict_chat_member(
+            chat_id=chat_id,
+            user_id=user_id,
+            permissions=types.ChatPermissions(
+                can_send_messages=False,
+                can_send_media_messages=False,
+                can_send_polls=False,
+                can_send_other_messages=False,
+                can_add_web_page_previews=False,
+                can_change_info=False,
+                can_invite_users=False,
+                can_pin_messages=False,
+            ),
+            until_date=datetime.now() + timedelta(days=self.mute_duration_days)
+        )
+
+    def _log(self, action: str, message: types.Message, match=None):
+        if self.moderation_log is not None:
+            self.moderation_log.record_action(
+                message.chat.id, message.from_user.id, action, message.message_id,
+                pattern=match.pattern if match else None
+            )
+
+    def _observe_removal(self, message: types.Message, received_at: float) -> float:
+        elapsed = time.perf_counter() - received_at
+        self.time_to_removal.observe(elapsed)
+        if message.date is not None:
+            sent_at = message.date if message.date.tzinfo else message.date.replace(tzinfo=timezone.utc)
+            self.visible_time.observe(max(0.0, (datetime.now(timezone.utc) - sent_at).total_seconds()))
+        return elapsed
+
+    async def _delete(self, message: types.Message, received_at: float) -> float:
+        await self._timed("delete", message.delete())
+        return self._observe_removal(message, received_at)
+
+    def _prune(self, now: float):
+        for key in [key for key, state in self._raids.items() if now - state.last_hit > RAID_WINDOW
+                    and not state.pending and (state.report_task is None or state.report_task.done())]:
+            del self._raids[key]
+
+    async def moderate(self, message: types.Message, match=None,
+                       received_at: Optional[float] = None) -> ModerationResult:
+        """Видаляє повідомлення, м'ютить автора (якщо він не адмін) і ставить звіт адмінам у чергу"""
+        if received_at is None:
+            received_at = time.perf_counter()
+        self.moderated += 1
+        key = (message.chat.id, message.from_user.id)
+        now = time.monotonic()
+        state = self._raids.get(key)
+        if state is not None and now - state.last_hit <= RAID_WINDOW:
+            return await self._moderate_repeat(state, message, received_at, now)
+        self._prune(now)
+        state = self._raids[key] = _RaidState(message, match, now)
+        result = await self._moderate_first(message, received_at, match)
+        state.status, state.restricted = result.status, result.restricted
+        state.settled = True
+        self._schedule_report(state)
+        return result
+
+    async def _moderate_first(self, message: types.Message, received_at: float, match=None) -> ModerationResult:
+        chat_id, user_id = message.chat.id, message.from_user.id
+        delete_task = asyncio.create_task(self._delete(message, received_at))
+
+        status = None
+        restricted = False
+        try:
+            status = await self._timed("member_lookup", self._get_status(chat_id, user_id))
+            if status not in ADMIN_STATUSES:
+                await self._timed("restrict", self._restrict(chat_id, user_id))
+                restricted = True
+                self._log("restrict", message, match)
+                logger.info("Banned user %s", message.from_user.username, extra={"chat_id": chat_id, "user_id": user_id})
+            else:
+                logger.info("User %s is %s. Message deleted, but not banned.", message.from_user.username, status.value,
+                            extra={"chat_id": chat_id, "user_id": user_id})
+        except Exception as e:
+            logger.error("Error banning user: %s", e, extra={"chat_id": chat_id, "user_id": user_id})
+
+        time_to_removal = None
+        try:
+            time_to_removal = await delete_task
+            self._log("delete", message, match)
+            logger.debug("Deleted message from %s", message.from_user.username,
+                         extra={"chat_id": chat_id, "user_id": user_id, "message_id": message.message_id})
+        except Exception as e:
+            logger.error("Error deleting message: %s", e)
+        return ModerationResult(time_to_removal is not None, restricted, status, time_to_removal)
+
+    async def _moderate_repeat(self, state: _RaidState, message: types.Message, received_at: float,
+                               now: float) -> ModerationResult:
+        """Повторне повідомлення в рейді: лише видалення (пакетом) і лічильник для звіту"""
+        self.coalesced += 1
+        if state.count == state.reported:
+            state.burst_started = now
+        state.count += 1
+        state.last_hit = now
+        future = asyncio.get_running_loop().create_future()
+        state.pending.append((message, received_at, future))
+        if len(state.pending) >= BULK_DELETE_LIMIT:
+            self._start_bulk_delete(state)
+        elif state.delete_task is None or state.delete_task.done():
+            state.delete_task = asyncio.create_task(self._bulk_delete_later(state))
+        self._schedule_report(state)
+        if (state.settled and not state.restricted and state.status not in ADMIN_STATUSES
+                and (state.restrict_task is None or state.restrict_task.done())):
+            # Перша спроба м'юту не вдалася: інакше рейдер писав би далі, поки не затихне на RAID_WINDOW
+            state.restrict_task = asyncio.create_task(self._retry_restrict(state, message))
+        time_to_removal = await future
+        return ModerationResult(time_to_removal is not None, state.restricted, state.status, time_to_removal)
+
+    async def _retry_restrict(self, state: _RaidState, message: types.Message):
+        chat_id, user_id = message.chat.id, message.from_user.id
+        try:
+            if state.status is None:
+                state.status = await self._timed("member_lookup", self._get_status(chat_id, user_id))
+                if state.status in ADMIN_STATUSES:
+                    return
+            await self._timed("restrict", self._restrict(chat_id, user_id))
+            state.restricted = True
+            self._log("restrict", message, state.match)
+            logger.info("Banned user %s on a repeated message", message.from_user.username,
+                        extra={"chat_id": chat_id, "user_id": user_id})
+        except Exception as e:
+            logger.error("Error banning user: %s", e, extra={"chat_id": chat_id, "user_id": user_id})
+
+    async def _bulk_delete_later(self, state: _RaidState):
+        await asyncio.sleep(BULK_DELETE_DELAY)
+        while state.pending:
+            await self._bulk_delete(state)
+
+    def _start_bulk_delete(self, state: _RaidState):
+        task = asyncio.create_task(self._bulk_delete(state))
+        self._bulk_tasks.add(task)
+        task.add_done_callback(self._bulk_tasks.discard)
+
+    async def _bulk_delete(self, state: _RaidState):
+        batch, state.pending = state.pending[:BULK_DELETE_LIMIT], state.pending[BULK_DELETE_LIMIT:]
+        if not batch:
+            return
+        chat_id = batch[0][0].chat.id
+        deleted = False
+        try:
+            if hasattr(self.bot, "delete_messages"):
+                try:
+                    await self._timed(
+                        "bulk_delete",
+                        self.bot.delete_messages(chat_id=chat_id,
+                                                 message_ids=[message.message_id for message, _, _ in batch])
+                    )
+                    self.bulk_deletes += 1
+                    deleted = True
+                except Exception as e:
+                    logger.error("Error bulk deleting %d messages: %s", len(batch), e)
+            for message, received_at, future in batch:
+                if not deleted:
+                    try:
+                        await self._timed("delete", message.delete())
+                    except Exception as e:
+                        logger.error("Error deleting message: %s", e)
+                        future.set_result(None)
+                        continue
+                self._log("delete", message, state.match)
+                future.set_result(self._observe_removal(message, received_at))
+            logger.info("Deleted %d repeated messages", len(batch), extra={"chat_id": chat_id})
+        except Exception as e:
+            # Помилка журналу чи метрик не має зупиняти видалення решти пакетів рейду
+            logger.exception("Error finishing bulk delete: %s", e)
+        finally:
+            # Обробники, що чекають на свої повідомлення, не мають зависнути (і при скасуванні задачі)
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_result(None)
+
+    def _schedule_report(self, state: _RaidState):
+        if self.admin_panel is None:
+            return
+        if state.report_task is None or state.report_task.done():
+            state.report_task = asyncio.create_task(self._report_later(state))
+
+    async def _report_later(self, state: _RaidState):
+        """Чекає, поки серія затихне, і надсилає один зведений звіт"""
+        while True:
+            deadline = min(state.last_hit + RAID_REPORT_DELAY, state.burst_started + RAID_REPORT_MAX_DELAY)
+            delay = deadline - time.monotonic()
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+        removed = state.count - state.reported
+        state.reported = state.count
+        message = state.first_message
+        try:
+            await self._timed(
+                "report",
+                self.admin_panel.forward_deleted_message(
+                    message, message.chat.id, message.from_user.id, state.match, removed
+                )
+            )
+        except Exception as e:
+            logger.error("Error reporting deleted messages: %s", e)
+
+    async def drain(self):
+        """Чекає на пакетні видалення та звіти рейдів, що ще в роботі (офлайн-прогін, бенчмарки)"""
+        tasks = [task for state in self._raids.values()
+                 for task in (state.delete_task, state.report_task, state.restrict_task)
+                 if task is not None and not task.done()]
+        tasks.extend(self._bulk_tasks)
+        if tasks:
+            await asyncio.wait(tasks)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        stats = {step: latency.summary() for step, latency in self.step_latency.items()}
+        stats["time_to_removal"] = self.time_to_removal.summary()
+        stats["visible_time"] = self.visible_time.summary()
+        stats["raids"] = {
+            "moderated": self.moderated,
+            "active": len(self._raids),
+            "coalesced": self.coalesced,
+            "bulk_deletes": self.bulk_deletes,
+        }
+        return stats
@@ -0,0 +1,193 @@
+import asyncio
+import atexit
+import itertools
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from core.deleted_messages import DeletedMessage
+
+logger = logging.getLogger(__name__)
+
+# Записи накопичуються до BATCH_SIZE або BATCH_DELAY секунд і пишуться однією транзакцією
+BATCH_SIZE = 500
+BATCH_DELAY = 0.5
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS deleted_messages (
+    id INTEGER PRIMARY KEY,
+    chat_id INTEGER NOT NULL,
+    message_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    timestamp REAL NOT NULL,
+    text TEXT,
+    pattern TEXT,
+    removed INTEGER NOT NULL DEFAULT 1,
+    user_username TEXT,
+    user_first_name TEXT,
+    user_last_name TEXT,
+    chat_title TEXT,
+    chat_username TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_deleted_chat_message ON deleted_messages (chat_id, message_id);
+CREATE INDEX IF NOT EXISTS idx_deleted_user ON deleted_messages (user_id);
+CREATE INDEX IF NOT EXISTS idx_deleted_timestamp ON deleted_messages (timestamp);
+
+CREATE TABLE IF NOT EXISTS actions (
+    id INTEGER PRIMARY KEY,
+    chat_id INTEGER NOT NULL,
+    message_id INTEGER,
+    user_id INTEGER NOT NULL,
+    action TEXT NOT NULL,
+    actor_id INTEGER,
+    pattern TEXT,
+    timestamp REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_actions_chat_message ON actions (chat_id, message_id);
+CREATE INDEX IF NOT EXISTS idx_actions_user ON actions (user_id);
+CREATE INDEX IF NOT EXISTS idx_actions_timestamp ON actions (timestamp);
+"""
+
+_DELETED_COLUMNS = ("chat_id", "message_id", "user_id", "timestamp", "text", "pattern", "removed",
+                    "user_username", "user_first_name", "user_last_name", "chat_title", "chat_username")
+_INSERT_DELETED = (
+    f"INSERT OR REPLACE INTO deleted_messages ({', '.join(_DELETED_COLUMNS)}) "
+    f"VALUES ({', '.join('?' * len(_DELETED_COLUMNS))})"
+)
+_INSERT_ACTION = (
+    "INSERT INTO actions (chat_id, message_id, user_id, action, actor_id, pattern, timestamp) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+_STOP = object()
+
+
+class ModerationLog:
+    """
+    Необов'язковий журнал модерації в SQLite: видалені повідомлення, дії (видалення, м'ют, бан,
+    повернення) та паттерн, що спрацював. Переживає перезапуск, тож кнопка «Повернути» працює
+    і після деплою. Запис — пакетами в окремому потоці (WAL), читання — у пулі потоків.
+    """
+
+    def __init__(self, path: str, batch_size: int = BATCH_SIZE, batch_delay: float = BATCH_DELAY):
+        self.path = path
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.written = 0
+        self._queue: "queue.Queue" = queue.Queue()
+        self._local = threading.local()
+        self._readers = ThreadPoolExecutor(max_workers=2, thread_name_prefix="moderation-log-read")
+        connection = self._connect()
+        with connection:
+            connection.executescript(_SCHEMA)
+        connection.close()
+        self._writer = threading.Thread(target=self._write_loop, name="moderation-log-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    # Запис
+
+    def record_deleted(self, record: DeletedMessage):
+        self._queue.put((_INSERT_DELETED, tuple(getattr(record, column) for column in _DELETED_COLUMNS)))
+
+    def record_action(self, chat_id: int, user_id: int, action: str, message_id: Optional[int] = None,
+                      actor_id: Optional[int] = None, pattern: Optional[str] = None):
+        """action: delete, restrict, ban, restore; actor_id — адмін, що натиснув кнопку (None — бот)"""
+        self._queue.put((_INSERT_ACTION, (chat_id, message_id, user_id, action, actor_id, pattern, time.time())))
+
+    def _write_loop(self):
+        connection = self._connect()
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.batch_delay
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._write_batch(connection, batch)
+        connection.close()
+
+    def _write_batch(self, connection: sqlite3.Connection, batch: list):
+        try:
+            with connection:
+                # Сусідні однакові запити — одним executemany
+                for sql, group in itertools.groupby(batch, key=lambda item: item[0]):
+                    connection.executemany(sql, [params for _, params in group])
+            self.written += len(batch)
+        except sqlite3.Error as e:
+            logger.error("Error writing moderation log: %s", e)
+
+    def close(self, timeout: float = 5.0):
+        """Дописує чергу і зупиняє потік запису"""
+        if self._writer.is_alive():
+            self._queue.put(_STOP)
+            self._writer.join(timeout)
+        self._readers.shutdown(wait=False)
+
+    # Читання
+
+    def _reader(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = self._connect()
+            connection.row_factory = sqlite3.Row
+        return connection
+
+    async def _read(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._readers, function, *args)
+
+    def _get_deleted(self, chat_id: int, message_id: int) -> Optional[DeletedMessage]:
+        row = self._reader().execute(
+            f"SELECT {', '.join(_DELETED_COLUMNS)} FROM deleted_messages WHERE chat_id = ? AND message_id = ?",
+            (chat_id, message_id)
+        ).fetchone()
+        return DeletedMessage(**dict(row)) if row is not None else None
+
+    async def get_deleted(self, chat_id: int, message_id: int) -> Optional[DeletedMessage]:
+        """Видалене повідомлення для кнопки «Повернути» (за індексом (chat_id, message_id))"""
+        return await self._read(self._get_deleted, chat_id, message_id)
+
+    def _user_history(self, user_id: int, limit: int) -> List[Dict]:
+        rows = self._reader().execute(
+            "SELECT chat_id, message_id, action, actor_id, pattern, timestamp FROM actions "
+            "WHERE user_id = ? ORDER BY timestamp DESC LIMIT ?",
+            (user_id, limit)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    async def user_history(self, user_id: int, limit: int = 20) -> List[Dict]:
+        """Останні дії щодо користувача (за індексом user_id)"""
+        return await self._read(self._user_history, user_id, limit)
+
+    def _action_counts(self, since: float) -> Dict[str, int]:
+        rows = self._reader().execute(
+            "SELECT action, COUNT(*) FROM actions WHERE timestamp >= ? GROUP BY action", (since,)
+        ).fetchall()
+        return {row[0]: row[1] for row in rows}
+
+    async def action_counts(self, since: float) -> Dict[str, int]:
+        """Кількість дій кожного типу з моменту since (за індексом timestamp)"""
+        return await self._read(self._action_counts, since)
+
+    def stats(self) -> Dict[str, int]:
+        return {"written": self.written, "pending": self._queue.qsize()}
@@ -0,0 +1,147 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Iterable, Optional
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+
+logger = logging.getLogger(__name__)
+
+# Скільки повідомлень адмінам може надсилатися одночасно
+NOTIFY_CONCURRENCY = 8
+# Ліміти Telegram: ~30 повідомлень на секунду загалом і ~1 на секунду в один чат
+GLOBAL_RATE_LIMIT = 30
+PER_CHAT_INTERVAL = 1.0
+# Скільки разів повторювати надсилання після 429
+MAX_RETRIES = 3
+# Максимум повідомлень у черзі; понад це нові звіти відкидаються
+NOTIFY_QUEUE_SIZE = 1000
+
+
+class AdminNotifier:
+    """
+    Фонова черга сповіщень адмінам. Обробник спаму лише ставить звіт у чергу і не чекає
+    на надсилання. Повідомлення розсилаються паралельно (не більше NOTIFY_CONCURRENCY одночасно)
+    з урахуванням лімітів Telegram на чат і на бота; після 429 надсилання повторюється через retry_after.
+    """
+
+    def __init__(self, bot: Bot, concurrency: int = NOTIFY_CONCURRENCY, rate_limit: float = GLOBAL_RATE_LIMIT):
+        self.bot = bot
+        self.concurrency = concurrency
+        # Ліміт Telegram діє на бота: у режимі шардів кожен процес отримує свою частку
+        self.rate_limit = rate_limit
+        self._queue: Optional[asyncio.Queue] = None
+        self._semaphore: Optional[asyncio.BoundedSemaphore] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._tasks = set()
+        # Найраніший час наступного надсилання в окремий чат
+        self._next_chat_slot: Dict[int, float] = {}
+        # Загальний ліміт — token bucket; після 429 розсилка ставиться на паузу до _paused_until
+        self._tokens = float(rate_limit)
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.dropped = 0
+
+    def _start(self):
+        if self._dispatcher is None or self._dispatcher.done():
+            self._queue = self._queue or asyncio.Queue(maxsize=NOTIFY_QUEUE_SIZE)
+            self._semaphore = self._semaphore or asyncio.BoundedSemaphore(self.concurrency)
+            self._dispatcher = asyncio.get_running_loop().create_task(self._dispatch())
+
+    def notify(self, chat_ids: Iterable[int], text: str, **kwargs) -> int:
+        """Ставить повідомлення для кожного чату в чергу; повертає, скільки поставлено"""
+        self._start()
+        queued = 0
+        for chat_id in chat_ids:
+            try:
+                self._queue.put_nowait((chat_id, text, kwargs))
+                queued += 1
+            except asyncio.QueueFull:
+                self.dropped += 1
+                logger.warning("Admin notification queue is full, dropping message to %s", chat_id)
+        return queued
+
+    async def _dispatch(self):
+        while True:
+            job = await self._queue.get()
+            await self._semaphore.acquire()
+            task = asyncio.create_task(self._deliver(*job))
+            self._tasks.add(task)
+            task.add_done_callback(self._finished)
+
+    def _finished(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        self._semaphore.release()
+        self._queue.task_done()
+
+    async def _wait_turn(self, chat_id: int):
+        """Чекає на свою чергу в чаті, потім на токен загального ліміту"""
+        now = time.monotonic()
+        chat_slot = max(now, self._next_chat_slot.get(chat_id, 0.0))
+        self._next_chat_slot[chat_id] = chat_slot + PER_CHAT_INTERVAL
+        if chat_slot > now:
+            await asyncio.sleep(chat_slot - now)
+        while True:
+            now = time.monotonic()
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+            self._tokens = min(self.rate_limit, self._tokens + (now - self._refilled_at) * self.rate_limit)
+            self._refilled_at = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate_limit)
+
+    def _back_off(self, chat_id: int, retry_after: float):
+        resume = time.monotonic() + retry_after
+        self._next_chat_slot[chat_id] = max(self._next_chat_slot.get(chat_id, 0.0), resume)
+        # Флуд-контроль Telegram рахується на бота, тому пауза діє на всі чати
+        self._paused_until = max(self._paused_until, resume)
+
+    async def _deliver(self, chat_id: int, text: str, kwargs: dict):
+        for attempt in range(MAX_RETRIES + 1):
+            await self._wait_turn(chat_id)
+            try:
+                await self.bot.send_message(chat_id=chat_id, text=text, **kwargs)
+                self.sent += 1
+                return
+            except TelegramRetryAfter as e:
+                self.retried += 1
+                logger.warning("Rate limited sending to admin %s, retry in %s s", chat_id, e.retry_after)
+                self._back_off(chat_id, e.retry_after)
+            except Exception as e:
+                self.failed += 1
+                logger.error("Error sending message to admin %s: %s", chat_id, e)
+                return
+        self.failed += 1
+        logger.error("Giving up sending message to admin %s after %d retries", chat_id, MAX_RETRIES)
+
+    async def join(self):
+        """Чекає, поки черга спорожніє і всі надсилання завершаться"""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def close(self, timeout: float = 5.0):
+        """Дає черзі доставити залишок (не довше timeout секунд) і зупиняє розсилку"""
+        if self._dispatcher is None:
+            return
+        try:
+            await asyncio.wait_for(self.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Admin notification queue not drained, %d messages dropped", self._queue.qsize())
+        self._dispatcher.cancel()
+        for task in list(self._tasks):
+            task.cancel()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "retried": self.retried,
+            "dropped": self.dropped,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+        }
@@ -0,0 +1,65 @@
+from typing import Iterator, Optional
+from aiogram import types
+
+# Частини документа розділяються переносом рядка, щоб паттерн не «склеїв» кінець однієї з початком іншої
+SCAN_SEPARATOR = "\n"
+
+
+def _entity_urls(entities) -> Iterator[str]:
+    # Сутність url вже є в тексті; text_link ховає адресу за іншим текстом
+    for entity in entities:
+        if entity.url:
+            yield entity.url
+
+
+def _has_hidden_urls(entities) -> bool:
+    return bool(entities) and any(entity.url for entity in entities)
+
+
+def _markup_parts(markup: types.InlineKeyboardMarkup) -> Iterator[str]:
+    for row in markup.inline_keyboard:
+        for button in row:
+            yield button.text
+            if button.url:
+                yield button.url
+
+
+def _forward_parts(origin) -> Iterator[str]:
+    # MessageOriginChannel має chat, MessageOriginChat — sender_chat, прихований користувач — лише ім'я
+    chat = getattr(origin, "chat", None) or getattr(origin, "sender_chat", None)
+    if chat is not None:
+        if chat.title:
+            yield chat.title
+        if chat.username:
+            yield chat.username
+    sender_user_name = getattr(origin, "sender_user_name", None)
+    if sender_user_name:
+        yield sender_user_name
+
+
+def scan_parts(message: types.Message) -> Iterator[str]:
+    """Усе, де може бути спам: текст, підпис, приховані посилання, кнопки та джерело пересилання"""
+    if message.text:
+        yield message.text
+    if message.entities:
+        yield from _entity_urls(message.entities)
+    if message.caption:
+        yield message.caption
+    if message.caption_entities:
+        yield from _entity_urls(message.caption_entities)
+    if isinstance(message.reply_markup, types.InlineKeyboardMarkup):
+        yield from _markup_parts(message.reply_markup)
+    if message.forward_origin is not None:
+        yield from _forward_parts(message.forward_origin)
+
+
+def scan_document(message: types.Message) -> Optional[str]:
+    """
+    Один документ для перевірки фільтром: фільтр проходить по повідомленню один раз, а не по кожному полю.
+    Звичайний текст без прихованих посилань, кнопок і пересилання повертається як є, без нових рядків.
+    """
+    if (message.caption is None and message.reply_markup is None and message.forward_origin is None
+            and not _has_hidden_urls(message.entities)):
+        return message.text
+    document = SCAN_SEPARATOR.join(scan_parts(message))
+    return document or None
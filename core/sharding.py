@@ -0,0 +1,318 @@
+import asyncio
+import logging
+import multiprocessing
+import queue
+import secrets
+import signal
+import threading
+from typing import Any, Dict, List, Optional
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.exceptions import TelegramRetryAfter
+from models.settings import admin_registry
+
+logger = logging.getLogger(__name__)
+
+# Типи оновлень, які обробляє бот (див. core/handlers.py та core/admin.py)
+ALLOWED_UPDATES = ["message", "callback_query", "chat_member"]
+# Long polling у процесі-вході: скільки секунд Telegram тримає getUpdates
+POLL_TIMEOUT = 10
+# Скільки оновлень може чекати в черзі одного воркера; далі вхід чекає (зворотний тиск)
+SHARD_QUEUE_SIZE = 10000
+# Long polling: скільки чекати на місце в черзі воркера, перш ніж відкинути оновлення, і крок повтору.
+# Чекання — asyncio.sleep, а не блокуючий put: event loop входу не зупиняється
+SHARD_PUT_TIMEOUT = 5.0
+SHARD_PUT_RETRY = 0.05
+# Скільки чекати на завершення воркерів при зупинці
+SHARD_STOP_TIMEOUT = 15.0
+# Воркер, який єдиний пише patterns.json, chat_patterns.json, domains.json, admins.json і модель оцінки.
+# Зміни інших воркерів доходять до нього через вхід, тож запис не губиться й не перетирається
+WRITER_SHARD = 0
+
+_CHAT_UPDATES = ("message", "edited_message", "channel_post", "edited_channel_post",
+                 "chat_member", "my_chat_member", "chat_join_request")
+# Кнопки звіту адмінам несуть id чату зі спамом: «Повернути» має потрапити у воркер,
+# який пам'ятає видалене повідомлення
+_REPORT_CALLBACKS = ("ban_user:", "restore_msg:")
+
+
+def update_chat_id(update: Dict[str, Any]) -> int:
+    """Чат, до якого належить оновлення (для кнопок звіту — чат зі спамом)"""
+    for key in _CHAT_UPDATES:
+        event = update.get(key)
+        if event is not None:
+            return event["chat"]["id"]
+    callback = update.get("callback_query")
+    if callback is not None:
+        data = callback.get("data") or ""
+        if data.startswith(_REPORT_CALLBACKS):
+            try:
+                return int(data.rsplit(":", 1)[1])
+            except ValueError:
+                pass
+        message = callback.get("message")
+        if message is not None:
+            return message["chat"]["id"]
+        return callback["from"]["id"]
+    return update["update_id"]
+
+
+def shard_for(update: Dict[str, Any], shards: int) -> int:
+    return update_chat_id(update) % shards
+
+
+class ShardWorker:
+    """
+    Воркер шарду: отримує оновлення своїх чатів з черги процесу-входу і передає їх у Dispatcher.
+    Оновлення різних чатів обробляються паралельно, одного чату — строго по черзі.
+    Зміни паттернів і адмінів, відбитки видаленого спаму та приклади для моделі надсилаються входу,
+    а той розсилає їх іншим воркерам. На диск стан пише лише WRITER_SHARD.
+    """
+
+    def __init__(self, index: int, bot: Bot, dp: Dispatcher, spam_filter, inbox, control):
+        self.index = index
+        self.bot = bot
+        self.dp = dp
+        self.spam_filter = spam_filter
+        self.inbox = inbox
+        self.control = control
+        # Остання задача кожного чату: наступне оновлення чату чекає на неї
+        self._tails: Dict[int, asyncio.Task] = {}
+        self._stopped: Optional[asyncio.Event] = None
+        self.processed = 0
+
+    def _publish_patterns(self):
+        self.control.put(("patterns", self.index, self.spam_filter.export_state()))
+
+    def _publish_fingerprint(self, op: str, text: str, pattern):
+        self.control.put(("fingerprint", self.index, (op, text, pattern)))
+
+    def _publish_training(self, text: str, spam: bool, weight: int):
+        self.control.put(("train", self.index, (text, spam, weight)))
+
+    def _publish_admins(self):
+        self.control.put(("admins", self.index, admin_registry.dynamic_ids))
+
+    def _read_inbox(self, loop: asyncio.AbstractEventLoop):
+        """Окремий потік: multiprocessing.Queue.get блокує, тому не викликається в event loop"""
+        while True:
+            item = self.inbox.get()
+            loop.call_soon_threadsafe(self._dispatch, item)
+            if item[0] == "stop":
+                return
+
+    def _dispatch(self, item: tuple):
+        kind, payload = item
+        if kind == "update":
+            chat_id = update_chat_id(payload)
+            task = asyncio.create_task(self._feed(payload, self._tails.get(chat_id)))
+            self._tails[chat_id] = task
+            task.add_done_callback(lambda done, chat_id=chat_id: self._forget(chat_id, done))
+        elif kind == "patterns":
+            self.spam_filter.apply_state(payload)
+        elif kind == "admins":
+            admin_registry.apply(payload)
+        elif kind == "fingerprint":
+            op, text, pattern = payload
+            if op == "add":
+                self.spam_filter.remember_spam(text, pattern, publish=False)
+            else:
+                self.spam_filter.forget_spam(text, publish=False)
+        elif kind == "train":
+            text, spam, weight = payload
+            self.spam_filter.learn(text, spam, weight, publish=False)
+        elif kind == "stop":
+            self._stopped.set()
+
+    def _forget(self, chat_id: int, task: asyncio.Task):
+        if self._tails.get(chat_id) is task:
+            del self._tails[chat_id]
+
+    async def _feed(self, update: Dict[str, Any], previous: Optional[asyncio.Task]):
+        if previous is not None:
+            await asyncio.wait([previous])
+        try:
+            await self.dp.feed_raw_update(self.bot, update)
+        except Exception as e:
+            logger.exception("Shard %d: error processing update %s: %s", self.index, update.get("update_id"), e)
+        self.processed += 1
+
+    async def run(self):
+        """Обробляє оновлення до команди stop від входу, потім доробляє розпочаті"""
+        loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        if self.index != WRITER_SHARD:
+            self.spam_filter.set_read_only()
+            admin_registry.set_read_only()
+        self.spam_filter.on_change = self._publish_patterns
+        self.spam_filter.on_fingerprint = self._publish_fingerprint
+        self.spam_filter.on_train = self._publish_training
+        admin_registry.on_change = self._publish_admins
+        threading.Thread(target=self._read_inbox, args=(loop,), name=f"shard-{self.index}-inbox",
+                         daemon=True).start()
+        await self._stopped.wait()
+        if self._tails:
+            await asyncio.wait(list(self._tails.values()))
+        logger.info("Shard %d stopped after %d updates", self.index, self.processed)
+
+
+def _worker_main(index: int, shards: int, bot_token: str, ban_duration_days: int, mute_duration_days: int,
+                 inbox, control):
+    # Ctrl+C надходить усій групі процесів; воркер зупиняється командою від входу
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from core.bot import SpamBot
+    from models.settings import DOMAIN_LIST_PATH, FINGERPRINT_MAX_ENTRIES, FINGERPRINT_WINDOW_MINUTES, \
+        LOG_FORMAT, LOG_LEVEL, LOG_SAMPLING, MATCH_POOL_WORKERS, SCORER_PATH, SCORER_THRESHOLD
+    from utils.log import parse_sampling, setup_logging
+    from utils.regex import SpamFilter
+    # Кожен воркер пише в stdout через власну чергу й потік логування
+    setup_logging(LOG_LEVEL, LOG_FORMAT == "json", parse_sampling(LOG_SAMPLING))
+
+    async def main():
+        spam_filter = SpamFilter(pool_workers=MATCH_POOL_WORKERS, domain_list_path=DOMAIN_LIST_PATH,
+                                 fingerprint_window=FINGERPRINT_WINDOW_MINUTES * 60,
+                                 fingerprint_max_entries=FINGERPRINT_MAX_ENTRIES,
+                                 scorer_path=SCORER_PATH, scorer_threshold=SCORER_THRESHOLD)
+        spam_bot = SpamBot(bot_token, spam_filter, ban_duration_days, mute_duration_days, Dispatcher())
+        await spam_bot.start_shard(index, shards, inbox, control)
+    asyncio.run(main())
+
+
+class ShardRouter:
+    """
+    Процес-вхід: отримує оновлення (long polling або вебхук) і розподіляє їх між
+    N процесами-воркерами за chat_id. Кожен воркер має власний SpamFilter і власний event loop,
+    тож перевірка regex масштабується на кілька ядер, а порядок повідомлень у чаті зберігається.
+    """
+
+    def __init__(self, bot_token: str, shards: int, ban_duration_days: int, mute_duration_days: int):
+        self.bot_token = bot_token
+        self.shards = shards
+        self.ban_duration_days = ban_duration_days
+        self.mute_duration_days = mute_duration_days
+        self._context = multiprocessing.get_context("spawn")
+        self._inboxes: List[Any] = []
+        self._processes: List[Any] = []
+        self._control = None
+        self._relay: Optional[threading.Thread] = None
+        self.routed = [0] * shards
+        self.dropped = 0
+        # Скільки разів черга воркера була повна (вебхук відповідав 503, polling чекав)
+        self.backpressure = 0
+
+    def start(self):
+        self._control = self._context.Queue()
+        for index in range(self.shards):
+            inbox = self._context.Queue(maxsize=SHARD_QUEUE_SIZE)
+            process = self._context.Process(
+                target=_worker_main,
+                args=(index, self.shards, self.bot_token, self.ban_duration_days, self.mute_duration_days,
+                      inbox, self._control),
+                name=f"spam-bot-shard-{index}",
+            )
+            process.start()
+            self._inboxes.append(inbox)
+            self._processes.append(process)
+        self._relay = threading.Thread(target=self._relay_changes, name="shard-relay", daemon=True)
+        self._relay.start()
+        logger.info("Started %d shard workers", self.shards)
+
+    def _relay_changes(self):
+        """Розсилає зміни паттернів, адмінів, відбитки спаму та приклади навчання від одного воркера всім іншим"""
+        while True:
+            item = self._control.get()
+            if item is None:
+                return
+            kind, origin, payload = item
+            for index, inbox in enumerate(self._inboxes):
+                if index != origin:
+                    inbox.put((kind, payload))
+
+    def route(self, update: Dict[str, Any]) -> bool:
+        """Кладе оновлення в чергу воркера без очікування; False — черга повна"""
+        index = shard_for(update, self.shards)
+        try:
+            self._inboxes[index].put_nowait(("update", update))
+        except queue.Full:
+            self.backpressure += 1
+            return False
+        self.routed[index] += 1
+        return True
+
+    async def route_or_drop(self, update: Dict[str, Any]):
+        """Чекає на місце в черзі воркера до SHARD_PUT_TIMEOUT, не блокуючи event loop; далі відкидає оновлення"""
+        if self.route(update):
+            return
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + SHARD_PUT_TIMEOUT
+        while loop.time() < deadline:
+            await asyncio.sleep(SHARD_PUT_RETRY)
+            if self.route(update):
+                return
+        self.dropped += 1
+        logger.warning("Shard %d queue is full, dropping update %s", shard_for(update, self.shards), update.get("update_id"))
+
+    async def poll(self, bot: Bot):
+        """Long polling у процесі-вході: оновлення не розбираються, а лише пересилаються"""
+        await bot.delete_webhook()
+        offset = None
+        logger.info("Starting sharded polling...")
+        while True:
+            try:
+                updates = await bot.get_updates(offset=offset, timeout=POLL_TIMEOUT, allowed_updates=ALLOWED_UPDATES)
+            except TelegramRetryAfter as e:
+                await asyncio.sleep(e.retry_after)
+                continue
+            except Exception as e:
+                logger.error("Error getting updates: %s", e)
+                await asyncio.sleep(1)
+                continue
+            for update in updates:
+                offset = update.update_id + 1
+                await self.route_or_drop(update.model_dump(mode="json", by_alias=True, exclude_none=True))
+
+    def webhook_app(self, path: str, secret_token: Optional[str] = None) -> web.Application:
+        """aiohttp-застосунок входу: перевіряє секретний токен і пересилає оновлення воркерам"""
+        async def handle(request: web.Request) -> web.Response:
+            if secret_token and not secrets.compare_digest(
+                    request.headers.get("X-Telegram-Bot-Api-Secret-Token", ""), secret_token):
+                return web.Response(status=401, text="Unauthorized")
+            if not self.route(await request.json()):
+                # Telegram повторить доставку пізніше — оновлення не губиться, а вхід не чекає
+                return web.Response(status=503, text="Shard queue is full")
+            return web.Response()
+
+        app = web.Application()
+        app.router.add_post(path, handle)
+        return app
+
+    async def run(self, webhook_url: Optional[str] = None, host: str = "0.0.0.0", port: int = 8080,
+                  path: str = "/webhook", secret_token: Optional[str] = None):
+        """Запускає воркерів і приймає оновлення: вебхук, якщо задано webhook_url, інакше long polling"""
+        from core.webhook import run_webhook
+        self.start()
+        bot = Bot(token=self.bot_token)
+        try:
+            if webhook_url:
+                await bot.set_webhook(url=webhook_url.rstrip("/") + path, secret_token=secret_token or None,
+                                      allowed_updates=ALLOWED_UPDATES)
+                await run_webhook(self.webhook_app(path, secret_token), host, port)
+            else:
+                await self.poll(bot)
+        finally:
+            await asyncio.get_running_loop().run_in_executor(None, self.stop)
+            await bot.session.close()
+
+    def stop(self, timeout: float = SHARD_STOP_TIMEOUT):
+        """Просить воркерів доробити оновлення з черги й зупинитися; завислих завершує примусово"""
+        for inbox in self._inboxes:
+            inbox.put(("stop", None))
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                logger.warning("%s did not stop in %s s, terminating", process.name, timeout)
+                process.terminate()
+        if self._control is not None:
+            self._control.put(None)
+        logger.info("Shards stopped, routed updates: %s, dropped: %d, queue full: %d",
+                    self.routed, self.dropped, self.backpressure)
@@ -0,0 +1,79 @@
+import asyncio
+import logging
+import signal
+from typing import Awaitable, Callable, Optional
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+
+logger = logging.getLogger(__name__)
+
+# Скільки секунд при зупинці чекати на оновлення, які ще обробляються
+SHUTDOWN_TIMEOUT = 10.0
+
+
+class WebhookRequestHandler(SimpleRequestHandler):
+    """
+    Обробник вебхука aiogram: одразу відповідає Telegram 200 і обробляє оновлення у фоні.
+    Перевіряє X-Telegram-Bot-Api-Secret-Token і вміє дочекатися фонових оновлень при зупинці.
+    """
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._background_feed_update_tasks)
+
+    async def drain(self, timeout: float = SHUTDOWN_TIMEOUT):
+        tasks = set(self._background_feed_update_tasks)
+        if not tasks:
+            return
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        if pending:
+            logger.warning("Webhook shutdown: %d updates still in progress, cancelling", len(pending))
+            for task in pending:
+                task.cancel()
+
+
+def build_webhook_app(bot: Bot, dp: Dispatcher, path: str, secret_token: Optional[str] = None,
+                      on_shutdown: Optional[Callable[[], Awaitable[None]]] = None,
+                      shutdown_timeout: float = SHUTDOWN_TIMEOUT) -> web.Application:
+    """
+    aiohttp-застосунок з маршрутом POST path для оновлень Telegram.
+    При зупинці: сервер перестає приймати запити, фонові оновлення доробляються,
+    викликається on_shutdown (наприклад, дочекатися черги сповіщень), і лише потім
+    закривається сесія бота.
+    """
+    app = web.Application()
+    handler = WebhookRequestHandler(dispatcher=dp, bot=bot, secret_token=secret_token or None)
+
+    async def finish(_app: web.Application):
+        await handler.drain(shutdown_timeout)
+        if on_shutdown is not None:
+            await on_shutdown()
+
+    # Порядок важливий: finish має виконатися до закриття сесії бота в handler.register
+    app.on_shutdown.append(finish)
+    handler.register(app, path=path)
+    setup_application(app, dp, bot=bot)
+    app["webhook_handler"] = handler
+    return app
+
+
+async def run_webhook(app: web.Application, host: str, port: int):
+    """Запускає сервер і працює до SIGINT/SIGTERM, після чого коректно зупиняється"""
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass  # Windows: зупинка через KeyboardInterrupt
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    logger.info("Webhook server listening on %s:%s", host, port)
+    try:
+        await stop.wait()
+    finally:
+        logger.info("Stopping webhook server...")
+        await runner.cleanup()
@@ -1,15 +1,24 @@
 import asyncio
+import logging
 import os
 from dotenv import load_dotenv
 from aiogram import Dispatcher
 
 from core import SpamBot
+from core.sharding import ShardRouter
 from models import BAN_DURATION_DAYS, ADMIN_IDS, MUTE_DURATION_DAYS
+from models.settings import BOT_MODE, DOMAIN_LIST_PATH, FINGERPRINT_MAX_ENTRIES, FINGERPRINT_WINDOW_MINUTES, \
+    LOG_FORMAT, LOG_LEVEL, LOG_SAMPLING, MATCH_POOL_WORKERS, SCORER_PATH, SCORER_THRESHOLD, SHARDS, \
+    WEBHOOK_URL, WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET
 from utils import SpamFilter
+from utils.log import parse_sampling, setup_logging
+
+logger = logging.getLogger(__name__)
 
 async def main():
     """main function to start bot"""
-    print("Bot is starting...")
+    setup_logging(LOG_LEVEL, LOG_FORMAT == "json", parse_sampling(LOG_SAMPLING))
+    logger.info("Bot is starting...")
 
     # Load environment variables
     load_dotenv()
@@ -20,19 +29,36 @@ async def main():
 
     # Check if admin IDs are configured
     if not ADMIN_IDS:
-        print("⚠️  Warning: No admin IDs configured. Add ADMIN_IDS to your .env file")
-        print("   Example: ADMIN_IDS=123456789,987654321")
-        print("   Use /my_id command to get your Telegram ID")
+        logger.warning("No admin IDs configured. Add ADMIN_IDS to your .env file "
+                       "(e.g. ADMIN_IDS=123456789,987654321); use /my_id command to get your Telegram ID")
+
+    if BOT_MODE == "webhook" and not WEBHOOK_URL:
+        raise ValueError("WEBHOOK_URL is not set in .env file (required for BOT_MODE=webhook)")
+    if BOT_MODE == "webhook" and not WEBHOOK_SECRET:
+        logger.warning("WEBHOOK_SECRET is not set, webhook requests are not verified")
+
+    if SHARDS > 1:
+        # Цей процес лише приймає оновлення; фільтри та модерація — у процесах-воркерах
+        router = ShardRouter(bot_token, SHARDS, BAN_DURATION_DAYS, MUTE_DURATION_DAYS)
+        await router.run(WEBHOOK_URL if BOT_MODE == "webhook" else None, WEBHOOK_HOST, WEBHOOK_PORT,
+                         WEBHOOK_PATH, WEBHOOK_SECRET)
+        return
 
     # Initialize SpamFilter (фільтри завантажуються з filters.json)
-    spam_filter = SpamFilter()
+    spam_filter = SpamFilter(pool_workers=MATCH_POOL_WORKERS, domain_list_path=DOMAIN_LIST_PATH,
+                             fingerprint_window=FINGERPRINT_WINDOW_MINUTES * 60,
+                             fingerprint_max_entries=FINGERPRINT_MAX_ENTRIES,
+                             scorer_path=SCORER_PATH, scorer_threshold=SCORER_THRESHOLD)
 
     # Initialize Dispatcher
     dp = Dispatcher()
 
     # Initialize and run the bot
     spam_bot = SpamBot(bot_token, spam_filter, BAN_DURATION_DAYS, MUTE_DURATION_DAYS, dp)
-    await spam_bot.start_polling()
+    if BOT_MODE == "webhook":
+        await spam_bot.start_webhook(WEBHOOK_URL, WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET)
+    else:
+        await spam_bot.start_polling()
     
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
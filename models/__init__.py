@@ -1,2 +1,2 @@
-from .settings import SPAM_PATTERN_STRING, BAN_DURATION_DAYS, ADMIN_IDS, MUTE_DURATION_DAYS
+from .settings import SPAM_PATTERN_STRING, BAN_DURATION_DAYS, ADMIN_IDS, MUTE_DURATION_DAYS, admin_registry
 
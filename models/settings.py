@@ -1,9 +1,13 @@
 # settings.py
 
+import logging
 import os
 import re
-import json
+from typing import Callable, Iterable, Optional
 from dotenv import load_dotenv
+from utils.storage import JournaledSet
+
+logger = logging.getLogger(__name__)
 
 # Load environment variables
 load_dotenv()
@@ -15,72 +19,161 @@ SPAM_PATTERN_STRING = r'([рp][уy]бл(и|ей|ий|ями|я)?)|([уy]д[аa]
 # The pattern will be compiled in the SpamFilter class
 
 # Admin panel settings
-def get_admin_ids():
-    """Get admin IDs from environment variable"""
-    admin_ids_str = os.getenv("ADMIN_IDS", "")
+# How often (seconds) admins.json is checked for edits made outside the bot
+ADMIN_FILE_CHECK_INTERVAL = 1.0
+
+def _parse_admin_ids(admin_ids_str: str) -> frozenset:
+    """Parse comma-separated IDs from the ADMIN_IDS environment variable"""
     if not admin_ids_str:
-        return []
-    
+        return frozenset()
     try:
-        # Parse comma-separated IDs
-        admin_ids = [int(id.strip()) for id in admin_ids_str.split(",") if id.strip()]
-        return admin_ids
+        return frozenset(int(id.strip()) for id in admin_ids_str.split(",") if id.strip())
     except ValueError:
-        print("Warning: Invalid ADMIN_IDS format in .env file")
-        return []
+        logger.warning("Invalid ADMIN_IDS format in .env file")
+        return frozenset()
+
+
+class AdminRegistry:
+    """
+    Admin IDs (.env + dynamic) kept in memory as a frozenset for O(1) checks.
+    The set is rebuilt on every write and when admins.json changes on disk.
+    """
+
+    def __init__(self, path: str = "admins.json"):
+        self.env_ids = _parse_admin_ids(os.getenv("ADMIN_IDS", ""))
+        # Dynamic admins: admins.json snapshot plus a change journal, written off the event loop
+        self._dynamic = JournaledSet(path, "dynamic admins")
+        self._dynamic.load()
+        self._all = self._build()
+        # Called after every local change (sharding: broadcast the new set to other workers)
+        self.on_change: Optional[Callable[[], None]] = None
+
+    def _build(self) -> frozenset:
+        return self.env_ids | frozenset(self._dynamic.values)
+
+    def _refresh(self):
+        if self._dynamic.reload_if_changed(ADMIN_FILE_CHECK_INTERVAL):
+            self._all = self._build()
+
+    @property
+    def all_ids(self) -> frozenset:
+        self._refresh()
+        return self._all
+
+    @property
+    def dynamic_ids(self) -> list:
+        self._refresh()
+        return sorted(self._dynamic.values)
+
+    def is_admin(self, user_id: int) -> bool:
+        return user_id in self.all_ids
+
+    def is_env_admin(self, user_id: int) -> bool:
+        return user_id in self.env_ids
+
+    def add(self, admin_ids) -> int:
+        """Add dynamic admins (IDs from .env are skipped); returns how many were added"""
+        added = self._dynamic.add(admin_id for admin_id in admin_ids if admin_id not in self.env_ids)
+        if added:
+            self._changed()
+        return added
+
+    def remove(self, admin_ids) -> int:
+        """Remove dynamic admins (IDs from .env can't be removed); returns how many were removed"""
+        removed = self._dynamic.discard(admin_id for admin_id in admin_ids if admin_id not in self.env_ids)
+        if removed:
+            self._changed()
+        return removed
+
+    def replace(self, admin_ids):
+        self._dynamic.replace(admin_ids)
+        self._changed()
+
+    def _changed(self):
+        self._all = self._build()
+        if self.on_change is not None:
+            self.on_change()
+
+    def apply(self, admin_ids: Iterable[int]):
+        """Use dynamic admins received from another process; only the process owning admins.json writes them"""
+        if self._dynamic.read_only:
+            self._dynamic.sync(admin_ids)
+        else:
+            self._dynamic.replace(admin_ids)
+        self._all = self._build()
+
+    def set_read_only(self, read_only: bool = True):
+        """admins.json is written by another process: changes stay in memory"""
+        self._dynamic.read_only = read_only
+
+
+admin_registry = AdminRegistry()
+
+def get_admin_ids():
+    """Get admin IDs from environment variable"""
+    return sorted(admin_registry.env_ids)
 
 def get_all_admin_ids():
     """Get all admin IDs (from .env + dynamic admins)"""
-    env_admins = get_admin_ids()
-    dynamic_admins = get_dynamic_admin_ids()
-    return list(set(env_admins + dynamic_admins))
+    return list(admin_registry.all_ids)
 
 def get_dynamic_admin_ids():
     """Get dynamically added admin IDs"""
-    try:
-        if os.path.exists("admins.json"):
-            with open("admins.json", "r", encoding="utf-8") as f:
-                return json.load(f)
-    except Exception as e:
-        print(f"Error loading dynamic admins: {e}")
-    return []
+    return admin_registry.dynamic_ids
 
 def save_dynamic_admin_ids(admin_ids: list):
     """Save dynamically added admin IDs"""
-    try:
-        with open("admins.json", "w", encoding="utf-8") as f:
-            json.dump(admin_ids, f, ensure_ascii=False, indent=2)
-    except Exception as e:
-        print(f"Error saving dynamic admins: {e}")
+    admin_registry.replace(admin_ids)
 
 def add_dynamic_admin(admin_id: int) -> bool:
     """Add a new dynamic admin"""
-    if admin_id in get_admin_ids():  # Don't add if already in .env
-        return False
-    
-    dynamic_admins = get_dynamic_admin_ids()
-    if admin_id not in dynamic_admins:
-        dynamic_admins.append(admin_id)
-        save_dynamic_admin_ids(dynamic_admins)
-        return True
-    return False
+    return admin_registry.add([admin_id]) > 0
 
 def remove_dynamic_admin(admin_id: int) -> bool:
     """Remove a dynamic admin"""
-    if admin_id in get_admin_ids():  # Can't remove .env admins
-        return False
-    
-    dynamic_admins = get_dynamic_admin_ids()
-    if admin_id in dynamic_admins:
-        dynamic_admins.remove(admin_id)
-        save_dynamic_admin_ids(dynamic_admins)
-        return True
-    return False
+    return admin_registry.remove([admin_id]) > 0
 
 def is_env_admin(admin_id: int) -> bool:
     """Check if admin is from .env file"""
-    return admin_id in get_admin_ids()
+    return admin_registry.is_env_admin(admin_id)
 
 ADMIN_IDS = get_all_admin_ids()
 MUTE_DURATION_DAYS = int(os.getenv("MUTE_DURATION_DAYS", 2)) or 2   # наприклад, 2 дні
-BAN_DURATION_DAYS = int(os.getenv("BAN_DURATION_DAYS", 30)) or 30   # наприклад, 30 днів
\ No newline at end of file
+BAN_DURATION_DAYS = int(os.getenv("BAN_DURATION_DAYS", 30)) or 30   # наприклад, 30 днів
+# Deleted messages kept for the "restore" button: memory cap and lifetime
+DELETED_MESSAGES_MAX_MB = int(os.getenv("DELETED_MESSAGES_MAX_MB", 16)) or 16
+DELETED_MESSAGES_TTL_HOURS = int(os.getenv("DELETED_MESSAGES_TTL_HOURS", 24)) or 24
+# Optional SQLite moderation log (deleted messages and actions); empty disables it
+MODERATION_DB_PATH = os.getenv("MODERATION_DB_PATH", "")
+
+# Processes that match long messages off the event loop; 0 matches everything inline
+MATCH_POOL_WORKERS = int(os.getenv("MATCH_POOL_WORKERS", 2))
+# Read-only domain blocklist: one domain per line, optionally gzipped (build with `python -m utils.domains`)
+DOMAIN_LIST_PATH = os.getenv("DOMAIN_LIST_PATH", "blocked_domains.txt.gz")
+# Fingerprints of deleted spam: copies in any chat are removed without regex for this long, up to this many
+FINGERPRINT_WINDOW_MINUTES = int(os.getenv("FINGERPRINT_WINDOW_MINUTES", 60)) or 60
+FINGERPRINT_MAX_ENTRIES = int(os.getenv("FINGERPRINT_MAX_ENTRIES", 100000)) or 100000
+# Optional second-stage scorer trained from the Ban/Restore buttons; empty path disables it
+SCORER_PATH = os.getenv("SCORER_PATH", "")
+# Spam probability at which the scorer deletes a message the patterns let through
+SCORER_THRESHOLD = float(os.getenv("SCORER_THRESHOLD", 0.95)) or 0.95
+# Flood: this many messages from one user in a group within the window gets them muted.
+# Opt-in (0 disables it): existing chats may have chatty users who are not spammers; 10 suits most groups
+FLOOD_MESSAGES = int(os.getenv("FLOOD_MESSAGES", 0))
+FLOOD_WINDOW_SECONDS = float(os.getenv("FLOOD_WINDOW_SECONDS", 5)) or 5.0
+# Logging: level, "text" or "json" lines, and the share of records kept per level ("DEBUG=0.01,INFO=1")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").strip().upper() or "INFO"
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").strip().lower()
+LOG_SAMPLING = os.getenv("LOG_SAMPLING", "DEBUG=0.01")
+
+# Update delivery: "polling" (default) or "webhook"
+BOT_MODE = os.getenv("BOT_MODE", "polling").strip().lower()
+# Webhook mode: public base URL for Telegram, local listen address, route and secret token
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", 8080))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+
+# Number of worker processes; above 1 one ingress process routes updates to workers by chat_id
+SHARDS = max(1, int(os.getenv("SHARDS", 1)))
@@ -0,0 +1,39 @@
+import re
+
+import pytest
+
+from utils.normalize import normalize_pattern, normalize_text
+
+# Літеральні паттерни з цифрами на краю чисел і всередині слів
+LITERALS = [
+    "500руб",
+    "2000р",
+    "3аработок",
+    "зароботок3",
+    "300 грн",
+    "р0зыгрыш",
+    "зар4бок",
+    "Х0Р0ШИЙ",
+    "вих0д 24/7",
+    "casino",
+]
+
+
+@pytest.mark.parametrize("literal", LITERALS)
+def test_literal_pattern_matches_same_text(literal):
+    """Паттерн, що складається лише з літералів, збігається з тим самим текстом"""
+    pattern = re.compile(normalize_pattern(literal), re.IGNORECASE)
+    assert pattern.fullmatch(normalize_text(literal))
+
+
+@pytest.mark.parametrize("pattern, text", [
+    ("р0зыгрыш", "розыгрыш"),
+    (r"\b3аработок", "заработок"),
+    ("[ао]0+б", "ао0б"),
+])
+def test_digit_matches_letter_variant(pattern, text):
+    assert re.search(normalize_pattern(pattern), normalize_text(text), re.IGNORECASE)
+
+
+def test_digit_next_to_digit_stays_digit():
+    assert normalize_pattern("500руб") == "500руб"
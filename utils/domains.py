@@ -0,0 +1,227 @@
+import gzip
+import logging
+import re
+import sys
+from typing import Iterable, List, NamedTuple, Optional, Set, Tuple
+from utils.storage import JournaledSet
+
+logger = logging.getLogger(__name__)
+
+# Префікс правила «лише піддомени»: *.example.com блокує a.example.com, але не example.com
+WILDCARD_PREFIX = "*."
+# Префікс паттерну в MatchResult для доменних спрацювань (лічильники, журнал модерації)
+DOMAIN_PATTERN_PREFIX = "domain:"
+
+# Хост у тексті: необов'язкова схема та userinfo, далі мітки через крапку; TLD — літери або punycode.
+# \w охоплює й нелатинські літери, тож IDN на кшталт пример.рф теж знаходяться
+_HOST_RE = re.compile(
+    r"(?<![\w.-])(?:[a-z][a-z0-9+.-]*://)?(?:[^\s/@]+@)?"
+    r"((?:[\w-]+\.)+(?:[^\W\d_]{2,}|xn--[a-z0-9-]+))(?![\w-])",
+    re.IGNORECASE,
+)
+# Рядок списку: hosts-формат («0.0.0.0 example.com»), Adblock («||example.com^») або просто домен
+_LIST_PREFIXES = ("0.0.0.0 ", "127.0.0.1 ", "||")
+
+
+def normalize_domain(value: str) -> Optional[str]:
+    """
+    Канонічна форма домену для порівняння: нижній регістр, без схеми, шляху, порту та кінцевої крапки,
+    нелатинські мітки — в punycode (IDNA). Префікс *. зберігається. None — якщо це не домен.
+    """
+    value = value.strip().lower()
+    wildcard = value.startswith(WILDCARD_PREFIX)
+    if wildcard:
+        value = value[len(WILDCARD_PREFIX):]
+    if "://" in value:
+        value = value.split("://", 1)[1]
+    value = value.split("/", 1)[0].split("?", 1)[0].rsplit("@", 1)[-1].split(":", 1)[0].rstrip(".")
+    if "." not in value:
+        return None
+    if not value.isascii():
+        try:
+            value = value.encode("idna").decode("ascii")
+        except UnicodeError:
+            return None
+    labels = value.split(".")
+    if labels[-1].isdigit() or any(
+            not label or len(label) > 63 or label.startswith("-") or label.endswith("-") for label in labels):
+        return None
+    return WILDCARD_PREFIX + value if wildcard else value
+
+
+def parse_list_line(line: str) -> Optional[str]:
+    """Домен з рядка списку блокування; коментарі (# або !) і порожні рядки — None"""
+    line = line.strip()
+    if not line or line[0] in "#!":
+        return None
+    for prefix in _LIST_PREFIXES:
+        if line.startswith(prefix):
+            line = line[len(prefix):]
+            break
+    return normalize_domain(line.split("#", 1)[0].split("^", 1)[0].split()[0]) if line else None
+
+
+def read_domain_list(path: str) -> List[str]:
+    """
+    Читає компактний список: один канонічний домен на рядок, відсортовано, необов'язково gzip (.gz).
+    Рядки не розбираються повторно — список уже нормалізовано під час збирання (compile_domain_list).
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as f:
+        return f.read().decode("ascii").split()
+
+
+def compile_domain_list(sources: Iterable[str], path: str) -> int:
+    """Збирає компактний список з файлів у форматі hosts/Adblock/простого списку; повертає кількість доменів"""
+    domains: Set[str] = set()
+    for source in sources:
+        with open(source, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                domain = parse_list_line(line)
+                if domain is not None:
+                    domains.add(domain)
+    data = ("\n".join(sorted(domains)) + "\n").encode("ascii")
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "wb") as f:
+        f.write(data)
+    return len(domains)
+
+
+class DomainMatch(NamedTuple):
+    """Заблокований хост і правило списку, що на нього спрацювало"""
+    host: str
+    rule: str
+    span: Tuple[int, int]  # позиції хоста в тексті
+
+
+class DomainBlocklist:
+    """
+    Список заблокованих доменів з індексом суфіксів: хост a.b.example.com перевіряється
+    по черзі як a.b.example.com, b.example.com, example.com, com — по одному пошуку в множині на мітку,
+    незалежно від розміру списку. Правило example.com блокує домен і всі піддомени,
+    *.example.com — лише піддомени.
+    Базовий список (DOMAIN_LIST_PATH) лише читається; домени, додані через адмін-панель,
+    зберігаються в domains.json (знімок плюс журнал змін).
+    """
+
+    def __init__(self, list_path: str = "", store_path: str = "domains.json"):
+        self.list_path = list_path
+        # Домени з базового списку та додані адмінами — окремо, щоб зміни не переписували базовий список
+        self._base: Set[str] = set()
+        self.dynamic: Set[str] = set()
+        self._domains: Set[str] = set()
+        self._wildcards: Set[str] = set()
+        self._store = JournaledSet(store_path, "domains")
+        if list_path:
+            self.load_list(list_path)
+        self.dynamic = {domain for domain in self._store.load() if normalize_domain(domain) == domain}
+        self._rebuild()
+
+    def __len__(self) -> int:
+        return len(self._domains) + len(self._wildcards)
+
+    @property
+    def base_count(self) -> int:
+        return len(self._base)
+
+    def load_list(self, path: str) -> int:
+        try:
+            self._base = set(read_domain_list(path))
+            logger.info("Завантажено %d доменів з %s", len(self._base), path)
+        except FileNotFoundError:
+            self._base = set()
+        except Exception as e:
+            logger.error("Error loading domain list %s: %s", path, e)
+        self._rebuild()
+        return len(self._base)
+
+    def _rebuild(self):
+        domains, wildcards = set(), set()
+        for rule in self._base | self.dynamic:
+            if rule.startswith(WILDCARD_PREFIX):
+                wildcards.add(rule[len(WILDCARD_PREFIX):])
+            else:
+                domains.add(rule)
+        self._domains, self._wildcards = domains, wildcards
+
+    def add_domains(self, values: Iterable[str]) -> Tuple[List[str], List[str]]:
+        """Додає домени (можна URL або *.домен); повертає (додані, некоректні)"""
+        added, invalid = [], []
+        for value in values:
+            domain = normalize_domain(value)
+            if domain is None:
+                invalid.append(value.strip())
+            elif domain not in self.dynamic:
+                added.append(domain)
+        if added:
+            self.dynamic.update(added)
+            self._store.add(added)
+            self._rebuild()
+        return list(dict.fromkeys(added)), invalid
+
+    def remove_domains(self, values: Iterable[str]) -> int:
+        """Видаляє домени, додані через адмін-панель (базовий список не змінюється)"""
+        removed = {normalize_domain(value) for value in values} & self.dynamic
+        if removed:
+            self.dynamic -= removed
+            self._store.discard(removed)
+            self._rebuild()
+        return len(removed)
+
+    def set_dynamic(self, domains: Iterable[str]):
+        """
+        Замінює додані адмінами домени станом від іншого процесу. На диск його пише лише
+        процес-власник файлу, решта оновлюють пам'ять (див. set_read_only)
+        """
+        self.dynamic = set(domains)
+        if self._store.read_only:
+            self._store.sync(self.dynamic)
+        else:
+            self._store.replace(self.dynamic)
+        self._rebuild()
+
+    def set_read_only(self, read_only: bool = True):
+        """domains.json пише інший процес: зміни лишаються в пам'яті"""
+        self._store.read_only = read_only
+
+    def get_domains(self) -> List[str]:
+        return sorted(self.dynamic)
+
+    def match_host(self, host: str) -> Optional[str]:
+        """Правило, що блокує канонічний хост, або None"""
+        if host in self._domains:
+            return host
+        dot = host.find(".")
+        while dot != -1:
+            suffix = host[dot + 1:]
+            if suffix in self._domains:
+                return suffix
+            if suffix in self._wildcards:
+                return WILDCARD_PREFIX + suffix
+            dot = host.find(".", dot + 1)
+        return None
+
+    def find(self, text: str) -> Optional[DomainMatch]:
+        """Перший заблокований хост у тексті (URL, посилання з кнопок, голі домени)"""
+        if not self._domains and not self._wildcards:
+            return None
+        for found in _HOST_RE.finditer(text):
+            host = normalize_domain(found.group(1))
+            if host is None:
+                continue
+            rule = self.match_host(host)
+            if rule is not None:
+                return DomainMatch(host, rule, found.span(1))
+        return None
+
+    async def flush(self):
+        await self._store.flush()
+
+
+if __name__ == "__main__":
+    # uv run python -m utils.domains hosts.txt adblock.txt blocked_domains.txt.gz
+    if len(sys.argv) < 3:
+        print("Usage: python -m utils.domains SOURCE [SOURCE ...] OUTPUT[.gz]")
+        sys.exit(1)
+    count = compile_domain_list(sys.argv[1:-1], sys.argv[-1])
+    print(f"Записано {count} доменів у {sys.argv[-1]}")
@@ -0,0 +1,168 @@
+import re
+import time
+from array import array
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Tuple
+
+# Скільки секунд пам'ятати відбиток спаму: кампанії розсилають копії за секунди-хвилини
+FINGERPRINT_WINDOW = 3600
+# Скільки відбитків тримати одночасно; найдавніші витісняються (≈0.8 КБ на відбиток)
+FINGERPRINT_MAX_ENTRIES = 100_000
+# Тексти з меншою кількістю слів не індексуються: «привіт» чи посилання без тексту не є ознакою кампанії
+FINGERPRINT_MIN_WORDS = 5
+# Відбиток будується з початку тексту: довгі копії відрізняються від оригіналу не менше, ніж початок
+FINGERPRINT_MAX_CHARS = 2048
+# Скетч — SKETCH_SIZE найменших хешів шинглів (слів і пар сусідніх слів), тобто bottom-k MinHash.
+# Окремі слова тримають подібність коротких текстів, у яких замінене слово змінює дві пари з небагатьох
+SKETCH_SIZE = 32
+# LSH: INDEX_KEYS найменших хешів — ключі індексу. Найменший хеш об'єднання двох текстів спільний для обох
+# з імовірністю, рівною їхній подібності, тож копія з подібністю 0.7 має спільний ключ з імовірністю ~99%
+INDEX_KEYS = 4
+# Оцінка подібності Жаккара за скетчами, від якої текст вважається копією
+SIMILARITY_THRESHOLD = 0.7
+# Префікс паттерну в MatchResult для спрацювань за відбитком
+DUPLICATE_PATTERN_PREFIX = "duplicate:"
+
+# Слова без цифр: у копіях найчастіше змінюють суми, емодзі та пунктуацію, тож вони не враховуються
+_WORD_RE = re.compile(r"[^\W\d_]+")
+
+
+def text_sketch(text: str) -> Optional[array]:
+    """
+    Скетч нормалізованого тексту: SKETCH_SIZE найменших хешів слів і пар сусідніх слів, за зростанням.
+    Одна хеш-функція і одне сортування замість SKETCH_SIZE хеш-функцій класичного MinHash;
+    хешування йде через map/zip, без циклу на рівні Python. None — текст закороткий для відбитка.
+    """
+    words = _WORD_RE.findall(text[:FINGERPRINT_MAX_CHARS])
+    if len(words) < FINGERPRINT_MIN_WORDS:
+        return None
+    hashes = set(map(hash, words))
+    hashes.update(map(hash, zip(words, words[1:])))
+    hashes = sorted(hashes)
+    return array("q", hashes[:SKETCH_SIZE])
+
+
+def similarity(first: array, second: array) -> float:
+    """Оцінка подібності Жаккара: яка частка найменших хешів об'єднання є в обох скетчах"""
+    common = set(first).intersection(second)
+    union = sorted(set(first).union(second))[:SKETCH_SIZE]
+    return sum(1 for value in union if value in common) / len(union)
+
+
+class DuplicateMatch(NamedTuple):
+    """Відбиток, на який схожий текст: паттерн оригіналу та оцінка подібності"""
+    pattern: Optional[str]
+    similarity: float
+
+
+class _Fingerprint:
+    __slots__ = ("timestamp", "sketch", "pattern")
+
+    def __init__(self, timestamp: float, sketch: array, pattern: Optional[str]):
+        self.timestamp = timestamp
+        self.sketch = sketch
+        self.pattern = pattern
+
+
+class FingerprintIndex:
+    """
+    Відбитки видаленого спаму для пошуку копій у будь-якому чаті без regex.
+    Кілька найменших хешів скетча — ключі у словнику (LSH), тож пошук кандидатів — кілька звернень
+    до словника, незалежно від кількості відбитків. Кандидат підтверджується оцінкою подібності скетчів.
+    Відбитки живуть window секунд, понад max_entries витісняються найдавніші; прострочені
+    прибираються ліниво — під час додавання і пошуку.
+    Хеші — вбудований hash(), тому відбитки дійсні лише в межах процесу (між шардами передається текст).
+    """
+
+    def __init__(self, window: float = FINGERPRINT_WINDOW, max_entries: int = FINGERPRINT_MAX_ENTRIES):
+        self.window = window
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, _Fingerprint]" = OrderedDict()
+        # Ключ (один з найменших хешів) -> номер останнього відбитка з таким ключем
+        self._keys: Dict[int, int] = {}
+        self._next_id = 0
+        self.lookups = 0
+        self.hits = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _evict(self, now: float):
+        entries = self._entries
+        while entries:
+            entry_id, entry = next(iter(entries.items()))
+            if len(entries) <= self.max_entries and now - entry.timestamp < self.window:
+                break
+            self._remove(entry_id)
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id)
+        for key in entry.sketch[:INDEX_KEYS]:
+            if self._keys.get(key) == entry_id:
+                del self._keys[key]
+
+    def _lookup(self, sketch: array) -> Optional[Tuple[int, float]]:
+        checked = set()
+        for key in sketch[:INDEX_KEYS]:
+            entry_id = self._keys.get(key)
+            if entry_id is None or entry_id in checked:
+                continue
+            checked.add(entry_id)
+            score = similarity(sketch, self._entries[entry_id].sketch)
+            if score >= SIMILARITY_THRESHOLD:
+                return entry_id, score
+        return None
+
+    def add(self, text: str, pattern: Optional[str] = None, now: Optional[float] = None) -> bool:
+        """Запам'ятовує нормалізований текст видаленого спаму; копія вже відомого лише оновлює час"""
+        sketch = text_sketch(text)
+        if sketch is None:
+            return False
+        now = time.monotonic() if now is None else now
+        self._evict(now)
+        found = self._lookup(sketch)
+        if found is not None and found[1] == 1.0:
+            entry = self._entries[found[0]]
+            entry.timestamp = now
+            self._entries.move_to_end(found[0])
+            return False
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = _Fingerprint(now, sketch, pattern)
+        for key in sketch[:INDEX_KEYS]:
+            self._keys[key] = entry_id
+        if len(self._entries) > self.max_entries:
+            self._evict(now)
+        return True
+
+    def find(self, text: str, now: Optional[float] = None) -> Optional[DuplicateMatch]:
+        """Схожий відбиток для нормалізованого тексту або None"""
+        if not self._entries:
+            return None
+        sketch = text_sketch(text)
+        if sketch is None:
+            return None
+        self.lookups += 1
+        self._evict(time.monotonic() if now is None else now)
+        found = self._lookup(sketch)
+        if found is None:
+            return None
+        self.hits += 1
+        entry_id, score = found
+        return DuplicateMatch(self._entries[entry_id].pattern, score)
+
+    def forget(self, text: str) -> int:
+        """Прибирає відбитки, схожі на текст (адмін повернув повідомлення — це не спам)"""
+        sketch = text_sketch(text)
+        if sketch is None:
+            return 0
+        removed = 0
+        while True:
+            found = self._lookup(sketch)
+            if found is None:
+                return removed
+            self._remove(found[0])
+            removed += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._entries), "lookups": self.lookups, "hits": self.hits}
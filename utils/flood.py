@@ -0,0 +1,121 @@
+import time
+from array import array
+from typing import Dict, List, Optional
+
+# Флуд: FLOOD_MESSAGES повідомлень від одного користувача в чаті за FLOOD_WINDOW секунд
+FLOOD_MESSAGES = 10
+FLOOD_WINDOW = 5.0
+# Скільки слотів перевіряти на простій під час кожного повідомлення (ліниве прибирання)
+FLOOD_SWEEP_STEP = 8
+# Паттерн у MatchResult для спрацювань за флудом (звіт адмінам, журнал модерації)
+FLOOD_PATTERN = "flood"
+
+# Telegram гарантує, що id користувача вміщується в 52 біти: (chat_id, user_id) пакується в одне ціле
+_USER_BITS = 52
+
+
+class FloodDetector:
+    """
+    Лічильник частоти повідомлень для кожної пари (chat_id, user_id) — відро токенів.
+    Відро вміщує FLOOD_MESSAGES - 1 токенів і повністю наповнюється за window секунд;
+    повідомлення бере один токен, а повідомлення, якому токена не вистачило, — флуд.
+    Стан зберігається в масивах array (16 байт на слот), словник лише відображає
+    упакований ключ на номер слота, тож сотні тисяч активних користувачів займають десятки МБ.
+    Слот, що простояв window секунд, нічим не відрізняється від нового (відро повне),
+    тому прибирається ліниво: кожне повідомлення перевіряє кілька слотів по колу і звільняє простійні.
+    Альбом (media_group_id) рахується як одне повідомлення.
+    """
+
+    def __init__(self, messages: int = FLOOD_MESSAGES, window: float = FLOOD_WINDOW,
+                 sweep_step: int = FLOOD_SWEEP_STEP):
+        self.messages = messages
+        self.window = window
+        self.sweep_step = sweep_step
+        self.capacity = float(max(messages - 1, 0))
+        self.rate = self.capacity / window
+        # Упакований ключ -> номер слота
+        self._slots: Dict[int, int] = {}
+        # За номером слота: ключ (None — вільний), токени, час останнього повідомлення, хеш альбому
+        self._keys: List[Optional[int]] = []
+        self._tokens = array("d")
+        self._updated = array("d")
+        self._groups = array("q")
+        self._free = array("q")
+        self._cursor = 0
+        self.checks = 0
+        self.floods = 0
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def _sweep(self, now: float):
+        keys = self._keys
+        size = len(keys)
+        if not size:
+            return
+        cursor = self._cursor
+        for _ in range(min(self.sweep_step, size)):
+            if cursor >= size:
+                cursor = 0
+            key = keys[cursor]
+            if key is not None and now - self._updated[cursor] >= self.window:
+                del self._slots[key]
+                keys[cursor] = None
+                self._free.append(cursor)
+                self.evicted += 1
+            cursor += 1
+        self._cursor = cursor
+
+    def _allocate(self, key: int, now: float) -> int:
+        if self._free:
+            slot = self._free.pop()
+            self._keys[slot] = key
+            self._tokens[slot] = self.capacity
+            self._updated[slot] = now
+            self._groups[slot] = 0
+        else:
+            slot = len(self._keys)
+            self._keys.append(key)
+            self._tokens.append(self.capacity)
+            self._updated.append(now)
+            self._groups.append(0)
+        self._slots[key] = slot
+        return slot
+
+    def hit(self, chat_id: int, user_id: int, media_group_id: Optional[str] = None,
+            now: Optional[float] = None) -> bool:
+        """Враховує повідомлення користувача; True — поріг флуду перевищено"""
+        now = time.monotonic() if now is None else now
+        self.checks += 1
+        self._sweep(now)
+        key = (chat_id << _USER_BITS) + user_id
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._allocate(key, now)
+        group = hash(media_group_id) if media_group_id else 0
+        if group and self._groups[slot] == group:
+            # Наступне фото того самого альбому
+            return False
+        self._groups[slot] = group
+        tokens = min(self.capacity, self._tokens[slot] + (now - self._updated[slot]) * self.rate)
+        self._updated[slot] = now
+        if tokens < 1.0:
+            # Токени не йдуть у мінус: після паузи користувач знову може писати, а не відпрацьовує борг
+            self._tokens[slot] = tokens
+            self.floods += 1
+            return True
+        self._tokens[slot] = tokens - 1.0
+        return False
+
+    def reset(self, chat_id: int, user_id: int):
+        """Забуває лічильник користувача (адмін зняв обмеження)"""
+        key = (chat_id << _USER_BITS) + user_id
+        slot = self._slots.pop(key, None)
+        if slot is not None:
+            self._keys[slot] = None
+            self._free.append(slot)
+
+    def stats(self) -> Dict[str, int]:
+        return {"tracked": len(self._slots), "slots": len(self._keys), "checks": self.checks,
+                "floods": self.floods, "evicted": self.evicted}
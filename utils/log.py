@@ -0,0 +1,110 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+from typing import Dict, Optional
+
+# Структуровані поля, що передаються через extra=...; у текстовому виводі — key=value після повідомлення
+LOG_FIELDS = ("chat_id", "user_id", "message_id", "pattern_id", "pattern", "latency_ms")
+# Формат текстового рядка
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+# aiogram пише кожне оновлення на INFO («Update id=... is handled») — для нього лише попередження
+QUIET_LOGGERS = ("aiogram.event",)
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def parse_sampling(value: str) -> Dict[int, float]:
+    """«DEBUG=0.01,INFO=1» -> {DEBUG: 0.01, INFO: 1.0}: яка частка записів рівня потрапляє в лог"""
+    rates: Dict[int, float] = {}
+    for item in value.split(","):
+        name, _, rate = item.partition("=")
+        level = logging.getLevelName(name.strip().upper())
+        if not isinstance(level, int):
+            continue
+        try:
+            rates[level] = min(max(float(rate), 0.0), 1.0)
+        except ValueError:
+            continue
+    return rates
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускає лише частку записів заданих рівнів; інші рівні проходять усі"""
+
+    def __init__(self, rates: Dict[int, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self.rates.get(record.levelno)
+        return rate is None or rate >= 1.0 or random.random() < rate
+
+
+class StructuredFormatter(logging.Formatter):
+    """Текст «час рівень логер: повідомлення key=value ...» або один JSON-об'єкт на рядок"""
+
+    def __init__(self, json_output: bool = False):
+        super().__init__(LOG_FORMAT)
+        self.json_output = json_output
+
+    @staticmethod
+    def _fields(record: logging.LogRecord) -> Dict[str, object]:
+        return {name: getattr(record, name) for name in LOG_FIELDS if hasattr(record, name)}
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        text = super().formatMessage(record)
+        fields = self._fields(record)
+        if fields:
+            text += " " + " ".join(f"{name}={value}" for name, value in fields.items())
+        return text
+
+    def format(self, record: logging.LogRecord) -> str:
+        if not self.json_output:
+            return super().format(record)
+        entry = {"time": self.formatTime(record), "level": record.levelname, "logger": record.name,
+                 "message": record.getMessage(), **self._fields(record)}
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler без форматування в потоці, що пише: стандартний prepare() підставляє аргументи
+    ще в event loop. Черга в межах процесу, тож запис передається як є, а рядок збирає потік QueueListener.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def setup_logging(level: str = "INFO", json_output: bool = False, sampling: Optional[Dict[int, float]] = None,
+                  stream=None) -> logging.handlers.QueueListener:
+    """
+    Налаштовує кореневий логер: записи йдуть у чергу, а форматування й запис у stdout —
+    в окремому потоці QueueListener, тож event loop не блокується на виводі.
+    sampling — частка записів за рівнем (див. parse_sampling). Повторний виклик нічого не змінює.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(StructuredFormatter(json_output))
+    log_queue = queue.SimpleQueue()
+    handler = _LazyQueueHandler(log_queue)
+    if sampling:
+        handler.addFilter(SamplingFilter(sampling))
+    root = logging.getLogger()
+    root.addHandler(handler)
+    root.setLevel(level.upper())
+    for name in QUIET_LOGGERS:
+        logging.getLogger(name).setLevel(max(logging.WARNING, root.level))
+    _listener = logging.handlers.QueueListener(log_queue, output)
+    _listener.start()
+    # Записи, що лишилися в черзі, дописуються при виході
+    atexit.register(_listener.stop)
+    return _listener
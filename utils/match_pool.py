@@ -0,0 +1,136 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterable, Optional, Tuple
+from utils.matcher import MatchResult, PatternMatcher
+from utils.normalize import normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Скільки процесів перевіряють довгі повідомлення
+POOL_WORKERS = min(2, os.cpu_count() or 1)
+# Оцінка часу перевірки на місці, мкс на символ: нормалізація й префільтр, кожен паттерн набору
+# і кожен символ паттернів без літералів (ті проганяються по всьому тексту, див. PatternMatcher.complexity).
+# Виміряно benchmarks/bench_match_pool.py: 0.37 / 0.0002 / 0.0045
+POOL_CHAR_COST = 0.4
+POOL_PATTERN_CHAR_COST = 0.0002
+POOL_SCAN_CHAR_COST = 0.0045
+# У пул іде текст, перевірка якого на місці за оцінкою триває від стількох секунд.
+# Передача в процес пулу і назад коштує ~1 мс (більше під навантаженням), і сам процес робить ту саму роботу,
+# тож дешевші тексти вигідніше перевірити на місці: з базовими filters.json навіть 4096 символів — ~1.5 мс
+POOL_MIN_COST = 0.004
+# Скільки скомпільованих наборів тримає кожен процес пулу
+POOL_CACHE_SIZE = 16
+
+# Кеш процесу пулу: ключ набору -> PatternMatcher
+_matchers: "OrderedDict[str, PatternMatcher]" = OrderedDict()
+_MISSING = "missing"
+
+
+def _load(key: str, patterns: Tuple[str, ...], flags: int) -> PatternMatcher:
+    matcher = _matchers.get(key)
+    if matcher is None:
+        matcher = _matchers[key] = PatternMatcher(patterns, flags)
+        while len(_matchers) > POOL_CACHE_SIZE:
+            _matchers.popitem(last=False)
+    _matchers.move_to_end(key)
+    return matcher
+
+
+def _pool_prime(key: str, patterns: Tuple[str, ...], flags: int) -> None:
+    _load(key, patterns, flags)
+
+
+def _pool_find(key: str, message: str, patterns: Optional[Tuple[str, ...]] = None, flags: int = 0):
+    """Виконується в процесі пулу; без паттернів і без набору в кеші повертає _MISSING"""
+    if patterns is not None:
+        matcher = _load(key, patterns, flags)
+    else:
+        matcher = _matchers.get(key)
+        if matcher is None:
+            return _MISSING
+        _matchers.move_to_end(key)
+    return matcher.find(normalize_text(message))
+
+
+class MatchPool:
+    """
+    Пул процесів для перевірки довгих повідомлень, щоб великий regex не блокував event loop.
+    Кожен процес тримає власні скомпільовані копії наборів за їхнім ключем (хеш вмісту):
+    після зміни паттернів нові набори розсилаються в пул (prime), а процес, якому набір
+    ще не відомий, отримує паттерни разом із повторним запитом.
+    """
+
+    def __init__(self, workers: int = POOL_WORKERS):
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # Поки процеси пулу запускаються (spawn — секунди), усе перевіряється на місці
+        self.ready = False
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    @staticmethod
+    def estimate_cost(message: str, matcher: PatternMatcher) -> float:
+        """Оцінка часу нормалізації й перевірки тексту на місці, секунди"""
+        patterns = len(matcher.patterns)
+        per_char = (POOL_CHAR_COST + patterns * POOL_PATTERN_CHAR_COST
+                    + (matcher.complexity - patterns) * POOL_SCAN_CHAR_COST)
+        return len(message) * per_char / 1e6
+
+    def should_offload(self, message: str, matcher: PatternMatcher) -> bool:
+        return self.ready and self.estimate_cost(message, matcher) >= POOL_MIN_COST
+
+    def _mark_ready(self, future):
+        if not future.cancelled() and future.exception() is None:
+            self.ready = True
+
+    def refresh(self, matchers: Iterable[PatternMatcher]):
+        """
+        Розсилає нові набори в пул, щоб довгі повідомлення не чекали на компіляцію.
+        Перший виклик запускає процеси пулу заздалегідь. Розсилаються не більше POOL_CACHE_SIZE
+        наборів (перші — найважливіші, глобальний іде першим); решта довантажиться за запитом.
+        """
+        unique = list({matcher.key: matcher for matcher in matchers}.values())[:POOL_CACHE_SIZE]
+        for matcher in unique:
+            # Завдань стільки, скільки процесів: вільні процеси розберуть їх між собою
+            for _ in range(self.workers):
+                try:
+                    future = self._get_executor().submit(_pool_prime, matcher.key, matcher.patterns, matcher.flags)
+                except (BrokenProcessPool, RuntimeError) as e:
+                    logger.error("Match pool is broken, restarting: %s", e)
+                    self._executor = None
+                    self.ready = False
+                    return
+                if not self.ready:
+                    future.add_done_callback(self._mark_ready)
+
+    async def find(self, matcher: PatternMatcher, message: str) -> Optional[MatchResult]:
+        """Нормалізує і перевіряє повідомлення в процесі пулу; якщо пул зламався — на місці"""
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(self._get_executor(), _pool_find, matcher.key, message)
+            if result == _MISSING:
+                result = await loop.run_in_executor(
+                    self._get_executor(), _pool_find, matcher.key, message, matcher.patterns, matcher.flags
+                )
+            return result
+        except BrokenProcessPool as e:
+            logger.error("Match pool is broken, restarting: %s", e)
+            self._executor = None
+            self.ready = False
+            self.refresh([matcher])
+            return matcher.find(normalize_text(message))
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self.ready = False
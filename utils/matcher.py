@@ -0,0 +1,87 @@
+import hashlib
+import re
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+from utils.normalize import normalize_pattern
+from utils.prefilter import LiteralPrefilter
+
+
+class MatchResult(NamedTuple):
+    """Який паттерн спрацював і на якому фрагменті (позиції — у нормалізованому тексті)"""
+    pattern_id: int  # індекс у PatternMatcher.patterns; -1 — не regex (заблокований домен, копія спаму)
+    pattern: str
+    span: Tuple[int, int]
+    matched_text: str
+
+
+def matcher_key(patterns: Iterable[str], flags: int) -> str:
+    """Хеш вмісту набору паттернів — однакові набори отримують однаковий ключ"""
+    digest = hashlib.sha1(str(flags).encode())
+    for pattern in sorted(set(patterns)):
+        digest.update(b"\0" + pattern.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def check_alternative(pattern: str, flags: int) -> Set[str]:
+    """
+    Компілює нормалізований паттерн окремо і так, як він стоїть в об'єднаному виразі PatternMatcher
+    (у групі, не першою гілкою), і повертає імена його груп. re.error — паттерн зламав би весь набір,
+    навіть якщо сам по собі компілюється: глобальні прапорці на кшталт (?i) посеред виразу
+    """
+    re.compile(pattern, flags)
+    return set(re.compile(f"(?:)|({pattern})", flags).groupindex)
+
+
+class PatternMatcher:
+    """
+    Незмінний скомпільований набір паттернів.
+    Після створення не змінюється, тому один екземпляр можна безпечно ділити між чатами.
+    """
+
+    def __init__(self, patterns: Iterable[str], flags: int = re.IGNORECASE):
+        self.patterns: Tuple[str, ...] = tuple(sorted(set(patterns)))
+        self.flags = flags
+        self.key = matcher_key(self.patterns, flags)
+
+        # Паттерни нормалізуються так само, як і текст повідомлень (див. utils/normalize.py)
+        normalized = [normalize_pattern(pattern) for pattern in self.patterns]
+        # Об'єднуємо всі паттерни через |
+        self.compiled_pattern = re.compile("|".join(f"({pattern})" for pattern in normalized), flags) \
+            if normalized else None
+
+        # Префільтр: регулярний вираз запускається лише для паттернів, чиї літерали є в тексті
+        self._regexes: List[re.Pattern] = [re.compile(pattern, flags) for pattern in normalized]
+        self._prefilter = LiteralPrefilter(normalized, flags)
+        always = [normalized[index] for index in self._prefilter.always]
+        self._always_pattern = re.compile("|".join(f"({pattern})" for pattern in always), flags) \
+            if always else None
+        # Номер обгорткової групи в _always_pattern -> індекс паттерну
+        self._always_groups: Dict[int, int] = {}
+        group = 1
+        for index in self._prefilter.always:
+            self._always_groups[group] = index
+            group += self._regexes[index].groups + 1
+        # Оцінка вартості перевірки: паттерни без літералів проганяються по кожному тексту повністю,
+        # тому важать за довжиною, решта — по одиниці (див. utils/match_pool.py)
+        self.complexity = len(self.patterns) + sum(len(normalized[index]) for index in self._prefilter.always)
+
+    def __len__(self) -> int:
+        return len(self.patterns)
+
+    def search(self, text: str) -> bool:
+        """Перевіряє вже нормалізований текст (див. normalize_text)"""
+        return self.find(text) is not None
+
+    def find(self, text: str) -> Optional[MatchResult]:
+        """Повертає перший паттерн, що збігся з нормалізованим текстом, або None"""
+        for index in sorted(self._prefilter.candidates(text)):
+            match = self._regexes[index].search(text)
+            if match is not None:
+                return MatchResult(index, self.patterns[index], match.span(), match.group())
+        if self._always_pattern is not None:
+            match = self._always_pattern.search(text)
+            if match is not None:
+                # Обгорткова група закривається останньою, тому lastindex вказує саме на неї
+                group = match.lastindex
+                index = self._always_groups[group]
+                return MatchResult(index, self.patterns[index], match.span(group), match.group(group))
+        return None
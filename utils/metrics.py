@@ -0,0 +1,55 @@
+from bisect import bisect_left
+from collections import deque
+from typing import Dict, List, Tuple
+
+# Верхні межі кошиків гістограми, мс (останній кошик — усе, що більше)
+HISTOGRAM_BOUNDS_MS = (0.1, 0.5, 1, 5, 10, 50, 100, 500)
+
+
+class LatencyStats:
+    """Проста статистика затримок: лічильник, сума, максимум і ковзне вікно для перцентилів"""
+
+    def __init__(self, window: int = 1024):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+        self._recent = deque(maxlen=window)
+        self._buckets = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+
+    def observe(self, seconds: float):
+        """Додає одне вимірювання (у секундах)"""
+        self._buckets[bisect_left(HISTOGRAM_BOUNDS_MS, seconds * 1000)] += 1
+        self.count += 1
+        self.total += seconds
+        self.last = seconds
+        if seconds > self.max:
+            self.max = seconds
+        self._recent.append(seconds)
+
+    def percentile(self, p: float) -> float:
+        """Перцентиль (0-100) за останніми вимірюваннями, у секундах"""
+        if not self._recent:
+            return 0.0
+        ordered = sorted(self._recent)
+        index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def histogram(self) -> List[Tuple[float, int]]:
+        """Кількість вимірювань за весь час по кошиках: (верхня межа в мс, кількість); inf — решта"""
+        return list(zip(HISTOGRAM_BOUNDS_MS + (float("inf"),), self._buckets))
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def summary(self) -> Dict[str, float]:
+        """Зведення в мілісекундах"""
+        return {
+            "count": self.count,
+            "last_ms": self.last * 1000,
+            "mean_ms": self.mean * 1000,
+            "p50_ms": self.percentile(50) * 1000,
+            "p99_ms": self.percentile(99) * 1000,
+            "max_ms": self.max * 1000,
+        }
@@ -0,0 +1,213 @@
+import re
+import unicodedata
+from typing import Optional, Tuple
+
+# Латинські та грецькі двійники кириличних літер (після casefold)
+CONFUSABLES = {
+    "a": "а", "b": "в", "c": "с", "e": "е", "h": "н", "i": "і", "k": "к", "m": "м",
+    "o": "о", "p": "р", "t": "т", "x": "х", "y": "у",
+    "α": "а", "ε": "е", "κ": "к", "ο": "о", "ρ": "р", "τ": "т", "υ": "у", "χ": "х",
+}
+# Цифри, якими підміняють літери всередині слів («р0зыгрыш», «зар4бок»)
+DIGIT_CONFUSABLES = {"0": "о", "3": "з", "4": "ч", "6": "б"}
+# Невидимі символи, які не належать до категорій Cf/Mn/Me
+INVISIBLES = {"ᅟ", "ᅠ", "ㅤ", "ﾠ", "⠀"}
+_DROPPED_CATEGORIES = {"Cf", "Mn", "Me"}
+
+_LEET_DIGITS = "".join(DIGIT_CONFUSABLES)
+# Лише цифра між двома літерами: на краю числа («500руб», «300грн») цифри лишаються цифрами
+_LEET_RE = re.compile(rf"(?<=[^\W\d_])[{_LEET_DIGITS}](?=[^\W\d_])")
+_REGEX_METACHARS = set(".^$*+?{}[]\\|()")
+_QUANTIFIER_RE = re.compile(r"\{\d*,?\d*\}")
+
+
+def fold_char(char: str) -> str:
+    """Приводить один символ до канонічної форми (порожній рядок — символ відкидається)"""
+    result = []
+    for part in unicodedata.normalize("NFKD", char):
+        if part in INVISIBLES or unicodedata.category(part) in _DROPPED_CATEGORIES:
+            continue
+        for folded in part.casefold():
+            result.append(CONFUSABLES.get(folded, folded))
+    return "".join(result)
+
+
+class _FoldTable(dict):
+    """Таблиця для str.translate, що заповнюється ліниво: кожен символ обчислюється один раз"""
+
+    def __missing__(self, codepoint: int) -> Optional[str]:
+        folded = fold_char(chr(codepoint))
+        value = None if not folded else (codepoint if folded == chr(codepoint) else folded)
+        self[codepoint] = value
+        return value
+
+
+_FOLD_TABLE = _FoldTable()
+
+
+def _fold_digit(match: re.Match) -> str:
+    return DIGIT_CONFUSABLES[match.group()]
+
+
+def normalize_text(text: str) -> str:
+    """
+    Нормалізує текст повідомлення за один прохід: NFKD (fullwidth-символи, лігатури,
+    відокремлення діакритики), видалення невидимих символів і комбінованих знаків, casefold,
+    заміна латинських/грецьких двійників на кирилицю та цифр-підмін усередині слів.
+    """
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text)
+    text = text.translate(_FOLD_TABLE)
+    return _LEET_RE.sub(_fold_digit, text)
+
+
+def _escape_end(pattern: str, start: int) -> int:
+    """Повертає індекс кінця escape-послідовності, що починається з \\ на позиції start"""
+    i = start + 1
+    if i >= len(pattern):
+        return i
+    char = pattern[i]
+    i += 1
+    if char == "x":
+        return i + 2
+    if char == "u":
+        return i + 4
+    if char == "U":
+        return i + 8
+    if char in "Ng":
+        closing = "}" if char == "N" else ">"
+        end = pattern.find(closing, i)
+        return len(pattern) if end == -1 else end + 1
+    if char.isdigit():
+        while i < len(pattern) and i - start < 4 and pattern[i].isdigit():
+            i += 1
+    return i
+
+
+def _group_prefix_end(pattern: str, start: int) -> int:
+    """Повертає індекс кінця префікса групи (?...) — імені, прапорців, коментаря тощо"""
+    i = start + 2
+    if pattern.startswith(("P<", "<"), i) and not pattern.startswith(("<=", "<!"), i):
+        return pattern.find(">", i) + 1 or len(pattern)
+    if pattern.startswith(("P=", "#", "("), i):
+        return pattern.find(")", i) + 1 or len(pattern)
+    if pattern.startswith(("<=", "<!"), i):
+        return i + 2
+    while i < len(pattern) and pattern[i] not in ":)=!>":
+        i += 1
+    return i + 1 if i < len(pattern) and pattern[i] in ":=!>" else i
+
+
+def _normalize_class(pattern: str, start: int) -> Tuple[int, str]:
+    """Нормалізує клас символів [...]; повертає (кінець класу, новий текст класу)"""
+    i = start + 1
+    negated = pattern.startswith("^", i)
+    if negated:
+        i += 1
+    members = []   # готові фрагменти класу (вже екрановані)
+    literals = []  # нормалізовані одиночні символи
+    first = True
+    while i < len(pattern) and (pattern[i] != "]" or first):
+        first = False
+        end = _escape_end(pattern, i) if pattern[i] == "\\" else i + 1
+        if end + 1 < len(pattern) and pattern[end] == "-" and pattern[end + 1] != "]":
+            # Діапазон лишаємо як є і додаємо нормалізовані двійники його символів
+            range_end = _escape_end(pattern, end + 1) if pattern[end + 1] == "\\" else end + 2
+            members.append(pattern[i:range_end])
+            if end == i + 1 and range_end == end + 2 and ord(pattern[end + 1]) - ord(pattern[i]) <= 256:
+                for codepoint in range(ord(pattern[i]), ord(pattern[end + 1]) + 1):
+                    folded = fold_char(chr(codepoint))
+                    if len(folded) == 1 and folded != chr(codepoint):
+                        literals.append(folded)
+            i = range_end
+            continue
+        if pattern[i] == "\\":
+            members.append(pattern[i:end])
+            i = end
+            continue
+        char = pattern[i]
+        if char in DIGIT_CONFUSABLES:
+            # Цифра в тексті підміняється лише всередині слова, тому лишаємо обидва варіанти
+            literals.extend((char, DIGIT_CONFUSABLES[char]))
+        else:
+            folded = fold_char(char)
+            literals.append(folded if len(folded) == 1 else char)
+        i += 1
+    unique = list(dict.fromkeys(literals))
+    if not negated and not members and len(unique) == 1:
+        return i + 1, re.escape(unique[0])
+    body = "".join(members) + "".join(re.escape(char) for char in unique)
+    return i + 1, f"[{'^' if negated else ''}{body}]"
+
+
+def normalize_pattern(pattern: str) -> str:
+    """
+    Приводить регулярний вираз до тієї ж канонічної форми, що й normalize_text:
+    нормалізуються лише літерали та класи символів, синтаксис regex лишається без змін.
+    """
+    out = []
+    previous_literal = ""
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\":
+            end = _escape_end(pattern, i)
+            out.append(pattern[i:end])
+            previous_literal = ""
+            i = end
+            continue
+        if char == "[":
+            i, text = _normalize_class(pattern, i)
+            out.append(text)
+            previous_literal = ""
+            continue
+        if char == "(" and pattern.startswith("?", i + 1):
+            end = _group_prefix_end(pattern, i)
+            out.append(pattern[i:end])
+            previous_literal = ""
+            i = end
+            continue
+        if char == "{":
+            match = _QUANTIFIER_RE.match(pattern, i)
+            if match:
+                out.append(match.group())
+                previous_literal = ""
+                i = match.end()
+                continue
+        if char in _REGEX_METACHARS:
+            out.append(char)
+            previous_literal = ""
+            i += 1
+            continue
+        previous, previous_literal = previous_literal, char
+        i += 1
+        if char in DIGIT_CONFUSABLES:
+            # Як і _LEET_RE у тексті: цифра стає літерою лише між двома літерами
+            out.append(_normalize_digit(char, previous, pattern, i))
+            continue
+        folded = fold_char(char)
+        out.append(char if folded == char else re.escape(folded))
+    return "".join(out)
+
+
+def _literal_after(pattern: str, i: int) -> str:
+    """Літерал на позиції i, якщо саме він гарантовано стоїть далі в тексті, інакше порожній рядок"""
+    if i >= len(pattern) or pattern[i] in _REGEX_METACHARS:
+        return ""
+    if i + 1 < len(pattern) and (pattern[i + 1] in "?*" or _QUANTIFIER_RE.match(pattern, i + 1)):
+        return ""
+    return pattern[i]
+
+
+def _normalize_digit(char: str, previous: str, pattern: str, after: int) -> str:
+    """
+    Нормалізує цифру-підміну з паттерну. Сусіди — літерали: обидва літери — цифру в тексті замінено,
+    хоча б один не літера — ні. Якщо сусіда визначає синтаксис regex (край, група, клас, квантифікатор),
+    лишаються обидва варіанти.
+    """
+    following = _literal_after(pattern, after)
+    if (previous and not previous.isalpha()) or (following and not following.isalpha()):
+        return char
+    if previous and following:
+        return re.escape(DIGIT_CONFUSABLES[char])
+    return f"[{char}{re.escape(DIGIT_CONFUSABLES[char])}]"
@@ -0,0 +1,236 @@
+import re
+from re import _parser as sre_parse, _constants as sre_constants
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Максимальна кількість варіантів літерала, які ми готові розгорнути з класів символів
+MAX_LITERAL_VARIANTS = 64
+# Максимальний розмір класу символів, який розгортається в окремі літерали
+MAX_CLASS_SIZE = 16
+
+_REPEATS = {sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT, sre_constants.POSSESSIVE_REPEAT}
+
+
+def _product(left: Set[str], right: Set[str]) -> Optional[Set[str]]:
+    """Декартовий добуток двох наборів рядків (None, якщо результат завеликий)"""
+    if len(left) * len(right) > MAX_LITERAL_VARIANTS:
+        return None
+    return {a + b for a in left for b in right}
+
+
+def _class_chars(items) -> Optional[Set[str]]:
+    """Розгортає клас символів [...] у набір символів"""
+    chars: Set[str] = set()
+    for op, av in items:
+        if op is sre_constants.LITERAL:
+            chars.add(chr(av).casefold())
+        elif op is sre_constants.RANGE:
+            lo, hi = av
+            if hi - lo + 1 > MAX_CLASS_SIZE:
+                return None
+            chars.update(chr(c).casefold() for c in range(lo, hi + 1))
+        else:
+            # NEGATE, CATEGORY (\d, \w, ...) — заздалегідь невідомо, що саме збігається
+            return None
+        if len(chars) > MAX_CLASS_SIZE:
+            return None
+    return chars or None
+
+
+def _best(candidates: List[Set[str]]) -> Optional[Set[str]]:
+    """Обирає найселективніший набір обов'язкових літералів"""
+    usable = [c for c in candidates if c and "" not in c]
+    if not usable:
+        return None
+    return max(usable, key=lambda c: (min(len(s) for s in c), -len(c)))
+
+
+def _analyze_sequence(items) -> Tuple[Optional[Set[str]], Optional[Set[str]]]:
+    """
+    Аналізує послідовність вузлів регулярного виразу.
+    Повертає (exact, required):
+    exact — набір рядків, один з яких збігається з усім фрагментом (або None);
+    required — набір рядків, один з яких обов'язково міститься в будь-якому збігу (або None).
+    """
+    current: Optional[Set[str]] = {""}
+    is_exact = True
+    candidates: List[Set[str]] = []
+    for op, av in items:
+        exact, required = _analyze_node(op, av)
+        if exact is not None and current is not None:
+            combined = _product(current, exact)
+            if combined is not None:
+                current = combined
+                continue
+        # Ланцюжок літералів обривається: зберігаємо накопичене як кандидата
+        is_exact = False
+        if current is not None:
+            candidates.append(current)
+        if exact is not None:
+            current = exact
+        else:
+            current = {""}
+            if required is not None:
+                candidates.append(required)
+    if is_exact:
+        return current, _best([current])
+    if current is not None:
+        candidates.append(current)
+    return None, _best(candidates)
+
+
+def _analyze_node(op, av) -> Tuple[Optional[Set[str]], Optional[Set[str]]]:
+    """Аналізує один вузол регулярного виразу (див. _analyze_sequence)"""
+    if op is sre_constants.LITERAL:
+        return {chr(av).casefold()}, None
+    if op is sre_constants.IN:
+        chars = _class_chars(av)
+        return chars, None
+    if op is sre_constants.AT:
+        # Якорі (^, $, \b) нічого не споживають
+        return {""}, None
+    if op is sre_constants.SUBPATTERN:
+        return _analyze_sequence(av[-1])
+    if op is sre_constants.ATOMIC_GROUP:
+        return _analyze_sequence(av)
+    if op is sre_constants.BRANCH:
+        results = [_analyze_sequence(branch) for branch in av[1]]
+        exact: Optional[Set[str]] = set()
+        for branch_exact, _ in results:
+            if branch_exact is None or exact is None:
+                exact = None
+                break
+            exact |= branch_exact
+        if exact is not None and len(exact) > MAX_LITERAL_VARIANTS:
+            exact = None
+        required: Optional[Set[str]] = set()
+        for branch_exact, branch_required in results:
+            branch_set = branch_required if branch_required is not None else branch_exact
+            if not branch_set or "" in branch_set:
+                required = None
+                break
+            required |= branch_set
+        if required is not None and len(required) > MAX_LITERAL_VARIANTS:
+            required = None
+        return exact, required
+    if op in _REPEATS:
+        min_count, max_count, item = av
+        child_exact, child_required = _analyze_sequence(item)
+        exact = None
+        required = None
+        if child_exact is not None:
+            if min_count == max_count:
+                exact = {""}
+                for _ in range(min_count):
+                    exact = _product(exact, child_exact)
+                    if exact is None:
+                        break
+            elif min_count == 0 and max_count == 1:
+                exact = child_exact | {""}
+        if min_count >= 1:
+            required = child_required if child_required is not None else child_exact
+        return exact, required
+    # ANY, NOT_LITERAL, GROUPREF, ASSERT, ASSERT_NOT, CATEGORY, ... — нічого гарантованого
+    return None, None
+
+
+def extract_literals(pattern: str, flags: int = 0) -> Optional[Set[str]]:
+    """
+    Повертає набір літералів (у casefold), один з яких обов'язково присутній
+    у будь-якому тексті, де збігається паттерн. None — якщо такого набору немає.
+    """
+    try:
+        parsed = sre_parse.parse(pattern, flags)
+    except re.error:
+        return None
+    _, required = _analyze_sequence(parsed.data)
+    if not required:
+        return None
+    # Якщо один літерал містить інший, довший зайвий: достатньо знайти коротший
+    minimal = sorted(required, key=len)
+    result: Set[str] = set()
+    for literal in minimal:
+        if not any(shorter in literal for shorter in result):
+            result.add(literal)
+    return result
+
+
+class AhoCorasick:
+    """Автомат Ахо-Корасік для одночасного пошуку багатьох підрядків за один прохід"""
+
+    def __init__(self, keywords: Dict[str, Set[int]]):
+        """
+        :param keywords: словник літерал -> множина ідентифікаторів паттернів
+        """
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[frozenset] = [frozenset()]
+        for keyword, ids in keywords.items():
+            self._insert(keyword, ids)
+        self._build_failure_links()
+
+    def _insert(self, keyword: str, ids: Set[int]):
+        state = 0
+        for char in keyword:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(frozenset())
+            state = next_state
+        self._output[state] = self._output[state] | frozenset(ids)
+
+    def _build_failure_links(self):
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._output[next_state] = self._output[next_state] | self._output[self._fail[next_state]]
+
+    def search(self, text: str) -> Set[int]:
+        """Повертає ідентифікатори всіх паттернів, чиї літерали знайдено в тексті"""
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        found: Set[int] = set()
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found |= output[state]
+        return found
+
+
+class LiteralPrefilter:
+    """
+    Префільтр для набору паттернів: за один прохід по тексту визначає,
+    які регулярні вирази взагалі можуть збігтися.
+    """
+
+    def __init__(self, patterns: Iterable[str], flags: int = 0):
+        keywords: Dict[str, Set[int]] = {}
+        self.always: List[int] = []  # паттерни без обов'язкових літералів — перевіряються завжди
+        for index, pattern in enumerate(patterns):
+            literals = extract_literals(pattern, flags)
+            if not literals:
+                self.always.append(index)
+                continue
+            for literal in literals:
+                keywords.setdefault(literal, set()).add(index)
+        self.automaton = AhoCorasick(keywords) if keywords else None
+
+    def candidates(self, folded_text: str) -> Set[int]:
+        """Повертає індекси паттернів, які варто перевірити регулярним виразом (текст у casefold)"""
+        if self.automaton is None:
+            return set()
+        return self.automaton.search(folded_text)
@@ -1,13 +1,104 @@
 import re
 import json
+import logging
 import os
-from typing import List, Set
+import time
+import asyncio
+import weakref
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+from utils.domains import DOMAIN_PATTERN_PREFIX, DomainBlocklist
+from utils.fingerprint import (
+    DUPLICATE_PATTERN_PREFIX, FINGERPRINT_MAX_CHARS, FINGERPRINT_MAX_ENTRIES, FINGERPRINT_WINDOW, FingerprintIndex,
+)
+from utils.match_pool import MatchPool
+from utils.matcher import MatchResult, PatternMatcher, check_alternative, matcher_key
+from utils.metrics import LatencyStats
+from utils.normalize import normalize_pattern, normalize_text
+from utils.storage import JournaledSet, JsonSnapshotFile
+from utils.scorer import SCORE_PATTERN, SCORER_MAX_CHARS, SCORER_THRESHOLD, SpamScorer
+from utils.regex_safety import (
+    MATCH_TIME_BUDGET, PROBE_TIMEOUT, SafetyReport, SlowPathWorker, analyze_pattern, measure_patterns,
+)
+
+logger = logging.getLogger(__name__)
+
+# Скільки чекати після зміни паттернів, щоб зібрати пакет правок в одну перекомпіляцію
+RECOMPILE_BATCH_DELAY = 0.05
+# Скільки чекати на повільний шлях (паттерни на карантині), перш ніж пропустити повідомлення
+SLOW_PATH_TIMEOUT = 0.5
+
+
+class Verdict(NamedTuple):
+    """Результат перевірки одного повідомлення в пакеті"""
+    is_spam: bool
+    pattern_index: Optional[int] = None  # індекс у PatternMatcher.patterns (повільний шлях — серед паттернів на карантині); -1 — не regex
+    pattern: Optional[str] = None
+    match: Optional[MatchResult] = None
 
 class SpamFilter:
-    def __init__(self, initial_pattern: str = "", flags=re.IGNORECASE):
+    def __init__(self, initial_pattern: str = "", flags=re.IGNORECASE, pool_workers: int = 0,
+                 domain_list_path: str = "", fingerprint_window: float = FINGERPRINT_WINDOW,
+                 fingerprint_max_entries: int = FINGERPRINT_MAX_ENTRIES, scorer_path: str = "",
+                 scorer_threshold: float = SCORER_THRESHOLD):
         self.patterns: Set[str] = set()
+        self.default_patterns: Set[str] = set()  # базові фільтри з filters.json
         self.flags = flags
         self.compiled_pattern = None
+        # Оверлеї окремих чатів поверх глобального набору: додані та вимкнені паттерни
+        self.chat_patterns: Dict[int, Set[str]] = {}
+        self.chat_excluded: Dict[int, Set[str]] = {}
+        self._matcher: Optional[PatternMatcher] = None
+        self._chat_matchers: Dict[int, PatternMatcher] = {}
+        # Скомпільовані набори за хешем вмісту: чати з однаковим набором ділять один екземпляр
+        self._matcher_cache = weakref.WeakValueDictionary()
+        # Фонова перекомпіляція: окремий потік, активний набір підміняється атомарно
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._recompile_task: Optional[asyncio.Task] = None
+        self._dirty = False
+        self._dirty_since = 0.0
+        # Знімок, з якого зібрано активні набори: до нього відкочуються зміни, якщо перекомпіляція не вдалася
+        self._compiled_snapshot = (set(), {}, set())
+        # Помилка останньої фонової перекомпіляції; wait_compiled передає її тому, хто чекав
+        self._compile_error: Optional[re.error] = None
+        # Збереження: patterns.json — знімок плюс журнал змін, chat_patterns.json — атомарний знімок;
+        # обидва файли пишуться з відкладенням у фоновому потоці
+        self._pattern_store = JournaledSet("patterns.json", "patterns")
+        self._chat_store = JsonSnapshotFile("chat_patterns.json", "chat patterns")
+        self.compile_time = LatencyStats()
+        self.swap_latency = LatencyStats()
+        # Лічильники спрацювань і хибних спрацювань (повернуті адміном повідомлення) за паттерном
+        self.hit_counts: Counter = Counter()
+        self.false_positive_counts: Counter = Counter()
+        # Паттерни на карантині (ReDoS або перевищення бюджету): не входять в inline-набори,
+        # перевіряються окремо, в процесі, який вбивається після таймауту
+        self.quarantined: Set[str] = set()
+        self._slow_patterns: Tuple[str, ...] = ()
+        self._slow_worker: Optional[SlowPathWorker] = None
+        self._slow_worker_patterns: Tuple[str, ...] = ()
+        self._slow_executor: Optional[ThreadPoolExecutor] = None
+        self._slow_busy = False
+        self._probe_executor: Optional[ThreadPoolExecutor] = None
+        self._budget_check_pending = False
+        self.match_time = LatencyStats()
+        # Довгі повідомлення перевіряються в пулі процесів (pool_workers > 0), щоб не блокувати event loop
+        self._match_pool: Optional[MatchPool] = MatchPool(pool_workers) if pool_workers > 0 else None
+        self.pool_match_time = LatencyStats()
+        # Заблоковані домени перевіряються окремо від regex: пошук за суфіксами, а не гілка альтернації
+        self.domains = DomainBlocklist(domain_list_path)
+        # Відбитки нещодавно видаленого спаму: копії в будь-якому чаті ловляться без regex
+        self.fingerprints = FingerprintIndex(fingerprint_window, fingerprint_max_entries)
+        # Викликається для кожного локально доданого/забутого відбитка: ("add" | "forget", текст, паттерн)
+        self.on_fingerprint: Optional[Callable[[str, str, Optional[str]], None]] = None
+        # Другий етап: модель на прикладах, підтверджених адмінами (лише якщо задано scorer_path)
+        self.scorer: Optional[SpamScorer] = SpamScorer(scorer_path, threshold=scorer_threshold) if scorer_path else None
+        # Викликається для кожного локального прикладу навчання: (текст, спам?, вага)
+        self.on_train: Optional[Callable[[str, bool, int], None]] = None
+        # Останній нормалізований текст: оцінка після regex не нормалізує те саме повідомлення вдруге
+        self._last_normalized: Tuple[Optional[str], str] = (None, "")
+        # Викликається після кожної локальної зміни набору (шардинг: розсилка стану іншим воркерам)
+        self.on_change: Optional[Callable[[], None]] = None
         
         # Завантажуємо базові фільтри з filters.json
         self.load_default_filters()
@@ -16,9 +107,17 @@ class SpamFilter:
         if initial_pattern:
             self.add_pattern(initial_pattern)
         
-        # Завантажуємо збережені паттерни з patterns.json
+        # Завантажуємо збережені паттерни з patterns.json та chat_patterns.json
         self.load_patterns()
-        self._compile_patterns()
+        self.load_chat_patterns()
+        self._quarantine_unsafe()
+        try:
+            self._compile_patterns()
+        except re.error as e:
+            # Збережений набір, що не компілюється разом, не має зупиняти запуск бота
+            logger.error("Error compiling patterns: %s", e)
+            self._drop_broken_patterns()
+            self._compile_patterns()
         
     def load_default_filters(self):
         """Завантажує базові фільтри з filters.json"""
@@ -26,63 +125,758 @@ class SpamFilter:
             if os.path.exists("filters.json"):
                 with open("filters.json", "r", encoding="utf-8") as f:
                     default_patterns = json.load(f)
+                    self.default_patterns.update(default_patterns)
                     self.patterns.update(default_patterns)
-                    print(f"Завантажено {len(default_patterns)} базових фільтрів")
+                    logger.info("Завантажено %d базових фільтрів", len(default_patterns))
         except Exception as e:
-            print(f"Error loading default filters: {e}")
+            logger.error("Error loading default filters: %s", e)
         
+    def validate_pattern(self, pattern: str, taken: Optional[Set[str]] = None):
+        """
+        Перевіряє, що паттерн компілюється і в об'єднаному виразі (інакше re.error), до того як він
+        потрапить у набір: назви груп не мають повторювати групи активних наборів і taken
+        (до taken додаються назви цього паттерну)
+        """
+        names = check_alternative(normalize_pattern(pattern), self.flags)
+        if taken is None:
+            taken = set()
+        conflicts = names & (taken | self._group_names())
+        if conflicts:
+            raise re.error(f"назва групи {', '.join(sorted(conflicts))} вже є в іншому паттерні")
+        taken |= names
+
+    def _group_names(self) -> Set[str]:
+        """Назви груп активних наборів і доданих, але ще не скомпільованих паттернів"""
+        names = self._active_group_names()
+        for pattern in self._pending_patterns():
+            try:
+                names |= check_alternative(normalize_pattern(pattern), self.flags)
+            except re.error:
+                pass
+        return names
+
+    def _active_group_names(self) -> Set[str]:
+        matchers = [self._matcher, *self._chat_matchers.values()]
+        return set().union(*(matcher.compiled_pattern.groupindex for matcher in matchers
+                             if matcher is not None and matcher.compiled_pattern is not None))
+
+    def _pending_patterns(self) -> Set[str]:
+        """Паттерни, яких ще немає в активних наборах"""
+        patterns, overlays, _ = self._compiled_snapshot
+        return self._all_patterns() - patterns.union(*(added for added, _ in overlays.values()))
+
+    def _find_broken(self, candidates: Iterable[str], taken: Set[str]) -> Set[str]:
+        """Паттерни з candidates, що ламають об'єднаний вираз: не компілюються або повторюють назви груп"""
+        broken = set()
+        for pattern in sorted(candidates):
+            try:
+                names = check_alternative(normalize_pattern(pattern), self.flags)
+            except re.error as e:
+                logger.error("Паттерн %r пропущено: %s", pattern, e)
+                broken.add(pattern)
+                continue
+            if names & taken:
+                logger.error("Паттерн %r пропущено: назва групи вже є в іншому паттерні", pattern)
+                broken.add(pattern)
+            taken |= names
+        return broken
+
+    def _remove_broken(self, broken: Set[str]):
+        """Прибирає паттерни з набору, оверлеїв, карантину й файлів"""
+        self.patterns -= broken
+        self._pattern_store.discard(broken)
+        for added in self.chat_patterns.values():
+            added -= broken
+        self.quarantined -= broken
+        self._chat_store.save(self._overlays_json())
+
+    def _drop_broken_patterns(self):
+        """Прибирає паттерни, через які набір не компілюється разом (старт зі збереженими файлами)"""
+        self._remove_broken(self._find_broken(self._all_patterns(), set()))
+
+    def _all_patterns(self) -> Set[str]:
+        """Глобальні паттерни разом з доданими в оверлеях чатів"""
+        return self.patterns.union(*self.chat_patterns.values())
+
+    def _quarantine_unsafe(self):
+        """Статично перевіряє завантажені паттерни й відправляє експоненційні на карантин"""
+        for pattern in self._all_patterns():
+            report = analyze_pattern(normalize_pattern(pattern), self.flags)
+            if report.rejected:
+                self.quarantined.add(pattern)
+                logger.warning("Паттерн %r на карантині: %s", pattern, "; ".join(report.issues))
+
+    async def check_pattern(self, pattern: str) -> SafetyReport:
+        """
+        Перевіряє новий паттерн на ReDoS: статичний аналіз, потім проба на ворожих входах
+        в окремому процесі. rejected — паттерн не можна додавати, slow — лише повільний шлях.
+        """
+        normalized = normalize_pattern(pattern.strip())
+        report = analyze_pattern(normalized, self.flags)
+        if report.rejected:
+            return report
+        loop = asyncio.get_running_loop()
+        if self._probe_executor is None:
+            self._probe_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="spam-filter-probe")
+        timings = await loop.run_in_executor(
+            self._probe_executor, measure_patterns, [normalized], self.flags, None, PROBE_TIMEOUT
+        )
+        worst = timings.get(0, 0.0)
+        if worst > PROBE_TIMEOUT:
+            issues = report.issues + [f"проба не завершилась за {PROBE_TIMEOUT:g} с"]
+            return SafetyReport(issues, worst, rejected=True)
+        if worst > MATCH_TIME_BUDGET:
+            issues = report.issues + [f"найгірший час {worst * 1000:.1f} мс перевищує бюджет"]
+            return SafetyReport(issues, worst, slow=True)
+        return SafetyReport(report.issues, worst)
+
+    def quarantine_patterns(self, patterns: Iterable[str]) -> int:
+        """Переносить паттерни на повільний шлях; повертає кількість нових на карантині"""
+        new = set(patterns) - self.quarantined
+        if new:
+            self.quarantined |= new
+            self._changed()
+        return len(new)
+
+    async def audit_patterns(self):
+        """Фонова проба всіх паттернів на ворожих входах (запускається при старті бота)"""
+        patterns = sorted(self._all_patterns() - self.quarantined)
+        if not patterns:
+            return
+        loop = asyncio.get_running_loop()
+        if self._probe_executor is None:
+            self._probe_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="spam-filter-probe")
+        try:
+            timings = await loop.run_in_executor(
+                self._probe_executor, measure_patterns,
+                [normalize_pattern(pattern) for pattern in patterns], self.flags, None, PROBE_TIMEOUT
+            )
+        except Exception as e:
+            logger.error("Error auditing patterns: %s", e)
+            return
+        slow = []
+        for index, elapsed in timings.items():
+            if elapsed > MATCH_TIME_BUDGET:
+                logger.warning("Паттерн %r на карантині: найгірший час %.1f мс", patterns[index], elapsed * 1000)
+                slow.append(patterns[index])
+        self.quarantine_patterns(slow)
+
+    async def _check_match_budget(self, text: str, matcher: PatternMatcher):
+        """Знаходить паттерни, через які повідомлення перевищило бюджет, і відправляє їх на карантин"""
+        try:
+            loop = asyncio.get_running_loop()
+            if self._probe_executor is None:
+                self._probe_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="spam-filter-probe")
+            normalized = [normalize_pattern(pattern) for pattern in matcher.patterns]
+            timings = await loop.run_in_executor(
+                self._probe_executor, measure_patterns, normalized, self.flags, [text], PROBE_TIMEOUT
+            )
+            slow = {matcher.patterns[index] for index, elapsed in timings.items() if elapsed > MATCH_TIME_BUDGET}
+            if slow:
+                logger.warning("Паттерни перевищили бюджет %g мс, карантин: %s", MATCH_TIME_BUDGET * 1000, sorted(slow))
+                self.quarantine_patterns(slow)
+        except Exception as e:
+            logger.error("Error checking match budget: %s", e)
+        finally:
+            self._budget_check_pending = False
+
     def add_pattern(self, pattern: str) -> bool:
         """Додає новий паттерн до списку фільтрації"""
-        if pattern.strip():
-            self.patterns.add(pattern.strip())
-            self._compile_patterns()
-            self.save_patterns()
-            return True
-        return False
+        return self.add_patterns([pattern]) > 0
+
+    def add_patterns(self, patterns: Iterable[str]) -> int:
+        """Додає кілька паттернів з однією перекомпіляцією; повертає кількість доданих"""
+        new_patterns = {pattern.strip() for pattern in patterns if pattern.strip()} - self.patterns
+        taken: Set[str] = set()
+        for pattern in sorted(new_patterns):
+            self.validate_pattern(pattern, taken)
+        if new_patterns:
+            self.patterns.update(new_patterns)
+            self._pattern_store.add(new_patterns)
+            self._changed()
+        return len(new_patterns)
     
     def remove_pattern(self, pattern: str) -> bool:
         """Видаляє паттерн зі списку фільтрації"""
-        if pattern in self.patterns:
-            self.patterns.remove(pattern)
-            self._compile_patterns()
-            self.save_patterns()
-            return True
-        return False
+        return self.remove_patterns([pattern]) > 0
+
+    def remove_patterns(self, patterns: Iterable[str]) -> int:
+        """Видаляє кілька паттернів з однією перекомпіляцією; повертає кількість видалених"""
+        removed = set(patterns) & self.patterns
+        if removed:
+            self.patterns -= removed
+            self.quarantined -= removed - self._all_patterns()
+            self._pattern_store.discard(removed)
+            self._changed()
+        return len(removed)
     
     def get_patterns(self) -> List[str]:
         """Повертає список всіх паттернів"""
         return list(self.patterns)
-    
+
+    def add_chat_pattern(self, chat_id: int, pattern: str) -> bool:
+        """Додає паттерн лише для одного чату (або знову вмикає вимкнений глобальний)"""
+        pattern = pattern.strip()
+        if not pattern:
+            return False
+        excluded = self.chat_excluded.get(chat_id, set())
+        if pattern in excluded:
+            excluded.discard(pattern)
+        elif pattern in self.patterns or pattern in self.chat_patterns.get(chat_id, set()):
+            return False
+        else:
+            self.validate_pattern(pattern)
+            self.chat_patterns.setdefault(chat_id, set()).add(pattern)
+        self._chat_store.save(self._overlays_json())
+        self._changed()
+        return True
+
+    def remove_chat_pattern(self, chat_id: int, pattern: str) -> bool:
+        """Видаляє паттерн чату або вимикає глобальний паттерн лише для цього чату"""
+        added = self.chat_patterns.get(chat_id, set())
+        if pattern in added:
+            added.discard(pattern)
+            if pattern not in self._all_patterns():
+                self.quarantined.discard(pattern)
+        elif pattern in self.patterns and pattern not in self.chat_excluded.get(chat_id, set()):
+            self.chat_excluded.setdefault(chat_id, set()).add(pattern)
+        else:
+            return False
+        self._chat_store.save(self._overlays_json())
+        self._changed()
+        return True
+
+    def get_chat_patterns(self, chat_id: int) -> Tuple[List[str], List[str]]:
+        """Повертає (додані, вимкнені) паттерни оверлею чату"""
+        return sorted(self.chat_patterns.get(chat_id, ())), sorted(self.chat_excluded.get(chat_id, ()))
+
+    def get_matcher(self, chat_id: Optional[int] = None) -> Optional[PatternMatcher]:
+        """Повертає скомпільований набір для чату за O(1), без жодної компіляції"""
+        if chat_id is None:
+            return self._matcher
+        return self._chat_matchers.get(chat_id, self._matcher)
+
+    def _get_or_compile(self, patterns: Iterable[str]) -> PatternMatcher:
+        """Повертає вже скомпільований набір з таким самим вмістом або компілює новий"""
+        patterns = set(patterns)
+        key = matcher_key(patterns, self.flags)
+        matcher = self._matcher_cache.get(key)
+        if matcher is None:
+            matcher = PatternMatcher(patterns, self.flags)
+            self._matcher_cache[key] = matcher
+        return matcher
+
+    def _build_matchers(self, patterns: Set[str], overlays: Dict[int, Tuple[Set[str], Set[str]]],
+                        quarantined: Set[str]):
+        """Компілює глобальний набір, оверлеї чатів і повільний шлях; нічого не змінює в активному стані"""
+        start = time.perf_counter()
+        matcher = self._get_or_compile(patterns - quarantined)
+        chat_matchers = {
+            chat_id: self._get_or_compile(((patterns - excluded) | added) - quarantined)
+            for chat_id, (added, excluded) in overlays.items()
+            if added or excluded
+        }
+        slow_patterns = tuple(sorted(quarantined))
+        self.compile_time.observe(time.perf_counter() - start)
+        return matcher, chat_matchers, slow_patterns
+
+    def _snapshot(self):
+        """Знімок паттернів для компіляції в іншому потоці"""
+        overlays = {
+            chat_id: (set(self.chat_patterns.get(chat_id, ())), set(self.chat_excluded.get(chat_id, ())))
+            for chat_id in self.chat_patterns.keys() | self.chat_excluded.keys()
+        }
+        return set(self.patterns), overlays, set(self.quarantined)
+
+    def _swap(self, matcher: PatternMatcher, chat_matchers: Dict[int, PatternMatcher],
+              slow_patterns: Tuple[str, ...] = ()):
+        """Атомарно підміняє активні набори: повідомлення одразу бачать нову версію"""
+        self._matcher, self._chat_matchers, self._slow_patterns = matcher, chat_matchers, slow_patterns
+        self.compiled_pattern = matcher.compiled_pattern
+        if self._match_pool is not None:
+            self._match_pool.refresh([matcher, *chat_matchers.values()])
+
     def _compile_patterns(self):
-        """Компілює всі паттерни в один регулярний вираз"""
-        if not self.patterns:
-            self.compiled_pattern = None
+        """Компілює глобальний набір паттернів та оверлеї всіх чатів (синхронно)"""
+        snapshot = self._snapshot()
+        self._swap(*self._build_matchers(*snapshot))
+        self._compiled_snapshot = snapshot
+
+    def _rollback(self, error: re.error):
+        """
+        Прибирає зі стану зміну, що ламає компіляцію, і перезаписує файли: вона не має лишитися
+        на диску (інакше наступний старт падає). Якщо винні нові паттерни — прибираються лише вони,
+        інакше все повертається до знімку активних наборів
+        """
+        broken = self._find_broken(self._pending_patterns(), self._active_group_names())
+        if broken:
+            logger.error("Error compiling patterns, %d new pattern(s) dropped: %s", len(broken), error)
+            self._remove_broken(broken)
+        else:
+            patterns, overlays, quarantined = self._compiled_snapshot
+            logger.error("Error compiling patterns, changes rolled back: %s", error)
+            self.patterns = set(patterns)
+            self.chat_patterns = {chat_id: set(added) for chat_id, (added, _) in overlays.items() if added}
+            self.chat_excluded = {chat_id: set(excluded) for chat_id, (_, excluded) in overlays.items() if excluded}
+            self.quarantined = set(quarantined)
+            self._pattern_store.replace(self.patterns)
+            self._chat_store.save(self._overlays_json())
+        self._compile_error = error
+        if self.on_change is not None:
+            self.on_change()
+        return bool(broken)
+
+    def _schedule_recompile(self):
+        """
+        Планує перекомпіляцію після зміни паттернів.
+        Усередині event loop компіляція виконується у фоновому потоці,
+        а повідомлення до завершення перевіряються попереднім набором.
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Поза event loop (старт, скрипти) — компілюємо одразу
+            try:
+                self._compile_patterns()
+            except re.error as e:
+                self._rollback(e)
+                self._compile_error = None
+                raise
             return
-            
-        # Об'єднуємо всі паттерни через |
-        combined_pattern = "|".join(f"({pattern})" for pattern in self.patterns)
-        self.compiled_pattern = re.compile(combined_pattern, self.flags)
-        
-    def is_spam(self, message: str) -> bool:
-        """Перевіряє чи є повідомлення спамом"""
-        if not self.compiled_pattern:
-            return False
-        return self.compiled_pattern.search(message) is not None
-    
-    def save_patterns(self):
-        """Зберігає паттерни в файл"""
+        if not self._dirty:
+            self._dirty_since = time.perf_counter()
+        self._dirty = True
+        if self._recompile_task is None or self._recompile_task.done():
+            self._recompile_task = loop.create_task(self._recompile_in_background())
+
+    def _changed(self):
+        self._schedule_recompile()
+        if self.on_change is not None:
+            self.on_change()
+
+    def export_state(self) -> dict:
+        """Поточний набір паттернів, оверлеї чатів і карантин (для передачі іншому процесу)"""
+        return {
+            "patterns": sorted(self.patterns),
+            "chats": self._overlays_json(),
+            "quarantined": sorted(self.quarantined),
+            "domains": self.domains.get_domains(),
+        }
+
+    def apply_state(self, state: dict):
+        """
+        Застосовує стан, отриманий від іншого процесу (export_state). On_change не викликається.
+        Файли пише лише процес-власник, решта оновлюють пам'ять (див. set_read_only)
+        """
+        self.patterns = set(state["patterns"])
+        if self._pattern_store.read_only:
+            self._pattern_store.sync(self.patterns)
+        else:
+            self._pattern_store.replace(self.patterns)
+        self.chat_patterns.clear()
+        self.chat_excluded.clear()
+        for chat_id, overlay in state["chats"].items():
+            if overlay.get("add"):
+                self.chat_patterns[int(chat_id)] = set(overlay["add"])
+            if overlay.get("exclude"):
+                self.chat_excluded[int(chat_id)] = set(overlay["exclude"])
+        self.quarantined = set(state["quarantined"]) & self._all_patterns()
+        self._chat_store.save(self._overlays_json())
+        self.domains.set_dynamic(state.get("domains", ()))
+        self._schedule_recompile()
+
+    def set_read_only(self, read_only: bool = True):
+        """
+        Режим шардів: patterns.json, chat_patterns.json, domains.json і модель пише один процес.
+        Тут зміни лише застосовуються в пам'яті й розсилаються через on_change / on_train
+        """
+        self._pattern_store.read_only = read_only
+        self._chat_store.read_only = read_only
+        self.domains.set_read_only(read_only)
+        if self.scorer is not None:
+            self.scorer.set_read_only(read_only)
+
+    async def _recompile_in_background(self):
+        """Компілює паттерни у фоновому потоці, поки є незастосовані зміни"""
+        loop = asyncio.get_running_loop()
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="spam-filter-compile")
+        # Невелика пауза, щоб пакет правок підряд дав одну компіляцію
+        await asyncio.sleep(RECOMPILE_BATCH_DELAY)
+        while self._dirty:
+            self._dirty = False
+            requested_at = self._dirty_since
+            snapshot = self._snapshot()
+            try:
+                compiled = await loop.run_in_executor(self._executor, self._build_matchers, *snapshot)
+            except re.error as e:
+                # Активні набори не змінилися; без зламаних паттернів решту змін компілюємо ще раз
+                self._dirty = self._rollback(e)
+                continue
+            except Exception as e:
+                logger.error("Error compiling patterns: %s", e)
+                continue
+            self._swap(*compiled)
+            self._compiled_snapshot = snapshot
+            self.swap_latency.observe(time.perf_counter() - requested_at)
+
+    async def wait_compiled(self):
+        """
+        Чекає, поки всі заплановані зміни паттернів стануть активними.
+        re.error — набір не скомпілювався, і зміни відкочено до попереднього активного стану
+        """
+        if self._recompile_task is not None and not self._recompile_task.done():
+            await asyncio.shield(self._recompile_task)
+        if self._compile_error is not None:
+            error, self._compile_error = self._compile_error, None
+            raise error
+
+    def get_compile_stats(self) -> Dict[str, Dict[str, float]]:
+        """Метрики компіляції та затримки підміни набору"""
+        return {
+            "compile": self.compile_time.summary(),
+            "swap": self.swap_latency.summary(),
+            "match": self.match_time.summary(),
+            "pool_match": self.pool_match_time.summary(),
+        }
+
+    def is_spam(self, message: str, chat_id: Optional[int] = None) -> bool:
+        """Перевіряє чи є повідомлення спамом (з урахуванням оверлею чату)"""
+        return self.find_match(message, chat_id) is not None
+
+    def add_domains(self, values: Iterable[str]) -> Tuple[List[str], List[str]]:
+        """Додає домени до списку блокування; повертає (додані, некоректні)"""
+        added, invalid = self.domains.add_domains(values)
+        if added and self.on_change is not None:
+            self.on_change()
+        return added, invalid
+
+    def remove_domains(self, values: Iterable[str]) -> int:
+        removed = self.domains.remove_domains(values)
+        if removed and self.on_change is not None:
+            self.on_change()
+        return removed
+
+    def _find_domain(self, message: str) -> Optional[MatchResult]:
+        """
+        Шукає заблоковані домени в сирому тексті: нормалізація замінила б латинські літери кирилицею.
+        Паттерн спрацювання — domain:<правило>, позиції — в сирому тексті.
+        """
+        found = self.domains.find(message)
+        if found is None:
+            return None
+        pattern = DOMAIN_PATTERN_PREFIX + found.rule
+        self.hit_counts[pattern] += 1
+        return MatchResult(-1, pattern, found.span, found.host)
+
+    def _find_duplicate(self, text: str) -> Optional[MatchResult]:
+        """Копія нещодавно видаленого спаму (text нормалізований); паттерн — duplicate:<паттерн оригіналу>"""
+        found = self.fingerprints.find(text)
+        if found is None:
+            return None
+        pattern = DUPLICATE_PATTERN_PREFIX + (found.pattern or "")
+        self.hit_counts[pattern] += 1
+        return MatchResult(-1, pattern, (0, 0), "")
+
+    def remember_spam(self, message: str, pattern: Optional[str] = None, publish: bool = True):
+        """Запам'ятовує відбиток видаленого спаму, щоб його копії в будь-якому чаті ловилися без regex"""
+        if pattern and pattern.startswith(DUPLICATE_PATTERN_PREFIX):
+            pattern = pattern[len(DUPLICATE_PATTERN_PREFIX):]
+        message = message[:FINGERPRINT_MAX_CHARS]
+        self.fingerprints.add(normalize_text(message), pattern)
+        if publish and self.on_fingerprint is not None:
+            self.on_fingerprint("add", message, pattern)
+
+    def forget_spam(self, message: str, publish: bool = True) -> int:
+        """Прибирає відбитки, схожі на повідомлення (адмін його повернув)"""
+        message = message[:FINGERPRINT_MAX_CHARS]
+        removed = self.fingerprints.forget(normalize_text(message))
+        if publish and self.on_fingerprint is not None:
+            self.on_fingerprint("forget", message, None)
+        return removed
+
+    def _normalize(self, message: str) -> str:
+        text = normalize_text(message)
+        self._last_normalized = (message, text)
+        return text
+
+    def find_match(self, message: str, chat_id: Optional[int] = None) -> Optional[MatchResult]:
+        """Повертає паттерн, що спрацював на повідомленні, і враховує його в лічильниках"""
+        match = self._find_domain(message)
+        if match is not None:
+            return match
+        # Нормалізуємо один раз: гомогліфи, невидимі символи, регістр
+        text = self._normalize(message)
+        match = self._find_duplicate(text)
+        if match is not None:
+            return match
+        matcher = self.get_matcher(chat_id)
+        if matcher is None or not matcher.patterns:
+            return None
+        return self._find_inline(text, matcher)
+
+    def _find_inline(self, text: str, matcher: PatternMatcher) -> Optional[MatchResult]:
+        start = time.perf_counter()
+        match = matcher.find(text)
+        elapsed = time.perf_counter() - start
+        self.match_time.observe(elapsed)
+        if elapsed > MATCH_TIME_BUDGET and not self._budget_check_pending:
+            self._start_budget_check(text, matcher)
+        if match is not None:
+            self.hit_counts[match.pattern] += 1
+        return match
+
+    async def find_match_async(self, message: str, chat_id: Optional[int] = None) -> Optional[MatchResult]:
+        """
+        Як find_match, але довгі тексти (і середні — для складних наборів) нормалізуються
+        й перевіряються в пулі процесів, а не в event loop. Короткі перевіряються на місці:
+        передача в інший процес дорожча за саму перевірку.
+        """
+        match = self._find_domain(message)
+        if match is not None:
+            return match
+        matcher = self.get_matcher(chat_id)
+        has_patterns = matcher is not None and bool(matcher.patterns)
+        if not has_patterns or self._match_pool is None or not self._match_pool.should_offload(message, matcher):
+            text = self._normalize(message)
+            match = self._find_duplicate(text)
+            if match is not None or not has_patterns:
+                return match
+            return self._find_inline(text, matcher)
+        if len(self.fingerprints):
+            # Для відбитка достатньо початку тексту; цілком довгий текст нормалізується в пулі
+            match = self._find_duplicate(normalize_text(message[:FINGERPRINT_MAX_CHARS]))
+            if match is not None:
+                return match
+        start = time.perf_counter()
+        match = await self._match_pool.find(matcher, message)
+        self.pool_match_time.observe(time.perf_counter() - start)
+        if match is not None:
+            self.hit_counts[match.pattern] += 1
+        return match
+
+    def _start_budget_check(self, text: str, matcher: PatternMatcher):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._budget_check_pending = True
+        loop.create_task(self._check_match_budget(text, matcher))
+
+    def has_slow_patterns(self) -> bool:
+        return bool(self._slow_patterns)
+
+    def _slow_candidates(self, chat_id: Optional[int]) -> List[int]:
+        """Індекси паттернів на карантині, що діють у цьому чаті"""
+        added = self.chat_patterns.get(chat_id, set())
+        excluded = self.chat_excluded.get(chat_id, set())
+        return [
+            index for index, pattern in enumerate(self._slow_patterns)
+            if pattern in added or (pattern in self.patterns and pattern not in excluded)
+        ]
+
+    def _search_slow(self, patterns: Tuple[str, ...], indices: List[int], text: str):
+        """Виконується в потоці повільного шляху; процес перезапускається, якщо набір змінився"""
+        if self._slow_worker is None or self._slow_worker_patterns != patterns:
+            if self._slow_worker is not None:
+                self._slow_worker.close()
+            self._slow_worker = SlowPathWorker([normalize_pattern(pattern) for pattern in patterns], self.flags)
+            self._slow_worker_patterns = patterns
+        return self._slow_worker.search(text, indices, SLOW_PATH_TIMEOUT)
+
+    async def find_match_slow(self, message: str, chat_id: Optional[int] = None) -> Optional[MatchResult]:
+        """
+        Повільний шлях: перевіряє паттерни на карантині в окремому процесі з таймаутом.
+        Процес із завислим regex вбивається; поки попередня перевірка ще триває,
+        нові повідомлення повільним шляхом не перевіряються, щоб не накопичувати черги.
+        """
+        patterns = self._slow_patterns
+        indices = self._slow_candidates(chat_id)
+        if not indices or self._slow_busy:
+            return None
+        loop = asyncio.get_running_loop()
+        self._slow_busy = True
         try:
-            with open("patterns.json", "w", encoding="utf-8") as f:
-                json.dump(list(self.patterns), f, ensure_ascii=False, indent=2)
+            result = await loop.run_in_executor(
+                self._get_slow_executor(), self._search_slow, patterns, indices, normalize_text(message)
+            )
         except Exception as e:
-            print(f"Error saving patterns: {e}")
+            logger.error("Slow path error: %s", e)
+            return None
+        finally:
+            self._slow_busy = False
+        return self._slow_result(patterns, result)
+
+    def _find_slow_sync(self, message: str, chat_id: Optional[int]) -> Optional[MatchResult]:
+        """Повільний шлях для пакетної перевірки: чекає на результат у потоці виклику"""
+        patterns = self._slow_patterns
+        indices = self._slow_candidates(chat_id)
+        if not indices:
+            return None
+        try:
+            # Той самий однопотоковий виконавець, що й find_match_slow: процес повільного шляху не ділиться між потоками
+            result = self._get_slow_executor().submit(
+                self._search_slow, patterns, indices, normalize_text(message)
+            ).result()
+        except Exception as e:
+            logger.error("Slow path error: %s", e)
+            return None
+        return self._slow_result(patterns, result)
+
+    def _get_slow_executor(self) -> ThreadPoolExecutor:
+        if self._slow_executor is None:
+            self._slow_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="spam-filter-slow")
+        return self._slow_executor
+
+    def _slow_result(self, patterns: Tuple[str, ...], result) -> Optional[MatchResult]:
+        if result is None:
+            return None
+        index, span, matched_text = result
+        self.hit_counts[patterns[index]] += 1
+        return MatchResult(index, patterns[index], tuple(span), matched_text)
+
+    def find_by_score(self, message: str) -> Optional[MatchResult]:
+        """
+        Другий етап для повідомлень, які не вирішили паттерни: оцінка моделлю (utils/scorer.py).
+        Спрацювання — паттерн score, у matched_text — імовірність спаму.
+        """
+        if self.scorer is None or not self.scorer.ready:
+            return None
+        cached, text = self._last_normalized
+        if cached is not message:
+            text = normalize_text(message[:SCORER_MAX_CHARS])
+        spam, probability = self.scorer.is_spam(text)
+        if not spam:
+            return None
+        self.hit_counts[SCORE_PATTERN] += 1
+        return MatchResult(-1, SCORE_PATTERN, (0, 0), f"{probability:.3f}")
+
+    def learn(self, message: str, spam: bool, weight: int = 1, publish: bool = True):
+        """
+        Приклад для моделі від адміна: spam=True — «Забанити», False — «Повернути»;
+        weight=-1 скасовує раніше доданий приклад (адмін змінив рішення)
+        """
+        if self.scorer is None or not message:
+            return
+        message = message[:SCORER_MAX_CHARS]
+        self.scorer.learn(normalize_text(message), spam, weight)
+        # Модель зберігає лише процес-власник файлу (він отримує приклади всіх воркерів), у решти save() нічого не пише
+        self.scorer.save()
+        if publish and self.on_train is not None:
+            self.on_train(message, spam, weight)
+
+    def record_false_positive(self, pattern: Optional[str]):
+        """Позначає спрацювання паттерну як хибне (адмін повернув повідомлення)"""
+        if pattern:
+            self.false_positive_counts[pattern] += 1
+
+    def get_pattern_stats(self) -> List[Tuple[str, int, int]]:
+        """Повертає (паттерн, спрацювання, хибні спрацювання) для всіх глобальних паттернів, найактивніші першими"""
+        return sorted(
+            ((pattern, self.hit_counts[pattern], self.false_positive_counts[pattern]) for pattern in self.patterns),
+            key=lambda item: (-item[1], item[0])
+        )
+
+    def get_fingerprint_stats(self) -> Dict[str, int]:
+        """Кількість відбитків, перевірок і знайдених копій"""
+        return self.fingerprints.stats()
+
+    def get_scorer_stats(self) -> Optional[Dict[str, int]]:
+        """Приклади навчання, оцінені повідомлення та спрацювання моделі; None — модель вимкнена"""
+        return self.scorer.stats() if self.scorer is not None else None
+
+    def get_domain_stats(self) -> Dict[str, int]:
+        """Розмір списку доменів (усього, базовий, доданих адмінами) і кількість доменних спрацювань"""
+        return {
+            "total": len(self.domains),
+            "base": self.domains.base_count,
+            "dynamic": len(self.domains.dynamic),
+            "hits": sum(hits for pattern, hits in self.hit_counts.items()
+                        if pattern.startswith(DOMAIN_PATTERN_PREFIX)),
+        }
+
+    def get_overlay_stats(self) -> Dict[str, int]:
+        """Кількість чатів з оверлеями та унікальних скомпільованих наборів"""
+        return {
+            "chats": len(self._chat_matchers),
+            "compiled_sets": len({matcher.key for matcher in self._chat_matchers.values()} | {self._matcher.key}),
+        }
+
+    def _classify(self, message: str, chat_id: Optional[int]) -> Optional[MatchResult]:
+        """Етапи обробника повідомлень: домени, відбитки, regex, карантин, модель"""
+        match = self.find_match(message, chat_id)
+        if match is None and self._slow_patterns:
+            match = self._find_slow_sync(message, chat_id)
+        if match is None:
+            match = self.find_by_score(message)
+        return match
+
+    def classify_many(self, messages: Iterable[str], chat_id: Optional[int] = None) -> List[Verdict]:
+        """
+        Перевіряє пакет повідомлень (бекфіл експортів чату, рейди) тими самими етапами, що й обробник
+        повідомлень, тож вердикти збігаються з модерацією; спрацювання враховуються в лічильниках.
+        Повідомлення перевіряються по черзі: re не відпускає GIL, тож пул потоків нічого не дає
+        (див. benchmarks/bench_batch.py). Вердикти повертаються в порядку вхідних повідомлень.
+        """
+        verdicts = []
+        for message in messages:
+            match = self._classify(message, chat_id) if message else None
+            if match is None:
+                verdicts.append(Verdict(False))
+            else:
+                verdicts.append(Verdict(True, match.pattern_id, match.pattern, match))
+        return verdicts
+
+    def is_spam_batch(self, messages: Iterable[str], chat_id: Optional[int] = None) -> List[bool]:
+        """Як classify_many, але повертає лише True/False для кожного повідомлення"""
+        return [verdict.is_spam for verdict in self.classify_many(messages, chat_id)]
+    
+    async def flush(self):
+        """Записує на диск усі відкладені зміни (перед зупинкою бота)"""
+        await self._pattern_store.flush()
+        await self._chat_store.flush()
+        await self.domains.flush()
+        if self.scorer is not None:
+            await self.scorer.flush()
+
+    def close(self):
+        """Зупиняє пул перевірки довгих повідомлень і процес повільного шляху"""
+        if self._match_pool is not None:
+            self._match_pool.close()
+        if self._slow_worker is not None:
+            self._slow_worker.close()
+            self._slow_worker = None
+
+    def save_patterns(self):
+        """Зберігає паттерни в файл (згортає журнал змін у знімок)"""
+        self._pattern_store.replace(self.patterns)
+        self._pattern_store.compact()
     
     def load_patterns(self):
-        """Завантажує паттерни з файлу"""
+        """Завантажує паттерни: знімок patterns.json плюс журнал змін"""
+        self.patterns.update(self._pattern_store.load())
+
+    def _overlays_json(self) -> dict:
+        return {
+            str(chat_id): {
+                "add": sorted(self.chat_patterns.get(chat_id, ())),
+                "exclude": sorted(self.chat_excluded.get(chat_id, ())),
+            }
+            for chat_id in self.chat_patterns.keys() | self.chat_excluded.keys()
+            if self.chat_patterns.get(chat_id) or self.chat_excluded.get(chat_id)
+        }
+
+    def save_chat_patterns(self):
+        """Зберігає оверлеї чатів у файл"""
+        self._chat_store.save(self._overlays_json())
+
+    def load_chat_patterns(self):
+        """Завантажує оверлеї чатів з файлу"""
         try:
-            if os.path.exists("patterns.json"):
-                with open("patterns.json", "r", encoding="utf-8") as f:
-                    patterns = json.load(f)
-                    self.patterns.update(patterns)
+            for chat_id, overlay in self._chat_store.load(default={}).items():
+                if overlay.get("add"):
+                    self.chat_patterns[int(chat_id)] = set(overlay["add"])
+                if overlay.get("exclude"):
+                    self.chat_excluded[int(chat_id)] = set(overlay["exclude"])
         except Exception as e:
-            print(f"Error loading patterns: {e}")
\ No newline at end of file
+            logger.error("Error loading chat patterns: %s", e)
\ No newline at end of file
@@ -0,0 +1,399 @@
+import math
+import multiprocessing
+import random
+import re
+import time
+from re import _parser as sre_parse, _constants as sre_constants
+from typing import Dict, List, NamedTuple, Optional, Sequence, Set
+
+# Бюджет часу на перевірку одного повідомлення всіма паттернами, що виконуються inline
+MATCH_TIME_BUDGET = 0.005
+# Скільки часу дається одному паттерну в пробі, перш ніж процес буде вбито
+PROBE_TIMEOUT = 1.0
+PROBE_STARTUP_TIMEOUT = 10.0
+# Максимальна довжина повідомлення в Telegram — найгірший випадок для проби
+PROBE_SIZES = (32, 1024, 4096)
+
+_REPEATS = {sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT, sre_constants.POSSESSIVE_REPEAT}
+_NO_REPEAT = object()
+_CATEGORY_EXAMPLES = {
+    sre_constants.CATEGORY_DIGIT: "0",
+    sre_constants.CATEGORY_WORD: "a0_",
+    sre_constants.CATEGORY_SPACE: " ",
+    sre_constants.CATEGORY_NOT_DIGIT: "a !",
+    sre_constants.CATEGORY_NOT_WORD: " !",
+    sre_constants.CATEGORY_NOT_SPACE: "a0!",
+}
+
+
+class SafetyReport(NamedTuple):
+    """Результат перевірки паттерну на ReDoS"""
+    issues: List[str]
+    worst_case: float = 0.0  # секунди, найгірший час у пробі (math.inf — процес довелося вбити)
+    rejected: bool = False   # паттерн не можна додавати
+    slow: bool = False       # паттерн перевищує бюджет — лише повільний шлях
+
+
+def _char_atoms(op, av) -> Optional[Set]:
+    """Множина «атомів» символів, які може спожити вузол (None — будь-який символ)"""
+    if op is sre_constants.LITERAL:
+        return {chr(av).casefold()}
+    if op is sre_constants.IN:
+        atoms = set()
+        for item_op, item_av in av:
+            if item_op is sre_constants.LITERAL:
+                atoms.add(chr(item_av).casefold())
+            elif item_op is sre_constants.RANGE and item_av[1] - item_av[0] <= 256:
+                atoms.update(chr(c).casefold() for c in range(item_av[0], item_av[1] + 1))
+            elif item_op is sre_constants.CATEGORY:
+                atoms.add(item_av)
+            else:
+                return None
+        return atoms
+    return None
+
+
+def _atoms_overlap(left: Optional[Set], right: Optional[Set]) -> bool:
+    """Чи можуть дві множини атомів спожити однаковий символ (наближено, з запасом)"""
+    if left is None or right is None:
+        return True
+    return any(_atom_overlap(a, b) for a in left for b in right)
+
+
+def _atom_overlap(a, b) -> bool:
+    # Атом — або символ (str), або категорія \d, \w, \s, ...
+    if isinstance(a, str) and isinstance(b, str):
+        return a == b
+    if isinstance(a, str):
+        return _category_matches(b, a)
+    if isinstance(b, str):
+        return _category_matches(a, b)
+    return bool(set(_CATEGORY_EXAMPLES.get(a, "a")) & set(_CATEGORY_EXAMPLES.get(b, "a")))
+
+
+def _category_matches(category, char: str) -> bool:
+    patterns = {
+        sre_constants.CATEGORY_DIGIT: r"\d", sre_constants.CATEGORY_NOT_DIGIT: r"\D",
+        sre_constants.CATEGORY_WORD: r"\w", sre_constants.CATEGORY_NOT_WORD: r"\W",
+        sre_constants.CATEGORY_SPACE: r"\s", sre_constants.CATEGORY_NOT_SPACE: r"\S",
+    }
+    pattern = patterns.get(category)
+    return pattern is None or re.fullmatch(pattern, char) is not None
+
+
+def _first(items) -> Optional[Set]:
+    """Множина атомів, з яких може починатися збіг послідовності (None — будь-який)"""
+    result: Set = set()
+    for op, av in items:
+        node_first = _node_first(op, av)
+        if node_first is None:
+            return None
+        result |= node_first
+        if not _nullable_node(op, av):
+            return result
+    return result
+
+
+def _node_first(op, av) -> Optional[Set]:
+    if op in (sre_constants.LITERAL, sre_constants.IN):
+        return _char_atoms(op, av)
+    if op is sre_constants.SUBPATTERN:
+        return _first(av[-1])
+    if op is sre_constants.ATOMIC_GROUP:
+        return _first(av)
+    if op is sre_constants.BRANCH:
+        result: Set = set()
+        for branch in av[1]:
+            branch_first = _first(branch)
+            if branch_first is None:
+                return None
+            result |= branch_first
+        return result
+    if op in _REPEATS:
+        return _first(av[2])
+    if op in (sre_constants.AT, sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+        return set()
+    return None
+
+
+def _nullable(items) -> bool:
+    return all(_nullable_node(op, av) for op, av in items)
+
+
+def _nullable_node(op, av) -> bool:
+    """Чи може вузол збігтися з порожнім рядком"""
+    if op in (sre_constants.AT, sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+        return True
+    if op is sre_constants.SUBPATTERN:
+        return _nullable(av[-1])
+    if op is sre_constants.ATOMIC_GROUP:
+        return _nullable(av)
+    if op is sre_constants.BRANCH:
+        return any(_nullable(branch) for branch in av[1])
+    if op in _REPEATS:
+        return av[0] == 0 or _nullable(av[2])
+    return False
+
+
+def _repeat_atoms(items) -> Optional[Set]:
+    """Атоми всіх символів, які може спожити послідовність"""
+    result: Set = set()
+    for op, av in items:
+        if op in (sre_constants.LITERAL, sre_constants.IN):
+            atoms = _char_atoms(op, av)
+        elif op is sre_constants.SUBPATTERN:
+            atoms = _repeat_atoms(av[-1])
+        elif op is sre_constants.ATOMIC_GROUP:
+            atoms = _repeat_atoms(av)
+        elif op is sre_constants.BRANCH:
+            atoms = set()
+            for branch in av[1]:
+                branch_atoms = _repeat_atoms(branch)
+                if branch_atoms is None:
+                    return None
+                atoms |= branch_atoms
+        elif op in _REPEATS:
+            atoms = _repeat_atoms(av[2])
+        elif op in (sre_constants.AT, sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            atoms = set()
+        else:
+            return None
+        if atoms is None:
+            return None
+        result |= atoms
+    return result
+
+
+def _is_unbounded(op, av) -> bool:
+    return op in _REPEATS and op is not sre_constants.POSSESSIVE_REPEAT and av[1] > 16
+
+
+def _check_body(body, body_first, issues: List[str]):
+    """
+    Шукає всередині тіла повторення вкладене необмежене повторення, після якого
+    (до кінця ітерації) може йти символ, який воно саме здатне спожити: (a+)+, (\\w+\\s?)*.
+    """
+    for position, (op, av) in enumerate(body):
+        if op is sre_constants.SUBPATTERN:
+            _check_body(list(av[-1]) + list(body[position + 1:]), body_first, issues)
+            continue
+        if not _is_unbounded(op, av):
+            continue
+        rest = body[position + 1:]
+        follow = _first(rest) if rest else set()
+        if follow is not None and _nullable(rest):
+            follow = None if body_first is None else follow | body_first
+        if _atoms_overlap(_repeat_atoms(av[2]), follow):
+            issues.append("вкладені квантифікатори на кшталт (a+)+ — експоненційний перебір")
+            return
+
+
+def _alternatives(body) -> Optional[list]:
+    """Гілки альтернативи, якщо тіло повторення — це одна група (a|b|...)"""
+    if len(body) != 1:
+        return None
+    op, av = body[0]
+    if op is sre_constants.SUBPATTERN:
+        return _alternatives(av[-1])
+    if op is sre_constants.BRANCH:
+        return av[1]
+    return None
+
+
+def _walk(items, issues: List[str], warnings: List[str]):
+    previous_repeat = _NO_REPEAT
+    for op, av in items:
+        if op in _REPEATS:
+            body = av[2]
+            if _is_unbounded(op, av):
+                _check_body(list(body), _first(body), issues)
+                alternatives = _alternatives(body)
+                if alternatives:
+                    firsts = [_first(branch) for branch in alternatives]
+                    if any(_atoms_overlap(a, b) for i, a in enumerate(firsts) for b in firsts[i + 1:]):
+                        issues.append("альтернативи, що перетинаються, під квантифікатором (a|ab)* — експоненційний перебір")
+                if previous_repeat is not _NO_REPEAT and _atoms_overlap(previous_repeat, _repeat_atoms(body)):
+                    warnings.append("сусідні необмежені квантифікатори з однаковими символами (.*.*) — квадратичний час")
+                previous_repeat = _repeat_atoms(body)
+            _walk(body, issues, warnings)
+            continue
+        if op is sre_constants.SUBPATTERN:
+            _walk(av[-1], issues, warnings)
+        elif op is sre_constants.ATOMIC_GROUP:
+            _walk(av, issues, warnings)
+        elif op is sre_constants.BRANCH:
+            for branch in av[1]:
+                _walk(branch, issues, warnings)
+        elif op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            _walk(av[1], issues, warnings)
+        if not _nullable_node(op, av):
+            previous_repeat = _NO_REPEAT
+
+
+def analyze_pattern(pattern: str, flags: int = 0) -> SafetyReport:
+    """
+    Статичний аналіз паттерну на типові ReDoS-форми.
+    Експоненційні форми відхиляються, квадратичні — лише попередження (рішення за пробою).
+    """
+    try:
+        parsed = sre_parse.parse(pattern, flags)
+    except re.error as e:
+        return SafetyReport([f"некоректний регулярний вираз: {e}"], rejected=True)
+    issues: List[str] = []
+    warnings: List[str] = []
+    _walk(parsed.data, issues, warnings)
+    issues = list(dict.fromkeys(issues))
+    return SafetyReport(issues + list(dict.fromkeys(warnings)), rejected=bool(issues))
+
+
+def adversarial_inputs(pattern: str, seed: int = 0) -> List[str]:
+    """Генерує входи, на яких поганий regex найімовірніше почне перебирати варіанти"""
+    rng = random.Random(seed)
+    alphabet = [char for char in dict.fromkeys(pattern) if char.isalnum()][:6] + ["a", "0", " "]
+    inputs = []
+    for size in PROBE_SIZES:
+        for char in alphabet:
+            inputs.append(char * size + "!")
+        for first, second in zip(alphabet, alphabet[1:]):
+            inputs.append((first + second) * (size // 2) + "!")
+        inputs.append("".join(rng.choice(alphabet) for _ in range(size)) + "!")
+    return inputs
+
+
+def _probe_worker(conn, patterns: Sequence[str], flags: int, texts: Optional[Sequence[str]]):
+    """Виконується в окремому процесі: міряє найгірший час кожного паттерну"""
+    conn.send(None)  # процес запустився, далі діє таймаут на паттерн
+    for index, pattern in enumerate(patterns):
+        try:
+            regex = re.compile(pattern, flags)
+        except re.error:
+            conn.send((index, 0.0))
+            continue
+        worst = 0.0
+        for text in texts if texts is not None else adversarial_inputs(pattern):
+            start = time.perf_counter()
+            regex.search(text)
+            worst = max(worst, time.perf_counter() - start)
+        conn.send((index, worst))
+    conn.close()
+
+
+def _measure_chunk(patterns: Sequence[str], flags: int, texts: Optional[Sequence[str]],
+                   timeout: float) -> Dict[int, float]:
+    """Запускає один процес проби; зупиняється на першому паттерні, що перевищив timeout"""
+    results: Dict[int, float] = {}
+    context = multiprocessing.get_context("spawn")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_probe_worker, args=(sender, list(patterns), flags, texts), daemon=True)
+    process.start()
+    sender.close()
+    try:
+        try:
+            if not receiver.poll(PROBE_STARTUP_TIMEOUT):
+                raise EOFError
+            receiver.recv()
+        except EOFError:
+            raise RuntimeError("regex probe process did not start") from None
+        while len(results) < len(patterns):
+            if not receiver.poll(timeout):
+                results[len(results)] = math.inf
+                break
+            try:
+                index, elapsed = receiver.recv()
+            except EOFError:
+                # Процес упав на цьому паттерні
+                results[len(results)] = math.inf
+                break
+            results[index] = elapsed
+    finally:
+        if process.is_alive():
+            process.kill()
+        process.join()
+        receiver.close()
+    return results
+
+
+def measure_patterns(patterns: Sequence[str], flags: int = 0, texts: Optional[Sequence[str]] = None,
+                     timeout: float = PROBE_TIMEOUT) -> Dict[int, float]:
+    """
+    Міряє найгірший час пошуку для кожного паттерну в окремому процесі (блокуючий виклик —
+    запускайте поза event loop). texts=None — використовуються згенеровані ворожі входи.
+    Паттерн, на якому процес завис довше за timeout, отримує math.inf: процес вбивається,
+    і для решти паттернів запускається новий. Повертає індекс паттерну -> секунди.
+    """
+    results: Dict[int, float] = {}
+    offset = 0
+    while offset < len(patterns):
+        chunk = _measure_chunk(patterns[offset:], flags, texts, timeout)
+        for index, elapsed in chunk.items():
+            results[offset + index] = elapsed
+        offset += len(chunk)
+    return results
+
+
+def _slow_path_worker(conn, patterns: Sequence[str], flags: int):
+    """Виконується в окремому процесі: шукає збіг серед паттернів на карантині"""
+    regexes = [re.compile(pattern, flags) for pattern in patterns]
+    conn.send(None)
+    while True:
+        try:
+            text, indices = conn.recv()
+        except EOFError:
+            break
+        result = None
+        for index in indices:
+            match = regexes[index].search(text)
+            if match is not None:
+                result = (index, match.span(), match.group())
+                break
+        conn.send(result)
+
+
+class SlowPathWorker:
+    """
+    Окремий процес для паттернів на карантині. На відміну від потоку, процес із завислим
+    regex можна вбити: після таймауту він перезапускається при наступному запиті.
+    Методи блокуючі — викликайте їх з одного фонового потоку.
+    """
+
+    def __init__(self, patterns: Sequence[str], flags: int = 0):
+        self.patterns = tuple(patterns)
+        self.flags = flags
+        self._process = None
+        self._conn = None
+
+    def _start(self):
+        context = multiprocessing.get_context("spawn")
+        self._conn, child = context.Pipe()
+        self._process = context.Process(
+            target=_slow_path_worker, args=(child, list(self.patterns), self.flags), daemon=True
+        )
+        self._process.start()
+        child.close()
+        if not self._conn.poll(PROBE_STARTUP_TIMEOUT):
+            self.close()
+            raise RuntimeError("slow path process did not start")
+        self._conn.recv()
+
+    def search(self, text: str, indices: Sequence[int], timeout: float):
+        """Повертає (індекс, span, текст збігу) або None; TimeoutError, якщо процес довелося вбити"""
+        if self._process is None or not self._process.is_alive():
+            self._start()
+        self._conn.send((text, list(indices)))
+        try:
+            if self._conn.poll(timeout):
+                return self._conn.recv()
+        except EOFError:
+            pass
+        self.close()
+        raise TimeoutError(f"slow path exceeded {timeout:g} s")
+
+    def close(self):
+        if self._process is not None:
+            if self._process.is_alive():
+                self._process.kill()
+            self._process.join()
+            self._process = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
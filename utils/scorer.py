@@ -0,0 +1,186 @@
+import logging
+import math
+import struct
+import sys
+import zlib
+from array import array
+from typing import Dict, Optional, Set, Tuple
+from utils.storage import BinarySnapshotFile
+
+logger = logging.getLogger(__name__)
+
+# Розмір таблиці ознак: 2**SCORER_BITS комірок, колізії хешів рідкісні й для наївного Баєса нешкідливі
+SCORER_BITS = 18
+# Ознаки — символьні n-грами нормалізованого тексту цих довжин
+NGRAM_SIZES = (3, 4)
+# Оцінюється лише початок тексту: довгий спам видно з перших рядків
+SCORER_MAX_CHARS = 1024
+# Скільки підтверджених адмінами прикладів кожного класу потрібно, перш ніж оцінка щось видаляє
+SCORER_MIN_EXAMPLES = 10
+# Імовірність спаму, від якої повідомлення видаляється
+SCORER_THRESHOLD = 0.95
+# Згладжування Лапласа для лічильників ознак
+SMOOTHING = 1.0
+# Паттерн у MatchResult для спрацювань оцінки (лічильники, журнал модерації)
+SCORE_PATTERN = "score"
+
+# Заголовок файлу моделі: сигнатура, SCORER_BITS, прикладів спаму/не спаму, сум ознак спаму/не спаму
+_HEADER = struct.Struct("<4sBIIQQ")
+_MAGIC = b"SPS1"
+# Коди символів для n-грам: кодування з порядком байтів машини читається в array("I") без перетворень
+_UTF32 = "utf-32-le" if sys.byteorder == "little" else "utf-32-be"
+
+
+def _little_endian(counts: array) -> bytes:
+    if sys.byteorder == "big":
+        counts = array(counts.typecode, counts)
+        counts.byteswap()
+    return counts.tobytes()
+
+
+def _encode(snapshot: Tuple[bytes, bytes, bytes]) -> bytes:
+    header, spam, ham = snapshot
+    # Більшість комірок нульові: zlib стискає 2 МБ лічильників до десятків КБ
+    return header + zlib.compress(spam + ham, 6)
+
+
+class SpamScorer:
+    """
+    Другий етап перевірки: наївний Баєс на хешованих символьних n-грамах нормалізованого тексту.
+    Навчається онлайн на повідомленнях, підтверджених адмінами («🚫 Забанити» — спам,
+    «✅ Повернути» — не спам), і оцінює лише те, що не вирішили regex-паттерни.
+
+    Для кожної комірки зберігаються лічильники спаму й не спаму (array, 4 байти) і готова вага —
+    логарифм відношення згладжених лічильників. Навчання перераховує вагу лише змінених комірок,
+    тож оцінка — це множина хешів n-грам і сума ваг через map, без циклу на рівні Python.
+    Хеші — hash() кортежів кодів символів: для цілих він не залежить від PYTHONHASHSEED,
+    тож збережена модель дійсна після перезапуску.
+    Класи вважаються рівноймовірними: адміни значно частіше підтверджують спам, ніж повертають.
+    """
+
+    def __init__(self, path: str = "", bits: int = SCORER_BITS, threshold: float = SCORER_THRESHOLD,
+                 min_examples: int = SCORER_MIN_EXAMPLES):
+        self.bits = bits
+        self.size = 1 << bits
+        self.mask = self.size - 1
+        self.threshold = threshold
+        self.min_examples = min_examples
+        self._spam = array("I", bytes(4 * self.size))
+        self._ham = array("I", bytes(4 * self.size))
+        self._weights = array("d", bytes(8 * self.size))
+        self.spam_docs = 0
+        self.ham_docs = 0
+        self.spam_total = 0
+        self.ham_total = 0
+        self._norm = 0.0
+        self.scored = 0
+        self.hits = 0
+        self._store = BinarySnapshotFile(path, "scorer model", encode=_encode) if path else None
+        if self._store is not None:
+            self.load()
+
+    @property
+    def ready(self) -> bool:
+        return self.spam_docs >= self.min_examples and self.ham_docs >= self.min_examples
+
+    def features(self, text: str) -> Set[int]:
+        """Номери комірок n-грам нормалізованого тексту"""
+        # Через список: елементи array щоразу створюються заново, а список віддає готові об'єкти
+        codes = array("I", text[:SCORER_MAX_CHARS].encode(_UTF32)).tolist()
+        hashes: Set[int] = set()
+        for size in NGRAM_SIZES:
+            hashes.update(map(hash, zip(*(codes[i:] for i in range(size)))))
+        # Повтори n-грам відкидаються до маскування: у живих текстах їх багато
+        return set(map(self.mask.__and__, hashes))
+
+    def _update_norm(self):
+        # Знаменники згладжених імовірностей однакові для всіх ознак — один доданок на ознаку
+        extra = SMOOTHING * self.size
+        self._norm = math.log(self.ham_total + extra) - math.log(self.spam_total + extra)
+
+    def probability(self, text: str) -> Optional[float]:
+        """Імовірність спаму для нормалізованого тексту; None — модель ще не навчена або немає ознак"""
+        if not self.ready:
+            return None
+        features = self.features(text)
+        if not features:
+            return None
+        self.scored += 1
+        log_odds = sum(map(self._weights.__getitem__, features)) + len(features) * self._norm
+        if log_odds < -30.0:
+            return 0.0
+        return 1.0 / (1.0 + math.exp(-log_odds)) if log_odds < 30.0 else 1.0
+
+    def is_spam(self, text: str) -> Tuple[bool, Optional[float]]:
+        probability = self.probability(text)
+        spam = probability is not None and probability >= self.threshold
+        if spam:
+            self.hits += 1
+        return spam, probability
+
+    def learn(self, text: str, spam: bool, weight: int = 1):
+        """Додає приклад (weight=-1 — прибирає раніше доданий) і оновлює ваги змінених комірок"""
+        features = self.features(text)
+        if not features:
+            return
+        counts, other = (self._spam, self._ham) if spam else (self._ham, self._spam)
+        weights = self._weights
+        log = math.log
+        for feature in features:
+            counts[feature] = max(counts[feature] + weight, 0)
+            if spam:
+                weights[feature] = log(counts[feature] + SMOOTHING) - log(other[feature] + SMOOTHING)
+            else:
+                weights[feature] = log(other[feature] + SMOOTHING) - log(counts[feature] + SMOOTHING)
+        if spam:
+            self.spam_docs = max(self.spam_docs + weight, 0)
+            self.spam_total = max(self.spam_total + weight * len(features), 0)
+        else:
+            self.ham_docs = max(self.ham_docs + weight, 0)
+            self.ham_total = max(self.ham_total + weight * len(features), 0)
+        self._update_norm()
+
+    def save(self):
+        """Відкладений запис моделі у фоновому потоці (стиснений знімок лічильників)"""
+        if self._store is None:
+            return
+        header = _HEADER.pack(_MAGIC, self.bits, self.spam_docs, self.ham_docs, self.spam_total, self.ham_total)
+        self._store.save((header, _little_endian(self._spam), _little_endian(self._ham)))
+
+    def load(self) -> bool:
+        data = self._store.load()
+        if not data:
+            return False
+        try:
+            magic, bits, spam_docs, ham_docs, spam_total, ham_total = _HEADER.unpack_from(data)
+            if magic != _MAGIC or bits != self.bits:
+                logger.warning("Scorer model %s has another format, starting from scratch", self._store.path)
+                return False
+            counts = array("I", zlib.decompress(data[_HEADER.size:]))
+            if len(counts) != 2 * self.size:
+                raise ValueError("truncated counts")
+        except (struct.error, zlib.error, ValueError) as e:
+            logger.error("Error loading scorer model: %s", e)
+            return False
+        if sys.byteorder == "big":
+            counts.byteswap()
+        self._spam, self._ham = counts[:self.size], counts[self.size:]
+        log = math.log
+        self._weights = array("d", map(lambda s, h: log(s + SMOOTHING) - log(h + SMOOTHING), self._spam, self._ham))
+        self.spam_docs, self.ham_docs, self.spam_total, self.ham_total = spam_docs, ham_docs, spam_total, ham_total
+        self._update_norm()
+        logger.info("Завантажено модель оцінки: %d прикладів спаму, %d — не спаму", spam_docs, ham_docs)
+        return True
+
+    async def flush(self):
+        if self._store is not None:
+            await self._store.flush()
+
+    def set_read_only(self, read_only: bool = True):
+        """Модель зберігає інший процес: save() лише відкидає знімок"""
+        if self._store is not None:
+            self._store.read_only = read_only
+
+    def stats(self) -> Dict[str, int]:
+        return {"spam_examples": self.spam_docs, "ham_examples": self.ham_docs, "ready": self.ready,
+                "scored": self.scored, "hits": self.hits}
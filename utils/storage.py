@@ -0,0 +1,321 @@
+import asyncio
+import atexit
+import contextlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Пакет правок, що прийшли протягом цього часу, записується одним зверненням до диска
+DEBOUNCE_DELAY = 0.5
+# Після стількох записів у журналі він згортається в новий знімок
+COMPACT_THRESHOLD = 500
+JOURNAL_SUFFIX = ".journal"
+
+# Один потік на всі файли: запис не блокує event loop, а порядок записів зберігається
+_IO_EXECUTOR: Optional[ThreadPoolExecutor] = None
+
+
+def _io_executor() -> ThreadPoolExecutor:
+    global _IO_EXECUTOR
+    if _IO_EXECUTOR is None:
+        _IO_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="storage-io")
+    return _IO_EXECUTOR
+
+
+def _atomic_replace(path: str, mode: str, write: Callable[[Any], None]):
+    """Пише через тимчасовий файл і rename: файл або старий, або новий, але не обрізаний"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, mode, **({} if "b" in mode else {"encoding": "utf-8"})) as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(temp_path)
+        raise
+
+
+def atomic_write_json(path: str, data):
+    """Записує JSON атомарно (див. _atomic_replace)"""
+    _atomic_replace(path, "w", lambda f: json.dump(data, f, ensure_ascii=False, indent=2))
+
+
+def atomic_write_bytes(path: str, data: bytes):
+    """Записує двійковий файл атомарно (див. _atomic_replace)"""
+    _atomic_replace(path, "wb", lambda f: f.write(data))
+
+
+class _DebouncedWriter:
+    """
+    Відкладений запис: зміни накопичуються DEBOUNCE_DELAY секунд і записуються у фоновому потоці.
+    Поза event loop (старт, скрипти) запис виконується одразу. Незаписане скидається при виході.
+    """
+
+    def __init__(self, path: str, name: str, debounce: float = DEBOUNCE_DELAY):
+        self.path = path
+        self.name = name
+        self.debounce = debounce
+        self._lock = threading.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        # Лише для читання: зміни живуть у пам'яті, файл пише інший процес (шардинг)
+        self.read_only = False
+        atexit.register(self.flush_sync)
+
+    def _take(self) -> Optional[Callable[[], None]]:
+        """Забирає накопичені зміни й повертає функцію запису (None — нічого писати)"""
+        raise NotImplementedError
+
+    def _run(self, job: Callable[[], None]):
+        with self._lock:
+            try:
+                job()
+            except Exception as e:
+                logger.error("Error saving %s: %s", self.name, e)
+
+    def _schedule(self):
+        if self.read_only:
+            # Накопичене відкидається: інакше JournaledSet не перечитував би файли, доки є незаписане
+            self._take()
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush_sync()
+            return
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = loop.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.debounce)
+        await self.flush()
+
+    async def flush(self):
+        """Записує накопичені зміни у фоновому потоці"""
+        if self.read_only:
+            return
+        job = self._take()
+        if job is not None:
+            await asyncio.get_running_loop().run_in_executor(_io_executor(), self._run, job)
+
+    def flush_sync(self):
+        """Записує накопичені зміни в поточному потоці"""
+        if self.read_only:
+            return
+        job = self._take()
+        if job is not None:
+            self._run(job)
+
+
+class JsonSnapshotFile(_DebouncedWriter):
+    """JSON-файл, що щоразу перезаписується цілком (атомарно, з відкладеним записом)"""
+
+    def __init__(self, path: str, name: str, debounce: float = DEBOUNCE_DELAY):
+        super().__init__(path, name, debounce)
+        self._data = None
+        self._dirty = False
+
+    def load(self, default=None):
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, "r", encoding="utf-8") as f:
+                    return json.load(f)
+        except Exception as e:
+            logger.error("Error loading %s: %s", self.name, e)
+        return default
+
+    def save(self, data):
+        """Запам'ятовує новий вміст; на диск потрапить лише останній знімок пакета змін"""
+        self._data = data
+        self._dirty = True
+        self._schedule()
+
+    def _take(self):
+        if not self._dirty:
+            return None
+        data, self._dirty = self._data, False
+        return lambda: atomic_write_json(self.path, data)
+
+
+class BinarySnapshotFile(_DebouncedWriter):
+    """
+    Двійковий файл, що щоразу перезаписується цілком. save() приймає знімок стану,
+    а encode перетворює його на байти вже у фоновому потоці (стиснення не блокує event loop).
+    """
+
+    def __init__(self, path: str, name: str, encode: Callable[[Any], bytes] = bytes,
+                 debounce: float = DEBOUNCE_DELAY):
+        super().__init__(path, name, debounce)
+        self.encode = encode
+        self._data = None
+        self._dirty = False
+
+    def load(self) -> Optional[bytes]:
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, "rb") as f:
+                    return f.read()
+        except Exception as e:
+            logger.error("Error loading %s: %s", self.name, e)
+        return None
+
+    def save(self, data):
+        self._data = data
+        self._dirty = True
+        self._schedule()
+
+    def _take(self):
+        if not self._dirty:
+            return None
+        data, self._dirty = self._data, False
+        return lambda: atomic_write_bytes(self.path, self.encode(data))
+
+
+class JournaledSet(_DebouncedWriter):
+    """
+    Множина (рядків або чисел), що зберігається як JSON-знімок плюс журнал змін.
+    Кожна правка — один рядок, дописаний у кінець журналу, замість перезапису всього файлу.
+    Коли журнал виростає до compact_threshold записів, він згортається в новий знімок.
+    Операції ідемпотентні, тож повторне застосування журналу до свіжого знімку безпечне.
+    """
+
+    def __init__(self, path: str, name: str, debounce: float = DEBOUNCE_DELAY,
+                 compact_threshold: int = COMPACT_THRESHOLD):
+        super().__init__(path, name, debounce)
+        self.journal_path = path + JOURNAL_SUFFIX
+        self.compact_threshold = compact_threshold
+        self.values: Set = set()
+        self._pending: List[Tuple[str, Any]] = []
+        self._journal_size = 0
+        self._signature: Tuple = ()
+        # Коли востаннє перевіряли файли на сторонні зміни
+        self._checked_at = 0.0
+
+    def _file_signature(self) -> Tuple:
+        """mtime і розмір знімку та журналу — змінюються при будь-якому записі"""
+        signature = []
+        for path in (self.path, self.journal_path):
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def reload_if_changed(self, interval: float = 0.0) -> bool:
+        """
+        Перечитує файли, якщо їх змінили ззовні (не частіше ніж раз на interval секунд).
+        Поки є незаписані зміни, файли не перечитуються, щоб їх не втратити.
+        """
+        now = time.monotonic()
+        if now - self._checked_at < interval:
+            return False
+        self._checked_at = now
+        if self._pending or (self._flush_task is not None and not self._flush_task.done()):
+            return False
+        if self._file_signature() == self._signature:
+            return False
+        self.load()
+        return True
+
+    def load(self) -> Set:
+        """Відновлює множину: знімок, потім журнал (обрізаний останній рядок ігнорується)"""
+        values = set()
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, "r", encoding="utf-8") as f:
+                    values.update(json.load(f))
+        except Exception as e:
+            logger.error("Error loading %s: %s", self.name, e)
+        replayed = 0
+        try:
+            if os.path.exists(self.journal_path):
+                with open(self.journal_path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            op, value = json.loads(line)
+                        except ValueError:
+                            break  # запис обірвався на збої
+                        if op == "+":
+                            values.add(value)
+                        else:
+                            values.discard(value)
+                        replayed += 1
+        except Exception as e:
+            logger.error("Error replaying %s journal: %s", self.name, e)
+        self.values = values
+        self._journal_size = replayed
+        self._signature = self._file_signature()
+        return set(values)
+
+    def add(self, values: Iterable) -> int:
+        return self._record("+", [value for value in values if value not in self.values])
+
+    def discard(self, values: Iterable) -> int:
+        return self._record("-", [value for value in values if value in self.values])
+
+    def replace(self, values: Iterable):
+        """Замінює весь вміст (записується як різниця з поточним)"""
+        values = set(values)
+        self.discard(self.values - values)
+        self.add(values - self.values)
+
+    def sync(self, values: Iterable):
+        """
+        Замінює вміст у пам'яті без запису: зміни вже записав інший процес.
+        Інакше discard/add порівнювали б зі старим вмістом і пропускали правки, а знімок при згортанні був би застарілим.
+        """
+        self.values = set(values)
+
+    def _record(self, op: str, values: List) -> int:
+        values = list(dict.fromkeys(values))
+        if not values:
+            return 0
+        if op == "+":
+            self.values.update(values)
+        else:
+            self.values.difference_update(values)
+        self._pending.extend((op, value) for value in values)
+        self._schedule()
+        return len(values)
+
+    def compact(self):
+        """Примусово згортає журнал у знімок при наступному записі"""
+        self._journal_size = self.compact_threshold
+        self._schedule()
+
+    def _take(self):
+        if not self._pending and self._journal_size < self.compact_threshold:
+            return None
+        ops, self._pending = self._pending, []
+        if self._journal_size + len(ops) >= self.compact_threshold:
+            self._journal_size = 0
+            snapshot = sorted(self.values)
+            return lambda: self._write_snapshot(snapshot)
+        self._journal_size += len(ops)
+        return lambda: self._append(ops)
+
+    def _append(self, ops: List[Tuple[str, Any]]):
+        lines = "".join(json.dumps([op, value], ensure_ascii=False) + "\n" for op, value in ops)
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        self._signature = self._file_signature()
+
+    def _write_snapshot(self, snapshot: List):
+        atomic_write_json(self.path, snapshot)
+        # Знімок уже містить усі зміни; якщо збій станеться до видалення журналу,
+        # його повторне застосування дасть той самий результат
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self.journal_path)
+        self._signature = self._file_signature()